@@ -1,8 +1,13 @@
+from datetime import datetime
+
+from django.conf import settings
 from django.contrib import admin
+from django.http import FileResponse, Http404
+from django.template.response import TemplateResponse
 from courseoutline.models import *
+from courseoutline import profiling
 from django import forms
 from ckeditor_uploader.widgets import CKEditorUploadingWidget
-import cloudinary
 
 
 class OutlineForm(forms.ModelForm):
@@ -59,6 +64,16 @@ class CourseAdmin(admin.ModelAdmin):
     list_display = ['id', 'year']
 
 
+class SlowQueryAdmin(admin.ModelAdmin):
+    list_display = ['fingerprint', 'normalized', 'view', 'count', 'total_time', 'max_time', 'updated_date']
+    search_fields = ['normalized', 'view']
+    list_filter = ['view']
+    readonly_fields = [f.name for f in SlowQuery._meta.fields]
+
+    def has_add_permission(self, request):
+        return False
+
+
 admin.site.register(Course, CourseAdmin)
 admin.site.register(Category)
 admin.site.register(Outline, OutlineAdmin)
@@ -67,3 +82,24 @@ admin.site.register(Lecturer, LecturerAdmin)
 admin.site.register(Evaluation)
 admin.site.register(Student, StudentAdmin)
 admin.site.register(Comment, CommentAdmin)
+admin.site.register(SlowQuery, SlowQueryAdmin)
+
+
+def profile_list(request):
+    profiles = [{'name': f.name, 'size': f.stat().st_size,
+                 'modified': datetime.fromtimestamp(f.stat().st_mtime)}
+                for f in profiling.recent_profiles()]
+    context = dict(admin.site.each_context(request), title='Profiles', profiles=profiles,
+                   token=profiling.make_token(request.user.get_username()),
+                   max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600))
+
+    name = request.GET.get('name')
+    if name:
+        path = profiling.profile_dir() / name
+        if '/' in name or not name.endswith('.prof') or not path.exists():
+            raise Http404
+        if request.GET.get('download'):
+            return FileResponse(open(path, 'rb'), as_attachment=True, filename=name)
+        context.update(selected=name, report=profiling.summary(path))
+
+    return TemplateResponse(request, 'admin/courseoutline/profiles.html', context)
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class CourseoutlineConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'courseoutline'
+
+    def ready(self):
+        from courseoutline import signals  # noqa
@@ -0,0 +1,164 @@
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import serializers as django_serializers
+from django.db import IntegrityError, transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from courseoutline.models import *
+
+StudentOutline = Student.outline.through
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+def cutoff(days):
+    return timezone.now() - timedelta(days=days)
+
+
+# Chính sách lưu trữ: trả về queryset các dòng cần chuyển khỏi bảng chính
+
+def inactive_outlines():
+    return Outline.objects.filter(active=False, updated_date__lt=cutoff(setting('ARCHIVE_INACTIVE_DAYS', 365)))
+
+
+def inactive_comments():
+    return Comment.objects.filter(active=False, updated_date__lt=cutoff(setting('ARCHIVE_INACTIVE_DAYS', 365)))
+
+
+def past_course_comments():
+    # Bình luận của đề cương mà khóa học gần nhất đã qua ARCHIVE_COMMENT_YEARS năm
+    last_year = timezone.now().year - setting('ARCHIVE_COMMENT_YEARS', 2)
+    outlines = Outline.objects.annotate(last_year=Max('course__year')).filter(last_year__lt=last_year)
+    return Comment.objects.filter(outline__in=outlines.values('id'))
+
+
+def processed_approvals():
+    return Approval.objects.filter(is_approved=True, updated_date__lt=cutoff(setting('ARCHIVE_APPROVAL_DAYS', 180)))
+
+
+POLICIES = {
+    'inactive-outlines': inactive_outlines,
+    'inactive-comments': inactive_comments,
+    'past-course-comments': past_course_comments,
+    'processed-approvals': processed_approvals,
+}
+
+
+def label(model):
+    return model._meta.label_lower
+
+
+def parent_of(obj):
+    return obj.outline_id if isinstance(obj, Comment) else None
+
+
+def rows(objects, policy, extra=None):
+    # Dữ liệu lưu dạng của serializer 'python' (gồm cả id của quan hệ many-to-many) để deserialize lại khi khôi phục
+    extra = extra or {}
+    return [ArchivedRow(model=label(type(obj)), object_id=obj.pk, parent_id=parent_of(obj), policy=policy,
+                        data=dict(data, **extra.get(obj.pk, {})))
+            for obj, data in zip(objects, django_serializers.serialize('python', objects))]
+
+
+def archive_batch(model, ids, policy):
+    # Chép sang ArchivedRow rồi xóa bằng ORM để signal cập nhật các bảng dẫn xuất (thống kê, feed, snapshot)
+    objects = list(model.objects.filter(pk__in=ids))
+    extra, children = {}, []
+    if model is Outline:
+        # Đề cương mang theo bình luận, danh sách sinh viên đăng ký và các bản sao trỏ về nó
+        students, clones = {}, {}
+        for outline_id, student_id in StudentOutline.objects.filter(outline_id__in=ids) \
+                .values_list('outline_id', 'student_id'):
+            students.setdefault(outline_id, []).append(student_id)
+        for outline_id, clone_id in Outline.objects.filter(source_id__in=ids).values_list('source_id', 'id'):
+            clones.setdefault(outline_id, []).append(clone_id)
+        extra = {pk: {'students': students.get(pk, []), 'clones': clones.get(pk, [])} for pk in ids}
+        children = rows(list(Comment.objects.filter(outline_id__in=ids)), policy)
+    ArchivedRow.objects.bulk_create(rows(objects, policy, extra) + children)
+    model.objects.filter(pk__in=[obj.pk for obj in objects]).delete()
+    return len(objects)
+
+
+def archive(policies=None, batch_size=None, dry_run=False, progress=None):
+    batch_size = batch_size or setting('ARCHIVE_BATCH_SIZE', 500)
+    report = {}
+    for name in policies or setting('ARCHIVE_POLICIES', list(POLICIES)):
+        queryset = POLICIES[name]()
+        if dry_run:
+            report[name] = queryset.count()
+            continue
+        report[name] = 0
+        while True:
+            ids = list(queryset.order_by('pk').values_list('pk', flat=True)[:batch_size])
+            if not ids:
+                break
+            with transaction.atomic():
+                report[name] += archive_batch(queryset.model, ids, name)
+            if progress:
+                progress(name, report[name])
+    return report
+
+
+def check_links(deserialized):
+    # Khóa ngoại trỏ tới dòng đã bị xóa: để trống nếu cho phép, ngược lại không khôi phục được dòng này
+    obj = deserialized.object
+    for field in obj._meta.concrete_fields:
+        value = getattr(obj, field.attname)
+        if field.is_relation and value is not None \
+                and not field.related_model._base_manager.filter(pk=value).exists():
+            if not field.null:
+                raise IntegrityError(f'{field.name}={value} no longer exists')
+            setattr(obj, field.attname, None)
+    for name, pks in (deserialized.m2m_data or {}).items():
+        related = obj._meta.get_field(name).related_model
+        deserialized.m2m_data[name] = list(related._base_manager.filter(pk__in=pks).values_list('pk', flat=True))
+
+
+def restore_row(row):
+    obj = next(django_serializers.deserialize('python', [row.data]))
+    check_links(obj)
+    obj.save()
+    if row.model == label(Outline):
+        pk = row.object_id
+        students = Student.objects.filter(pk__in=row.data.get('students', [])).values_list('pk', flat=True)
+        StudentOutline.objects.bulk_create([StudentOutline(student_id=student_id, outline_id=pk)
+                                            for student_id in students], ignore_conflicts=True)
+        Outline.objects.filter(pk__in=row.data.get('clones', []), source=None).update(source_id=pk)
+    row.delete()
+
+
+def restore(model, ids):
+    # Đưa dòng (và các dòng con được lưu trữ cùng, vd bình luận của đề cương) trở lại bảng chính
+    restored, failed = [], []
+    for row in ArchivedRow.objects.filter(model=label(model), object_id__in=ids):
+        try:
+            with transaction.atomic():
+                restore_row(row)
+                if model is Outline:
+                    for child in ArchivedRow.objects.filter(model=label(Comment), parent_id=row.object_id,
+                                                            policy=row.policy):
+                        restore_row(child)
+            restored.append(row.object_id)
+        except IntegrityError as ex:
+            # vd sinh viên của bình luận đã bị xóa
+            failed.append({'id': row.object_id, 'error': str(ex)})
+    return {'restored': restored, 'failed': failed,
+            'missing': sorted(set(map(int, ids)) - set(restored) - {f['id'] for f in failed})}
+
+
+# Đọc xuyên: bình luận đã lưu trữ vẫn lấy được theo đề cương, cùng dạng với FastCommentSerializer.queryset
+
+def comments(outline_id):
+    result = []
+    for object_id, data in ArchivedRow.objects.filter(model=label(Comment), parent_id=outline_id) \
+            .order_by('-object_id').values_list('object_id', 'data'):
+        fields = data['fields']
+        result.append({'id': object_id, 'content': fields['content'], 'outline': fields['outline'],
+                       'created_date': parse_datetime(fields['created_date']),
+                       'updated_date': parse_datetime(fields['updated_date']), 'student': fields['student']})
+    return result
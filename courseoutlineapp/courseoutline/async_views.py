@@ -0,0 +1,228 @@
+import json
+import math
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.http import HttpResponse, StreamingHttpResponse
+from django.views.decorators.http import require_GET
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+from rest_framework.settings import api_settings
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+from courseoutline import serializers, paginators, concurrency
+from courseoutline.models import *
+from courseoutline.pubsub import broker
+from courseoutline.views import filter_outlines
+
+# Các endpoint đọc dùng ORM async, trả về cùng định dạng JSON với viewset đồng bộ
+
+
+def render(data, status=200):
+    return HttpResponse(JSONRenderer().render(data), content_type='application/json', status=status)
+
+
+def not_found(detail='No Outline matches the given query.'):
+    return render({'detail': detail}, status=404)
+
+
+def outline_queryset():
+    return Outline.objects.filter(active=True).prefetch_related('course', 'evaluation')
+
+
+async def paginate(request, queryset, page_size, serializer_class):
+    count = await queryset.acount()
+    num_pages = max(1, math.ceil(count / page_size))
+    try:
+        page = int(request.GET.get('page', 1))
+    except ValueError:
+        page = 0
+    if not 1 <= page <= num_pages:
+        return render({'detail': 'Invalid page.'}, status=404)
+
+    start = (page - 1) * page_size
+    items = [obj async for obj in queryset[start:start + page_size].aiterator()]
+
+    url = request.build_absolute_uri()
+    next_url = replace_query_param(url, 'page', page + 1) if page < num_pages else None
+    if page == 1:
+        previous_url = None
+    elif page == 2:
+        previous_url = remove_query_param(url, 'page')
+    else:
+        previous_url = replace_query_param(url, 'page', page - 1)
+
+    return render({
+        'count': count,
+        'next': next_url,
+        'previous': previous_url,
+        'results': serializer_class(items, many=True).data,
+    })
+
+
+@require_GET
+async def outline_list(request):
+    queryset = filter_outlines(outline_queryset(), request.GET)
+    return await paginate(request, queryset, paginators.ItemPaginator.page_size, serializers.OutlineSerializer)
+
+
+@require_GET
+async def outline_detail(request, pk):
+    outline = await outline_queryset().filter(pk=pk).afirst()
+    if outline is None:
+        return not_found()
+    response = render(serializers.OutlineSerializer(outline).data)
+    response['ETag'] = concurrency.etag(outline.version)  # dùng làm If-Match khi sửa đề cương
+    return response
+
+
+@require_GET
+async def outline_comments(request, pk):
+    outline = await Outline.objects.filter(active=True, pk=pk).afirst()
+    if outline is None:
+        return not_found()
+    comments = outline.comment_set.select_related('student').order_by('-id')
+    return await paginate(request, comments, paginators.CommentPaginator.page_size, serializers.CommentSerializer)
+
+
+@require_GET
+async def lesson_list(request):
+    queryset = Lesson.objects.filter(active=True)
+    cate_id = request.GET.get('category_id')
+    if cate_id:
+        queryset = queryset.filter(category_id=cate_id)
+    return await paginate(request, queryset, paginators.ItemPaginator.page_size, serializers.LessonSerializer)
+
+
+@require_GET
+async def category_list(request):
+    categories = [category async for category in Category.objects.all().aiterator()]
+    return render(serializers.CategorySerializer(categories, many=True).data)
+
+
+async def authenticate(request):
+    # Dùng lại các lớp xác thực của DRF (OAuth2) cho view async
+    def user():
+        return Request(request, authenticators=[auth() for auth in
+                                                api_settings.DEFAULT_AUTHENTICATION_CLASSES]).user
+    try:
+        return await sync_to_async(user)()
+    except exceptions.AuthenticationFailed:
+        return AnonymousUser()
+
+
+def cursor(request):
+    try:
+        return int(request.GET.get('since') or request.headers.get('Last-Event-ID') or 0)
+    except ValueError:
+        return 0
+
+
+async def long_poll(channel, fetch, since, timeout):
+    # Đăng ký trước khi đọc CSDL để không bỏ lỡ sự kiện xảy ra giữa hai bước
+    with broker.subscribe(channel) as subscription:
+        items = await fetch(since)
+        if items:
+            return items
+        event = await subscription.get(timeout)
+        if event is None:
+            return []
+        if subscription.overflowed:
+            return await fetch(since)
+        return [item for item in [event] + subscription.drain() if item['id'] > since]
+
+
+def event_stream(channel, fetch, since):
+    heartbeat = getattr(settings, 'SSE_HEARTBEAT', 15)
+
+    def frame(item):
+        return f"id: {item['id']}\ndata: {json.dumps(item, ensure_ascii=False)}\n\n"
+
+    async def events():
+        # Đăng ký trong chính event loop tiêu thụ stream, trước khi đọc phần tồn đọng
+        subscription = broker.subscribe(channel)
+        last = since
+        try:
+            for item in await fetch(last):
+                last = item['id']
+                yield frame(item)
+            while True:
+                event = await subscription.get(heartbeat)
+                if event is None or subscription.overflowed:
+                    # Hết nhịp chờ: đối chiếu CSDL để nhận tin từ các worker khác
+                    subscription.overflowed = False
+                    subscription.drain()
+                    for item in await fetch(last):
+                        last = item['id']
+                        yield frame(item)
+                    if event is None:
+                        yield ': keep-alive\n\n'
+                    continue
+                for item in [event] + subscription.drain():
+                    if item['id'] > last:
+                        last = item['id']
+                        yield frame(item)
+        finally:
+            subscription.close()
+
+    response = StreamingHttpResponse(events(), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    response['X-Accel-Buffering'] = 'no'
+    return response
+
+
+async def member_chat(request, pk):
+    user = await authenticate(request)
+    if not user.is_authenticated:
+        return None, render({'detail': 'Authentication credentials were not provided.'}, status=401)
+    chat = await Chat.objects.select_related('lecturer', 'student').filter(pk=pk, active=True).afirst()
+    if chat is None:
+        return None, not_found('No Chat matches the given query.')
+    if not chat.has_member(user):
+        return None, render({'detail': 'You are not a member of this chat.'}, status=403)
+    return chat, None
+
+
+def chat_fetcher(chat_id, limit=200):
+    async def fetch(since):
+        messages = [m async for m in Message.objects.filter(chat_id=chat_id, id__gt=since).order_by('id')[:limit]]
+        return serializers.MessageSerializer(messages, many=True).data
+    return fetch
+
+
+@require_GET
+async def chat_poll(request, pk):
+    chat, error = await member_chat(request, pk)
+    if error:
+        return error
+    since = cursor(request)
+    try:
+        timeout = min(float(request.GET.get('timeout', settings.LONG_POLL_TIMEOUT)), settings.LONG_POLL_TIMEOUT)
+    except ValueError:
+        timeout = settings.LONG_POLL_TIMEOUT
+    messages = await long_poll(f'chat:{chat.id}', chat_fetcher(chat.id), since, timeout)
+    return render({'since': messages[-1]['id'] if messages else since, 'messages': messages})
+
+
+@require_GET
+async def chat_stream(request, pk):
+    chat, error = await member_chat(request, pk)
+    if error:
+        return error
+    return event_stream(f'chat:{chat.id}', chat_fetcher(chat.id), cursor(request))
+
+
+def comment_fetcher(outline_id, limit=200):
+    async def fetch(since):
+        comments = [c async for c in Comment.objects.filter(outline_id=outline_id, id__gt=since).order_by('id')[:limit]]
+        return serializers.CommentSerializer(comments, many=True).data
+    return fetch
+
+
+@require_GET
+async def outline_comment_stream(request, pk):
+    if not await Outline.objects.filter(active=True, pk=pk).aexists():
+        return not_found()
+    return event_stream(f'outline:{pk}:comments', comment_fetcher(pk), cursor(request))
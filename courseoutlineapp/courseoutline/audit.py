@@ -0,0 +1,196 @@
+import atexit
+import json
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import DatabaseError, close_old_connections, transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from courseoutline.metrics import registry
+from courseoutline.throttling import client_ip
+
+
+def enabled():
+    return getattr(settings, 'AUDIT_ENABLED', True)
+
+
+def spool_dir():
+    return Path(getattr(settings, 'AUDIT_SPOOL_DIR', settings.BASE_DIR / 'audit-spool'))
+
+
+def alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except (PermissionError, OSError):
+        return True
+    return True
+
+
+def save(events):
+    # event_id là unique nên ghi lại một lô đã ghi (sau khi process chết giữa chừng) không tạo bản trùng
+    from courseoutline.models import AuditEvent
+
+    AuditEvent.objects.bulk_create([
+        AuditEvent(event_id=event['event_id'], created_date=parse_datetime(event['created_date']),
+                   actor_id=event['actor_id'], actor_name=event['actor_name'], action=event['action'],
+                   target_type=event['target_type'], target_id=event['target_id'],
+                   changes=event['changes'], ip=event['ip'])
+        for event in events], ignore_conflicts=True)
+
+
+class AuditBuffer:
+    # Gom sự kiện trong bộ nhớ của process rồi ghi một lần bằng bulk_create (đủ lô, hết thời gian, hoặc hết request).
+    # Mỗi sự kiện được ghi thêm vào file spool riêng của process trước; file chỉ còn các sự kiện chưa ghi vào CSDL,
+    # nên nếu process chết, process khác đọc lại file đó (recover)
+    def __init__(self):
+        self.events = []
+        self.pid = None
+        self.spool = None
+        self._lock = threading.Lock()
+        self._executor = None
+        self._flushing = False
+
+    def _start(self):
+        # Gọi trong _lock; chạy lại sau fork vì luồng nền và file spool không được kế thừa
+        self.pid = os.getpid()
+        directory = spool_dir()
+        directory.mkdir(parents=True, exist_ok=True)
+        self.path = directory / f'audit-{self.pid}.jsonl'
+        self.spool = open(self.path, 'a', encoding='utf-8')
+        self.events = []
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='audit')
+        self._executor.submit(recover)
+        threading.Thread(target=self._timer, name='audit-timer', daemon=True).start()
+
+    def _timer(self):
+        pid = self.pid
+        while self.pid == pid:
+            time.sleep(getattr(settings, 'AUDIT_FLUSH_INTERVAL', 2))
+            if self.events:
+                self.flush_async()
+
+    def add(self, event):
+        line = json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+        with self._lock:
+            if self.pid != os.getpid():
+                self._start()
+            self.spool.write(line)
+            self.spool.flush()
+            if getattr(settings, 'AUDIT_FSYNC', False):
+                os.fsync(self.spool.fileno())
+            self.events.append(event)
+            full = len(self.events) >= getattr(settings, 'AUDIT_BATCH_SIZE', 200)
+        if full:
+            self.flush_async()
+
+    def flush_async(self):
+        with self._lock:
+            if not self.events or self._flushing or self._executor is None:
+                return
+            self._flushing = True
+        self._executor.submit(self.flush)
+
+    def flush(self):
+        with self._lock:
+            batch, self.events = self.events, []
+        if not batch:
+            self._flushing = False
+            return 0
+        try:
+            close_old_connections()
+            save(batch)
+        except DatabaseError:
+            registry.inc('courseoutline_audit_events_total', result='retry', amount=len(batch))
+            with self._lock:
+                self.events[:0] = batch
+            return 0
+        finally:
+            self._flushing = False
+        registry.inc('courseoutline_audit_events_total', result='written', amount=len(batch))
+        with self._lock:
+            # Viết lại spool chỉ với các sự kiện đến trong lúc đang ghi
+            temp = self.path.with_suffix('.tmp')
+            with open(temp, 'w', encoding='utf-8') as f:
+                f.writelines(json.dumps(event, cls=DjangoJSONEncoder, ensure_ascii=False) + '\n'
+                             for event in self.events)
+            self.spool.close()
+            temp.replace(self.path)
+            self.spool = open(self.path, 'a', encoding='utf-8')
+        return len(batch)
+
+    def close(self):
+        if self.pid != os.getpid():
+            return
+        try:
+            self.flush()
+        except Exception:
+            return  # còn trong spool, process sau sẽ đọc lại
+        if not self.events:
+            self.spool.close()
+            self.path.unlink(missing_ok=True)
+
+
+buffer = AuditBuffer()
+atexit.register(buffer.close)
+
+
+def recover():
+    # Ghi vào CSDL các file spool còn lại của process đã chết rồi xóa file
+    recovered = 0
+    for path in spool_dir().glob('audit-*'):
+        # audit-<pid>.jsonl của process đang ghi, audit-<pid>.recovering-<pid khác> của process đang đọc lại
+        if path.suffix == '.jsonl':
+            owner = int(path.stem.split('-')[1])
+        elif '.recovering-' in path.name:
+            owner = int(path.name.rsplit('-', 1)[1])
+        else:
+            continue
+        if owner == os.getpid() or alive(owner):
+            continue
+        claimed = path.with_name(f'{path.name.split(".")[0]}.recovering-{os.getpid()}')
+        try:
+            path.rename(claimed)
+        except OSError:
+            continue  # process khác đã nhận file này
+        events = []
+        with open(claimed, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except ValueError:
+                    pass  # dòng cuối bị cắt ngang khi process chết
+        if events:
+            save(events)
+        claimed.unlink()
+        recovered += len(events)
+    return recovered
+
+
+def log(action, target, request=None, actor=None, **changes):
+    # Ghi nhận thao tác sau khi transaction commit thành công, không chờ ghi CSDL
+    if not enabled():
+        return
+    user = actor or getattr(request, 'user', None)
+    if user is not None and not user.is_authenticated:
+        user = None
+    event = {
+        'event_id': uuid.uuid4().hex,
+        'created_date': timezone.now().isoformat(),
+        'actor_id': user.pk if user else None,
+        'actor_name': user.get_username() if user else '',
+        'action': action,
+        'target_type': target._meta.model_name,
+        'target_id': str(target.pk),
+        'changes': json.loads(json.dumps(changes, cls=DjangoJSONEncoder)),
+        'ip': (client_ip(request) or None) if request is not None else None,
+    }
+    transaction.on_commit(lambda: buffer.add(event))
@@ -0,0 +1,414 @@
+import bisect
+import gzip
+import heapq
+import json
+import os
+import threading
+import time
+import unicodedata
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connections, transaction
+from django.db.models import Count, Q
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from courseoutline.models import *
+
+KINDS = ('outline', 'lesson', 'category')
+SEPARATOR = '\x00'  # nhỏ hơn mọi ký tự: khóa là 'văn bản\x00id', "abc" đứng trước "abc d..."
+END = '\U0010ffff'
+
+
+def setting(name, default):
+    return getattr(settings, name, default)
+
+
+# Dấu (combining marks) bị bỏ sau khi tách bằng NFKD; đ / Đ không tách được nên đổi trực tiếp
+FOLD = {c: None for c in range(0x300, 0x370)}
+FOLD.update({ord('đ'): 'd', ord('Đ'): 'd'})
+
+
+def fold(text):
+    # Bỏ dấu tiếng Việt, chữ thường, gộp khoảng trắng: "Đề  cương" -> "de cuong"
+    return ' '.join(unicodedata.normalize('NFKD', text).translate(FOLD).lower().split())
+
+
+def sources(**lookup):
+    # Độ phổ biến: đề cương theo số sinh viên đăng ký + số bình luận, môn học theo số đề cương, danh mục theo số môn học
+    return {
+        'outline': Outline.objects.filter(**lookup).annotate(
+            weight=Count('student', distinct=True) + Count('comment', filter=Q(comment__active=True), distinct=True)
+        ).values_list('id', 'name', 'active', 'weight'),
+        'lesson': Lesson.objects.filter(**lookup).annotate(
+            weight=Count('outline', filter=Q(outline__active=True))
+        ).values_list('id', 'subject', 'active', 'weight'),
+        'category': Category.objects.filter(**lookup).annotate(
+            weight=Count('lesson', filter=Q(lesson__active=True))
+        ).values_list('id', 'name', 'active', 'weight'),
+    }
+
+
+class PrefixIndex:
+    # Mỗi loại (đề cương / môn học / danh mục) có một mảng khóa đã sắp xếp, khoảng khớp tiền tố tìm bằng bisect.
+    # Mỗi mục có một khóa cho cả chuỗi và một khóa cho mỗi từ phía sau (tối đa max_words, giữ key_length ký tự đầu)
+    # để "cuong" cũng tìm ra "Đề cương". Tiền tố khớp quá scan_limit khóa (vd "d") không duyệt lại cả khoảng mà dùng
+    # danh sách phổ biến nhất tính sẵn (top), được giữ đúng theo từng thay đổi.
+    # Số mục bị giới hạn bởi max_entries: khi đầy, mục mới chỉ được thêm nếu phổ biến hơn mục kém nhất (bị loại)
+    def __init__(self, max_entries=100000, max_words=6, max_label=120, key_length=32, max_results=20,
+                 scan_limit=1000, max_prefixes=20000, precompute=2):
+        self.max_entries = max_entries
+        self.max_words = max_words
+        self.max_label = max_label
+        self.key_length = key_length
+        self.max_results = max_results
+        self.depth = max_results * 2  # dư ra để xóa vài mục không phải tính lại top
+        self.scan_limit = scan_limit
+        self.max_prefixes = max_prefixes
+        self.precompute = precompute
+        self.entries = {}  # (kind, pk) -> [label, weight, keys]
+        self.keys = {kind: [] for kind in KINDS}
+        self.pks = {kind: [] for kind in KINDS}  # id của mục có khóa cùng vị trí trong self.keys
+        self.top = {}  # (kind, tiền tố) -> (kind, pk) phổ biến nhất của khoảng, đã sắp xếp
+        self.weights = []  # heap (weight, kind, pk) để tìm mục kém nhất; phần tử cũ được bỏ qua khi lấy ra
+        self.synced = None
+        self.lock = threading.RLock()
+
+    def __len__(self):
+        return len(self.entries)
+
+    def rank(self, ref):
+        entry = self.entries[ref]
+        return -entry[1], entry[0]
+
+    def index_keys(self, pk, label):
+        words = fold(label).split(' ')
+        return tuple(' '.join(words[i:])[:self.key_length] + SEPARATOR + str(pk)
+                     for i in range(min(len(words), self.max_words)) if words[i])
+
+    def matches(self, ref, prefix):
+        words = fold(self.entries[ref][0]).split(' ')
+        return any(' '.join(words[i:]).startswith(prefix) for i in range(min(len(words), self.max_words)))
+
+    def load(self, rows):
+        # rows: (kind, pk, label, weight); sắp xếp một lần thay vì chèn từng khóa
+        rows = heapq.nlargest(self.max_entries, rows, key=lambda row: row[3])
+        pairs = {kind: [] for kind in KINDS}
+        with self.lock:
+            self.entries = {}
+            for kind, pk, label, weight in rows:
+                label = label[:self.max_label]
+                keys = self.index_keys(pk, label)
+                self.entries[kind, pk] = [label, weight, keys]
+                pairs[kind].extend((key, pk) for key in keys)
+            for kind in KINDS:
+                pairs[kind].sort()
+                self.keys[kind] = [key for key, _ in pairs[kind]]
+                self.pks[kind] = [pk for _, pk in pairs[kind]]
+            self.weights = [(weight, kind, pk) for (kind, pk), (_, weight, _) in self.entries.items()]
+            heapq.heapify(self.weights)
+            self.top = {}
+            self.precompute_top()
+
+    def precompute_top(self):
+        # Tính sẵn top của các tiền tố ngắn (1, 2 ký tự) có khoảng lớn, mỗi độ dài một lượt qua mảng khóa
+        for kind in KINDS:
+            keys = self.keys[kind]
+            for length in range(1, self.precompute + 1):
+                position = 0
+                while position < len(keys):
+                    prefix = keys[position][:length]
+                    if SEPARATOR in prefix:
+                        position += 1
+                        continue
+                    lo, hi = self.range(kind, prefix, position)
+                    if hi - lo > self.scan_limit:
+                        self.top[kind, prefix] = self.scan(kind, prefix, lo, hi, self.depth)
+                    position = hi
+
+    def range(self, kind, prefix, lo=0):
+        keys = self.keys[kind]
+        lo = bisect.bisect_left(keys, prefix, lo)
+        return lo, bisect.bisect_left(keys, prefix + END, lo)
+
+    def scan(self, kind, prefix, lo, hi, limit):
+        refs = {(kind, pk) for pk in self.pks[kind][lo:hi]}  # một mục có thể khớp nhiều khóa
+        if len(prefix) > self.key_length:
+            refs = {ref for ref in refs if self.matches(ref, prefix)}  # khóa bị cắt ngắn: so trên nhãn đầy đủ
+        return heapq.nsmallest(limit, refs, key=self.rank)
+
+    def candidates(self, kind, prefix, limit):
+        top = self.top.get((kind, prefix))
+        if top is not None:
+            return top[:limit]
+        lo, hi = self.range(kind, prefix[:self.key_length])
+        if hi - lo <= self.scan_limit or len(prefix) > self.key_length:
+            return self.scan(kind, prefix, lo, hi, limit)
+        if len(self.top) >= self.max_prefixes:
+            del self.top[next(iter(self.top))]
+        top = self.top[kind, prefix] = self.scan(kind, prefix, lo, hi, self.depth)
+        return top[:limit]
+
+    def search(self, query, limit=10, kinds=KINDS):
+        prefix = fold(query)
+        if not prefix:
+            return []
+        with self.lock:
+            refs = [ref for kind in KINDS if kind in kinds for ref in self.candidates(kind, prefix, limit)]
+            return [{'type': kind, 'id': pk, 'label': self.entries[kind, pk][0]}
+                    for kind, pk in heapq.nsmallest(limit, refs, key=self.rank)]
+
+    # Cập nhật (gọi trong self.lock)
+
+    def cached_prefixes(self, kind, keys):
+        found = set()
+        for key in keys:
+            text = key.split(SEPARATOR, 1)[0]
+            found.update(text[:end] for end in range(1, len(text) + 1) if (kind, text[:end]) in self.top)
+        return found
+
+    def retop(self, kind, keys, ref, present):
+        # top là các mục đứng đầu khoảng: mục đã có thì xếp lại (hoặc bỏ ra nếu tụt xuống dưới cuối danh sách),
+        # mục mới chỉ vào khi hơn mục cuối. Còn ít hơn max_results thì bỏ top, lần tra cứu sau tính lại
+        for prefix in self.cached_prefixes(kind, keys):
+            top = self.top[kind, prefix]
+            if ref in top:
+                top.remove(ref)
+                if present and top and self.rank(ref) < self.rank(top[-1]):
+                    bisect.insort(top, ref, key=self.rank)
+            elif present and top and self.rank(ref) < self.rank(top[-1]):
+                bisect.insort(top, ref, key=self.rank)
+                top.pop()
+            if len(top) < self.max_results:
+                del self.top[kind, prefix]
+
+    def link(self, kind, pk, label, weight):
+        keys = self.index_keys(pk, label)
+        self.entries[kind, pk] = [label, weight, keys]
+        for key in keys:
+            position = bisect.bisect_left(self.keys[kind], key)
+            self.keys[kind].insert(position, key)
+            self.pks[kind].insert(position, pk)
+        heapq.heappush(self.weights, (weight, kind, pk))
+        self.retop(kind, keys, (kind, pk), True)
+
+    def unlink(self, kind, pk):
+        keys = self.entries[kind, pk][2]
+        self.retop(kind, keys, (kind, pk), False)
+        del self.entries[kind, pk]
+        for key in keys:
+            position = bisect.bisect_left(self.keys[kind], key)
+            if position < len(self.keys[kind]) and self.keys[kind][position] == key:
+                del self.keys[kind][position]
+                del self.pks[kind][position]
+
+    def reweigh(self, kind, pk, weight):
+        entry = self.entries[kind, pk]
+        if entry[1] != weight:
+            entry[1] = weight
+            heapq.heappush(self.weights, (weight, kind, pk))
+            if len(self.weights) > 2 * len(self.entries) + 1000:
+                self.weights = [(weight, kind, pk) for (kind, pk), (_, weight, _) in self.entries.items()]
+                heapq.heapify(self.weights)
+            self.retop(kind, entry[2], (kind, pk), True)
+
+    def evict_for(self, weight):
+        while self.weights:
+            worst, kind, pk = self.weights[0]
+            entry = self.entries.get((kind, pk))
+            if entry is None or entry[1] != worst:
+                heapq.heappop(self.weights)
+            elif worst >= weight:
+                return False
+            else:
+                heapq.heappop(self.weights)
+                self.unlink(kind, pk)
+                return True
+        return True
+
+    def put(self, kind, pk, label, weight=None):
+        label = label[:self.max_label]
+        with self.lock:
+            old = self.entries.get((kind, pk))
+            if weight is None:
+                weight = old[1] if old else 0
+            if old and old[0] == label:
+                self.reweigh(kind, pk, weight)
+                return
+            if old:
+                self.unlink(kind, pk)
+            elif len(self.entries) >= self.max_entries and not self.evict_for(weight):
+                return
+            self.link(kind, pk, label, weight)
+
+    def remove(self, kind, pk):
+        with self.lock:
+            if (kind, pk) in self.entries:
+                self.unlink(kind, pk)
+
+    def add_weight(self, kind, pk, delta):
+        with self.lock:
+            entry = self.entries.get((kind, pk))
+            if entry:
+                self.reweigh(kind, pk, entry[1] + delta)
+
+
+# Snapshot: file gzip JSON gọn (kind, id, label, weight) để process mới nạp index mà không phải GROUP BY toàn bảng
+
+def snapshot_path():
+    return Path(setting('AUTOCOMPLETE_SNAPSHOT', settings.BASE_DIR / 'autocomplete' / 'snapshot.json.gz'))
+
+
+def database_rows(**lookup):
+    for kind, rows in sources(**lookup).items():
+        for pk, label, active, weight in rows:
+            if active:
+                yield kind, pk, label, weight
+
+
+def write_snapshot(rows, created, path=None):
+    path = Path(path) if path else snapshot_path()
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp = path.with_name(f'{path.name}.{os.getpid()}.tmp')
+    with gzip.open(temp, 'wt', encoding='utf-8') as f:
+        json.dump({'created': created.isoformat(), 'rows': [list(row) for row in rows]}, f,
+                  ensure_ascii=False, separators=(',', ':'))
+    temp.replace(path)
+    return path
+
+
+def read_snapshot(path=None):
+    path = Path(path) if path else snapshot_path()
+    try:
+        with gzip.open(path, 'rt', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return None, []
+    created = parse_datetime(data.get('created') or '')
+    max_age = setting('AUTOCOMPLETE_SNAPSHOT_MAX_AGE', 86400)
+    if created is None or (timezone.now() - created).total_seconds() > max_age:
+        return None, []
+    return created, [tuple(row) for row in data['rows']]
+
+
+def build(path=None):
+    # Tính lại từ CSDL và ghi snapshot (manage.py build_autocomplete, hoặc lần nạp đầu khi chưa có snapshot)
+    created = timezone.now()
+    rows = list(database_rows())
+    write_snapshot(rows, created, path)
+    return created, rows
+
+
+def sync(index, since):
+    # Áp các thay đổi sau thời điểm since (đề cương / môn học / danh mục được sửa, tắt hoặc thêm ở process khác)
+    synced = timezone.now()
+    for kind, rows in sources(updated_date__gte=since).items():
+        for pk, label, active, weight in rows:
+            if active:
+                index.put(kind, pk, label, weight)
+            else:
+                index.remove(kind, pk)
+    index.synced = synced
+
+
+def new_index():
+    return PrefixIndex(max_entries=setting('AUTOCOMPLETE_MAX_ENTRIES', 100000),
+                       max_words=setting('AUTOCOMPLETE_MAX_WORDS', 6),
+                       max_label=setting('AUTOCOMPLETE_MAX_LABEL', 120),
+                       max_results=setting('AUTOCOMPLETE_MAX_LIMIT', 20))
+
+
+_index = None
+_lock = threading.Lock()
+_syncing = threading.Event()
+
+
+def load():
+    index = new_index()
+    created, rows = read_snapshot()
+    if created is None:
+        try:
+            created, rows = build()
+        except OSError:
+            created, rows = timezone.now(), list(database_rows())
+        index.load(rows)
+        index.synced = created
+    else:
+        index.load(rows)
+        sync(index, created)
+    return index
+
+
+def get_index():
+    global _index
+    if _index is None:
+        with _lock:
+            if _index is None:
+                _index = load()
+    elif time.time() - _index.synced.timestamp() > setting('AUTOCOMPLETE_SYNC_INTERVAL', 60) \
+            and not _syncing.is_set():
+        # Đồng bộ định kỳ ở luồng nền, request hiện tại vẫn dùng index cũ
+        _syncing.set()
+        threading.Thread(target=_background_sync, args=(_index,), name='autocomplete-sync', daemon=True).start()
+    return _index
+
+
+def _background_sync(index):
+    try:
+        sync(index, index.synced)
+    finally:
+        connections.close_all()  # kết nối của luồng nền này
+        _syncing.clear()
+
+
+def _warm():
+    try:
+        get_index()
+    finally:
+        connections.close_all()
+
+
+def warm():
+    # Gọi từ wsgi / asgi: nạp index ở luồng nền ngay khi process khởi động
+    if setting('AUTOCOMPLETE_WARMUP', True):
+        threading.Thread(target=_warm, name='autocomplete-warmup', daemon=True).start()
+
+
+def search(query, limit=10, kinds=KINDS):
+    return get_index().search(query, limit, kinds)
+
+
+# Cập nhật từ signal: chỉ khi index đã được nạp trong process này, và chỉ sau khi transaction commit
+
+def on_commit(method, *args):
+    if _index is not None:
+        transaction.on_commit(lambda: getattr(_index, method)(*args))
+
+
+def saved(kind, pk, label, active):
+    if active:
+        on_commit('put', kind, pk, label)
+    else:
+        on_commit('remove', kind, pk)
+
+
+def deleted(kind, pk):
+    on_commit('remove', kind, pk)
+
+
+def popular(kind, pk, delta=1):
+    on_commit('add_weight', kind, pk, delta)
+
+
+def outlines_added(outlines):
+    # Cho bulk_create / INSERT ... SELECT (import, rollover) vốn không phát signal: như post_save của từng đề cương
+    if _index is None:
+        return
+    rows = list(outlines.filter(active=True).values_list('id', 'name', 'lesson_id'))
+
+    def apply():
+        for pk, name, lesson_id in rows:
+            _index.put('outline', pk, name)
+            _index.add_weight('lesson', lesson_id, 1)
+    transaction.on_commit(apply)
@@ -0,0 +1,84 @@
+import json
+import math
+import time
+from contextlib import contextmanager
+
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import connection
+from django.test.utils import setup_databases, setup_test_environment, teardown_databases, \
+    teardown_test_environment
+
+
+def percentile(samples, pct):
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(0, math.ceil(pct / 100 * len(ordered)) - 1)
+    return ordered[rank]
+
+
+def summarize(samples, **extra):
+    return dict(extra,
+                runs=len(samples),
+                p50_ms=round(percentile(samples, 50) * 1000, 3),
+                p95_ms=round(percentile(samples, 95) * 1000, 3),
+                p99_ms=round(percentile(samples, 99) * 1000, 3),
+                mean_ms=round(sum(samples) / len(samples) * 1000, 3) if samples else 0.0)
+
+
+def timed(func, iterations, warmup=2):
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(iterations):
+        start = time.perf_counter()
+        func()
+        samples.append(time.perf_counter() - start)
+    return samples
+
+
+def compare(results, baseline, tolerance=0.2, metric='p95_ms'):
+    # Đánh dấu các mục chậm hơn baseline quá ngưỡng hoặc phát sinh thêm truy vấn
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if not previous:
+            continue
+        if current[metric] > previous[metric] * (1 + tolerance):
+            regressions.append({'name': name, 'metric': metric,
+                                'baseline': previous[metric], 'current': current[metric]})
+        if 'queries' in current and current['queries'] > previous.get('queries', current['queries']):
+            regressions.append({'name': name, 'metric': 'queries',
+                                'baseline': previous['queries'], 'current': current['queries']})
+    return regressions
+
+
+def load(path):
+    with open(path, encoding='utf-8') as f:
+        data = json.load(f)
+    return data.get('results', data)
+
+
+def dump(data, path=None, stdout=None):
+    text = json.dumps(data, indent=2, ensure_ascii=False)
+    if path:
+        with open(path, 'w', encoding='utf-8') as f:
+            f.write(text)
+    if stdout is not None:
+        stdout.write(text)
+
+
+@contextmanager
+def bench_database(scale, stdout=None):
+    # Tạo CSDL test SQLite tạm, sinh dữ liệu giả lập rồi xóa khi kết thúc
+    if connection.vendor != 'sqlite':
+        raise CommandError('Run with --settings=courseoutlineapp.settings_bench (SQLite database).')
+    setup_test_environment()
+    old_config = setup_databases(verbosity=0, interactive=False)
+    try:
+        call_command('seed_synthetic', scale=scale, stdout=stdout)
+        yield
+    finally:
+        teardown_databases(old_config, verbosity=0)
+        teardown_test_environment()
@@ -0,0 +1,19 @@
+from django.db import connection
+from django.db.models.constants import OnConflict
+
+
+def insert_select(model, queryset, ignore_conflicts=False, **columns):
+    # INSERT INTO ... SELECT: dữ liệu được sao chép ngay trong CSDL, không nạp dòng nào lên Python.
+    # ignore_conflicts bỏ qua các dòng trùng khóa (INSERT IGNORE / INSERT OR IGNORE / ON CONFLICT DO NOTHING)
+    names = [f'_{i}' for i in range(len(columns))]
+    queryset = queryset.order_by().annotate(**dict(zip(names, columns.values()))).values_list(*names)
+    sql, params = queryset.query.sql_with_params()
+    quote = connection.ops.quote_name
+    table = quote(model._meta.db_table)
+    fields = [model._meta.get_field(name) for name in columns]
+    on_conflict = OnConflict.IGNORE if ignore_conflicts else None
+    insert = connection.ops.insert_statement(on_conflict=on_conflict)
+    suffix = connection.ops.on_conflict_suffix_sql(fields, on_conflict, [], [])
+    with connection.cursor() as cursor:
+        cursor.execute(f'{insert} {table} ({", ".join(quote(f.column) for f in fields)}) {sql} {suffix}', params)
+        return cursor.rowcount
@@ -0,0 +1,373 @@
+import hashlib
+import mmap
+import os
+import pickle
+import struct
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+from django.core.exceptions import ImproperlyConfigured
+
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
+# Bố cục file: [header][bảng băm (hash, vị trí)][vùng dữ liệu dạng vòng (ring log)].
+# Bản ghi mới luôn được ghi ở head; khi hết chỗ, các bản ghi cũ nhất ở tail bị loại (giới hạn theo dung lượng).
+# Bản ghi được đọc lại khi đã nằm trong phần tư cũ nhất sẽ được chép lên head, nên gần đúng với LRU.
+MAGIC = b'COCACHE1'
+HEADER = struct.Struct('<8sQQQQQQ')  # magic, data_size, capacity, head, tail, count, tombstones
+SLOT = struct.Struct('<QQ')  # key_hash, vị trí (logic) của bản ghi
+# loại, key_hash, độ dài bản ghi (chưa căn lề 8 byte), độ dài key, hạn dùng (0 = không hết hạn)
+RECORD = struct.Struct('<BQIHd')
+HEADER_SIZE = 64
+EMPTY, DELETED = 0, 1
+ENTRY, PAD = 1, 2
+PROMOTE_AFTER = 0.75
+
+
+def align(size):
+    return (size + 7) & ~7
+
+
+def key_hash(key):
+    return max(2, int.from_bytes(hashlib.blake2b(key, digest_size=8).digest(), 'little'))
+
+
+class SharedMemoryStore:
+    def __init__(self, path, max_size, max_entries):
+        self.path = path
+        self.pid = os.getpid()
+        capacity = 1
+        while capacity < max_entries * 2:
+            capacity <<= 1
+        self.capacity = capacity
+        self.index_size = capacity * SLOT.size
+        self.data_offset = HEADER_SIZE + self.index_size
+        self.data_size = align(max_size)
+        self._thread_lock = threading.Lock()
+
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        total = self.data_offset + self.data_size
+        try:
+            with self._file_lock():
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                header = os.read(self._fd, HEADER.size)
+                if len(header) == HEADER.size and header[:len(MAGIC)] == MAGIC:
+                    # File đang được các worker khác dùng với cấu hình khác: không cắt / xóa dưới chân chúng
+                    data_size, capacity = HEADER.unpack(header)[1:3]
+                    if (data_size, capacity) != (self.data_size, self.capacity):
+                        raise ImproperlyConfigured(
+                            f'{path} was created with {data_size} data bytes and {capacity} slots; '
+                            f'use another LOCATION for MAX_SIZE={max_size}, MAX_ENTRIES={max_entries}.')
+                if os.fstat(self._fd).st_size != total:
+                    os.ftruncate(self._fd, total)
+                self._map = mmap.mmap(self._fd, total)
+                magic, _, _, head, tail = HEADER.unpack_from(self._map, 0)[:5]
+                if magic != MAGIC or not tail <= head <= tail + self.data_size:
+                    self._reset()
+        except Exception:
+            os.close(self._fd)
+            raise
+
+    @contextmanager
+    def _file_lock(self):
+        # Khóa giữa các process (flock / msvcrt) cộng khóa giữa các luồng trong cùng process
+        with self._thread_lock:
+            if fcntl is not None:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+            else:
+                os.lseek(self._fd, 0, os.SEEK_SET)
+                msvcrt.locking(self._fd, msvcrt.LK_LOCK, 1)
+            try:
+                yield
+            finally:
+                if fcntl is not None:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+                else:
+                    os.lseek(self._fd, 0, os.SEEK_SET)
+                    msvcrt.locking(self._fd, msvcrt.LK_UNLCK, 1)
+
+    locked = _file_lock
+
+    # header
+
+    def _header(self):
+        return list(HEADER.unpack_from(self._map, 0))
+
+    def _write_header(self, head, tail, count, tombstones):
+        HEADER.pack_into(self._map, 0, MAGIC, self.data_size, self.capacity, head, tail, count, tombstones)
+
+    def _reset(self):
+        self._map[HEADER_SIZE:self.data_offset] = bytes(self.index_size)
+        self._write_header(0, 0, 0, 0)
+
+    # bảng băm (dò tuyến tính)
+
+    def _slots(self, digest):
+        mask = self.capacity - 1
+        slot = digest & mask
+        for _ in range(self.capacity):
+            yield slot, HEADER_SIZE + slot * SLOT.size
+            slot = (slot + 1) & mask
+
+    def _find(self, digest, key):
+        for _, position in self._slots(digest):
+            stored, offset = SLOT.unpack_from(self._map, position)
+            if stored == EMPTY:
+                return None, None
+            if stored == digest and self._readable(offset) and self._record_key(offset) == key:
+                return position, offset
+        return None, None
+
+    def _insert_slot(self, digest, offset):
+        for _, position in self._slots(digest):
+            stored = SLOT.unpack_from(self._map, position)[0]
+            if stored in (EMPTY, DELETED):
+                SLOT.pack_into(self._map, position, digest, offset)
+                return stored == DELETED
+
+    def _rehash(self):
+        live = [SLOT.unpack_from(self._map, HEADER_SIZE + i * SLOT.size) for i in range(self.capacity)]
+        self._map[HEADER_SIZE:self.data_offset] = bytes(self.index_size)
+        for digest, offset in live:
+            if digest > DELETED:
+                self._insert_slot(digest, offset)
+
+    # vùng dữ liệu
+
+    def _physical(self, offset):
+        return self.data_offset + offset % self.data_size
+
+    def _record(self, offset):
+        return RECORD.unpack_from(self._map, self._physical(offset))
+
+    def _intact(self, offset):
+        # Kiểm tra độ dài trước khi cắt dữ liệu: file có thể hỏng (process chết khi đang ghi, bị ghi từ ngoài).
+        # Bản ghi không bao giờ vắt qua cuối vòng (phần thiếu được lấp bằng PAD)
+        room = self.data_size - offset % self.data_size
+        if room < RECORD.size:
+            return False
+        kind, _, length, key_length, _ = self._record(offset)
+        if kind == PAD:
+            return length == room
+        return kind == ENTRY and RECORD.size + key_length <= length and align(length) <= room
+
+    def _readable(self, offset):
+        head, tail = self._header()[3:5]
+        return tail <= offset < head and self._intact(offset) and self._record(offset)[0] == ENTRY
+
+    def _record_key(self, offset):
+        _, _, _, key_length, _ = self._record(offset)
+        start = self._physical(offset) + RECORD.size
+        return self._map[start:start + key_length]
+
+    def _evict_tail(self, head, tail, count, tombstones):
+        room = self.data_size - tail % self.data_size
+        if room < RECORD.size:
+            return tail + room, count, tombstones
+        if not self._intact(tail):
+            # Không đọc được độ dài để đi tiếp: bỏ toàn bộ vùng dữ liệu cùng bảng băm
+            self._map[HEADER_SIZE:self.data_offset] = bytes(self.index_size)
+            return head, 0, 0
+        kind, digest, length, _, _ = self._record(tail)
+        if kind == PAD:
+            return tail + length, count, tombstones
+        length = align(length)
+        for _, position in self._slots(digest):
+            stored, offset = SLOT.unpack_from(self._map, position)
+            if stored == EMPTY:
+                break
+            if stored == digest and offset == tail:
+                SLOT.pack_into(self._map, position, DELETED, 0)
+                count, tombstones = count - 1, tombstones + 1
+                break
+        return tail + length, count, tombstones
+
+    def _append(self, digest, key, value, expires):
+        size = RECORD.size + len(key) + len(value)
+        length = align(size)
+        if length > self.data_size // 2 or len(key) > 0xFFFF:
+            return None
+        head, tail, count, tombstones = self._header()[3:]
+        room = self.data_size - head % self.data_size
+        padding = room if room < length else 0
+        while tail < head and (self.data_size - (head - tail) < length + padding or count >= self.capacity // 2):
+            tail, count, tombstones = self._evict_tail(head, tail, count, tombstones)
+        if padding:
+            if padding >= RECORD.size:
+                RECORD.pack_into(self._map, self._physical(head), PAD, 0, padding, 0, 0)
+            head += padding
+        start = self._physical(head)
+        RECORD.pack_into(self._map, start, ENTRY, digest, size, len(key), expires)
+        self._map[start + RECORD.size:start + RECORD.size + len(key)] = key
+        self._map[start + RECORD.size + len(key):start + RECORD.size + len(key) + len(value)] = value
+        offset = head
+        self._write_header(head + length, tail, count, tombstones)
+        return offset
+
+    def _value(self, offset):
+        # offset lấy từ _find nên bản ghi đã qua _readable
+        _, _, length, key_length, expires = self._record(offset)
+        start = self._physical(offset) + RECORD.size + key_length
+        return bytes(self._map[start:self._physical(offset) + length]), expires
+
+    # thao tác công khai (gọi trong locked())
+
+    def get(self, key, now):
+        digest = key_hash(key)
+        position, offset = self._find(digest, key)
+        if position is None:
+            return None
+        payload, expires = self._value(offset)
+        if expires and expires <= now:
+            self.delete(key)
+            return None
+        if self._header()[3] - offset > self.data_size * PROMOTE_AFTER:
+            # Còn được dùng nhưng sắp bị loại: chép lên head
+            self.set(key, payload, expires)
+        return payload
+
+    def set(self, key, payload, expires):
+        digest = key_hash(key)
+        self.delete(key)
+        offset = self._append(digest, key, payload, expires)
+        if offset is None:
+            return False
+        head, tail, count, tombstones = self._header()[3:]
+        if self._insert_slot(digest, offset):
+            tombstones -= 1
+        count += 1
+        if count + tombstones > self.capacity * 3 // 4:
+            self._rehash()
+            tombstones = 0
+        self._write_header(head, tail, count, tombstones)
+        return True
+
+    def delete(self, key):
+        position, _ = self._find(key_hash(key), key)
+        if position is None:
+            return False
+        head, tail, count, tombstones = self._header()[3:]
+        SLOT.pack_into(self._map, position, DELETED, 0)
+        self._write_header(head, tail, count - 1, tombstones + 1)
+        return True
+
+    def clear(self):
+        self._reset()
+
+    def stats(self):
+        head, tail, count, tombstones = self._header()[3:]
+        return {'entries': count, 'bytes': head - tail, 'capacity_bytes': self.data_size,
+                'slots': self.capacity, 'tombstones': tombstones}
+
+    def close(self):
+        self._map.close()
+        os.close(self._fd)
+
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class SharedMemoryCache(BaseCache):
+    # Cache dùng chung cho mọi worker trên cùng máy qua một file ánh xạ bộ nhớ (mmap), không cần server ngoài.
+    # LOCATION là đường dẫn file (nên đặt trong /dev/shm); OPTIONS: MAX_SIZE (byte), MAX_ENTRIES
+    pickle_protocol = pickle.HIGHEST_PROTOCOL
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.location = location or os.path.join(tempfile.gettempdir(), 'courseoutline-cache')
+        self.max_size = options.get('MAX_SIZE', 64 * 1024 * 1024)
+        self.max_entries = options.get('MAX_ENTRIES', 65536)
+
+    @property
+    def store(self):
+        with _stores_lock:
+            store = _stores.get(self.location)
+            if store is None or store.pid != os.getpid():
+                # Sau fork phải mở lại file: flock trên fd kế thừa không khóa được giữa cha và con
+                store = _stores[self.location] = SharedMemoryStore(self.location, self.max_size, self.max_entries)
+            return store
+
+    def _key(self, key, version):
+        key = self.make_and_validate_key(key, version=version)
+        return key.encode()
+
+    def _expires(self, timeout):
+        expires = self.get_backend_timeout(timeout)
+        return 0.0 if expires is None else expires
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, payload = self._key(key, version), pickle.dumps(value, self.pickle_protocol)
+        store = self.store
+        with store.locked():
+            if store.get(key, time.time()) is not None:
+                return False
+            return store.set(key, payload, self._expires(timeout))
+
+    def get(self, key, default=None, version=None):
+        key = self._key(key, version)
+        store = self.store
+        with store.locked():
+            payload = store.get(key, time.time())
+        return default if payload is None else pickle.loads(payload)
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key, payload = self._key(key, version), pickle.dumps(value, self.pickle_protocol)
+        store = self.store
+        with store.locked():
+            expires = self._expires(timeout)
+            if expires and expires <= time.time():
+                store.delete(key)
+                return
+            store.set(key, payload, expires)
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self._key(key, version)
+        store = self.store
+        with store.locked():
+            payload = store.get(key, time.time())
+            if payload is None:
+                return False
+            return store.set(key, payload, self._expires(timeout))
+
+    def delete(self, key, version=None):
+        key = self._key(key, version)
+        store = self.store
+        with store.locked():
+            return store.delete(key)
+
+    def has_key(self, key, version=None):
+        key = self._key(key, version)
+        store = self.store
+        with store.locked():
+            return store.get(key, time.time()) is not None
+
+    def incr(self, key, delta=1, version=None):
+        key = self._key(key, version)
+        store = self.store
+        with store.locked():
+            payload = store.get(key, time.time())
+            if payload is None:
+                raise ValueError("Key '%s' not found" % key.decode())
+            value = pickle.loads(payload) + delta
+            expires = store._value(store._find(key_hash(key), key)[1])[1]
+            store.set(key, pickle.dumps(value, self.pickle_protocol), expires)
+        return value
+
+    def clear(self):
+        store = self.store
+        with store.locked():
+            store.clear()
+
+    def stats(self):
+        store = self.store
+        with store.locked():
+            return store.stats()
@@ -0,0 +1,62 @@
+import re
+
+from django.db import router, transaction
+from django.db.models import F
+from django.db.models.signals import post_save, pre_save
+
+# Khóa lạc quan cho đề cương: client gửi lại version đã đọc (If-Match hoặc trường version),
+# UPDATE chỉ thành công khi version trong CSDL chưa đổi
+ETAG = re.compile(r'^(?:W/)?"(\d+)(?:-\w+)?"$')  # CompressionMiddleware thêm -gzip / -br vào ETag
+ANY = '*'  # If-Match: * (RFC 9110): ghi không cần biết version, chỉ cần đề cương còn tồn tại
+
+
+def etag(version):
+    return f'"{version}"'
+
+
+def expected_version(request):
+    # None khi client không gửi; ValueError khi gửi sai định dạng
+    header = request.headers.get('If-Match')
+    if header:
+        if header.strip() == ANY:
+            return ANY
+        match = ETAG.match(header.split(',')[0].strip())
+        if not match:
+            raise ValueError('If-Match must be the ETag of the outline, e.g. "3", or *.')
+        return int(match.group(1))
+    version = request.data.get('version') if hasattr(request.data, 'get') else None
+    if version in (None, ''):
+        return None
+    if not str(version).isdigit():
+        raise ValueError('version must be a non-negative integer.')
+    return int(version)
+
+
+def update(instance, version, values):
+    # Một câu UPDATE ... SET <các cột thay đổi>, version = version + 1 WHERE id = ? AND version = ?
+    # Trả về False nếu đã có người khác ghi trước (version=ANY: nếu dòng đã bị xóa).
+    # Signal pre_save / post_save vẫn được gửi để thống kê, feed, snapshot, chỉ mục gợi ý cập nhật như khi gọi save()
+    fields = {field.name: field for field in instance._meta.concrete_fields}
+    before = {name: getattr(instance, fields[name].attname) for name in values}
+    for name, value in values.items():
+        setattr(instance, name, value)
+    changed = [name for name in values if getattr(instance, fields[name].attname) != before[name]]
+    auto_now = [field.name for field in fields.values() if getattr(field, 'auto_now', False)]
+    update_fields = changed + auto_now
+
+    using = router.db_for_write(type(instance), instance=instance)
+    with transaction.atomic(using=using):
+        pre_save.send(sender=type(instance), instance=instance, raw=False, using=using,
+                      update_fields=frozenset(update_fields))
+        # pre_save của field: tải ảnh lên cloudinary, gán updated_date (auto_now)
+        columns = {fields[name].attname: fields[name].pre_save(instance, False) for name in update_fields}
+        rows = type(instance)._base_manager.using(using).filter(pk=instance.pk)
+        if version != ANY:
+            rows = rows.filter(version=version)
+        if not rows.update(version=F('version') + 1, **columns):
+            transaction.set_rollback(True)
+            return False
+        instance.version = version + 1 if version != ANY else rows.values_list('version', flat=True).get()
+        post_save.send(sender=type(instance), instance=instance, created=False, raw=False, using=using,
+                       update_fields=frozenset(update_fields))
+    return True
@@ -0,0 +1,71 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import F, Max, Min, Value
+
+from courseoutline import autocomplete, feeds
+from courseoutline.bulk import insert_select
+from courseoutline.models import *
+
+TARGETS = {
+    'lessons': (Lesson, Student.lessons.through, 'lesson'),
+    'outlines': (Outline, Student.outline.through, 'outline'),
+}
+
+
+def cohort(year=None, students=None):
+    queryset = Student.objects.filter(active=True)
+    if year is not None:
+        queryset = queryset.filter(course__year=year)
+    if students:
+        queryset = queryset.filter(id__in=students)
+    return queryset
+
+
+def enroll(year=None, students=None, lessons=(), outlines=(), chunk_size=None, progress=None):
+    # Ghi danh cả khóa (hoặc nhóm sinh viên được lọc) theo từng khoảng id sinh viên.
+    # Mỗi khoảng là một transaction gồm vài câu INSERT ... SELECT bỏ qua dòng đã có, nên chạy lại được an toàn.
+    if year is None and not students:
+        raise ValueError('A course year or a list of students is required.')
+    if not lessons and not outlines:
+        raise ValueError('No lessons or outlines provided.')
+    chunk_size = chunk_size or getattr(settings, 'ENROLL_CHUNK_SIZE', 2000)
+
+    items, added = {}, {}
+    report = {'year': year, 'students': 0, 'missing': {}, 'enrolled': {}, 'existing': {}}
+    for name, ids in (('lessons', lessons), ('outlines', outlines)):
+        model = TARGETS[name][0]
+        ids = {int(pk) for pk in ids}
+        items[name] = sorted(model.objects.filter(id__in=ids, active=True).values_list('id', flat=True))
+        report['missing'][name] = sorted(ids - set(items[name]))
+        report['enrolled'][name] = report['existing'][name] = 0
+
+    students = cohort(year, students)
+    bounds = students.aggregate(first=Min('id'), last=Max('id'))
+    report['students'] = students.count()
+    if not report['students']:
+        return report
+
+    start, processed = bounds['first'], 0
+    while start <= bounds['last']:
+        chunk = students.filter(id__gte=start, id__lt=start + chunk_size)
+        with transaction.atomic():
+            for name, ids in items.items():
+                through, column = TARGETS[name][1:]
+                for pk in ids:
+                    rows = insert_select(through, chunk, ignore_conflicts=True, student=F('id'), **{column: Value(pk)})
+                    report['enrolled'][name] += rows
+                    if name == 'outlines':
+                        added[pk] = added.get(pk, 0) + rows
+            processed += chunk.count()
+        start += chunk_size
+        if progress:
+            progress(processed, report)
+
+    for outline_id in items['outlines']:
+        feeds.refresh_outline(outline_id)
+        # INSERT ... SELECT không phát m2m_changed: tự tăng độ phổ biến trong chỉ mục gợi ý
+        if added.get(outline_id):
+            autocomplete.popular('outline', outline_id, added[outline_id])
+    for name, ids in items.items():
+        report['existing'][name] = report['students'] * len(ids) - report['enrolled'][name]
+    return report
@@ -0,0 +1,54 @@
+from django.db import transaction
+from django.db.models import F, Q
+
+from courseoutline.bulk import insert_select
+from courseoutline.models import *
+
+CourseOutline = Outline.course.through
+StudentOutline = Student.outline.through
+
+
+def cohort_rows(**lookup):
+    # Đề cương của khóa: đã duyệt, gắn với khóa và thuộc một môn học của chính khóa đó
+    return CourseOutline.objects.filter(outline__active=True, outline__is_approved=True,
+                                        outline__lesson__course=F('course_id'), **lookup)
+
+
+def personal_rows(**lookup):
+    return StudentOutline.objects.filter(outline__active=True, outline__is_approved=True, **lookup)
+
+
+@transaction.atomic
+def refresh_course(course_id):
+    FeedEntry.objects.filter(course_id=course_id, student=None).delete()
+    insert_select(FeedEntry, cohort_rows(course_id=course_id), course=F('course_id'), outline=F('outline_id'))
+
+
+@transaction.atomic
+def refresh_outline(outline_id):
+    FeedEntry.objects.filter(outline_id=outline_id).delete()
+    insert_select(FeedEntry, cohort_rows(outline_id=outline_id), course=F('course_id'), outline=F('outline_id'))
+    insert_select(FeedEntry, personal_rows(outline_id=outline_id),
+                  course=F('student__course_id'), outline=F('outline_id'), student=F('student_id'))
+
+
+@transaction.atomic
+def refresh_student(student_id):
+    FeedEntry.objects.filter(student_id=student_id).delete()
+    insert_select(FeedEntry, personal_rows(student_id=student_id),
+                  course=F('student__course_id'), outline=F('outline_id'), student=F('student_id'))
+
+
+@transaction.atomic
+def rebuild():
+    FeedEntry.objects.all().delete()
+    insert_select(FeedEntry, cohort_rows(), course=F('course_id'), outline=F('outline_id'))
+    insert_select(FeedEntry, personal_rows(),
+                  course=F('student__course_id'), outline=F('outline_id'), student=F('student_id'))
+    return FeedEntry.objects.count()
+
+
+def student_feed(student):
+    # Id đề cương của sinh viên, không trùng lặp: cả khóa của sinh viên cộng với đề cương tự đăng ký
+    return FeedEntry.objects.filter(Q(student=None) | Q(student=student), course_id=student.course_id) \
+        .values('outline_id').distinct()
@@ -0,0 +1,245 @@
+import csv
+import io
+import json
+import zipfile
+from itertools import islice
+
+from django.conf import settings
+from django.db import connection, transaction
+from rest_framework.exceptions import ValidationError
+
+from courseoutline import autocomplete, feeds, snapshots, stats
+from courseoutline.models import *
+from courseoutline.serializers import ImportOutlineSerializer
+
+FORMATS = ('csv', 'xlsx', 'json', 'jsonl')
+
+
+def detect_format(filename):
+    extension = filename.rsplit('.', 1)[-1].lower()
+    if extension == 'ndjson':
+        return 'jsonl'
+    if extension not in FORMATS:
+        raise ValueError(f'Unsupported file type ".{extension}", expected one of: {", ".join(FORMATS)}.')
+    return extension
+
+
+class InvalidRow(str):
+    # Dòng không đọc được (vd một dòng JSONL hỏng): báo lỗi cho riêng dòng đó, các dòng khác vẫn được nhập
+    pass
+
+
+# Các hàm đọc file trả về từng (số dòng, dict) để không phải nạp cả file vào bộ nhớ
+
+def read_csv(file):
+    reader = csv.DictReader(io.TextIOWrapper(file, encoding='utf-8-sig', newline=''))
+    for row in reader:
+        yield reader.line_num, row
+
+
+def read_xlsx(file):
+    from openpyxl import load_workbook
+
+    workbook = load_workbook(file, read_only=True, data_only=True)
+    try:
+        rows = workbook.active.iter_rows(values_only=True)
+        header = [str(cell).strip() if cell is not None else '' for cell in next(rows, ())]
+        for line, values in enumerate(rows, start=2):
+            if any(value not in (None, '') for value in values):
+                yield line, dict(zip(header, values))
+    finally:
+        workbook.close()
+
+
+def read_jsonl(file):
+    for line, text in enumerate(io.TextIOWrapper(file, encoding='utf-8-sig'), start=1):
+        if text.strip():
+            try:
+                yield line, json.loads(text)
+            except json.JSONDecodeError as ex:
+                yield line, InvalidRow(f'Invalid JSON: {ex}')
+
+
+def read_json(file, chunk_size=64 * 1024):
+    # Đọc mảng JSON cấp ngoài cùng theo từng phần tử bằng raw_decode trên bộ đệm
+    decoder = json.JSONDecoder()
+    text = io.TextIOWrapper(file, encoding='utf-8-sig')
+    buffer, position, index, started = '', 0, 0, False
+    while True:
+        chunk = text.read(chunk_size)
+        buffer = buffer[position:] + chunk
+        position = 0
+        while True:
+            while position < len(buffer) and buffer[position] in ' \t\r\n,':
+                position += 1
+            if not started and position < len(buffer):
+                if buffer[position] != '[':
+                    raise ValueError('JSON file must contain an array of outlines.')
+                started = True
+                position += 1
+                continue
+            if position < len(buffer) and buffer[position] == ']':
+                return
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if not chunk:
+                    raise
+                break
+            index += 1
+            position = end
+            yield index, item
+        if not chunk:
+            return
+
+
+READERS = {'csv': read_csv, 'xlsx': read_xlsx, 'json': read_json, 'jsonl': read_jsonl}
+
+
+def normalize(row):
+    # Trong file bảng tính: course = "2023;2024", evaluation = "Giữa kỳ:40;Cuối kỳ:60"
+    row = {key.strip().lower(): value for key, value in row.items() if key}
+    courses = row.get('course')
+    if isinstance(courses, (str, int, float)):
+        row['course'] = [c.strip() for c in str(courses).split(';') if c.strip()]
+    elif courses is None:
+        row.pop('course', None)
+    evaluations = row.get('evaluation')
+    if isinstance(evaluations, str):
+        row['evaluation'] = [dict(zip(('method', 'percentage', 'note'), item.strip().split(':', 2)))
+                             for item in evaluations.split(';') if item.strip()]
+    elif evaluations is None:
+        row.pop('evaluation', None)
+    for key in ('lesson', 'lecturer'):
+        if row.get(key) in (None, ''):
+            row.pop(key, None)
+    return row
+
+
+def int_values(rows, key):
+    values = set()
+    for row in rows:
+        try:
+            values.add(int(row[key]))
+        except (KeyError, TypeError, ValueError):
+            pass
+    return values
+
+
+def resolve_evaluations(pairs):
+    # Đánh giá dùng chung theo (phương thức, tỉ lệ) giống add_evaluation: thiếu thì tạo mới một lần cho cả lô
+    def lookup():
+        found = {}
+        for evaluation in Evaluation.objects.filter(method__in={m for m, _ in pairs},
+                                                    percentage__in={p for _, p in pairs}).order_by('id'):
+            found.setdefault((evaluation.method, evaluation.percentage), evaluation)
+        return found
+
+    found = lookup() if pairs else {}
+    missing = [Evaluation(method=method, percentage=percentage, note=note)
+               for (method, percentage), note in pairs.items() if (method, percentage) not in found]
+    if missing:
+        Evaluation.objects.bulk_create(missing)
+        found = lookup()
+    return found
+
+
+def resolve_courses(years):
+    found = Course.objects.in_bulk(years, field_name='year') if years else {}
+    missing = [Course(year=year) for year in years if year not in found]
+    if missing:
+        Course.objects.bulk_create(missing, ignore_conflicts=True)
+        found = Course.objects.in_bulk(years, field_name='year')
+    return found
+
+
+def insert_outlines(outlines):
+    if connection.features.can_return_rows_from_bulk_insert:
+        return Outline.objects.bulk_create(outlines)
+    # MySQL không trả về id khi bulk_create nên phải INSERT từng dòng (vẫn trong cùng transaction của lô)
+    for outline in outlines:
+        outline.save(force_insert=True)
+    return outlines
+
+
+def write(validated):
+    pairs = {(e['method'], e['percentage']): e['note'] for attrs in validated for e in attrs['evaluation']}
+    evaluations = resolve_evaluations(pairs)
+    courses = resolve_courses({year for attrs in validated for year in attrs['course']})
+
+    outlines = insert_outlines([
+        Outline(**{key: value for key, value in attrs.items() if key not in ('course', 'evaluation')})
+        for attrs in validated])
+    Outline.evaluation.through.objects.bulk_create([
+        Outline.evaluation.through(outline_id=outline.pk,
+                                   evaluation_id=evaluations[(e['method'], e['percentage'])].pk)
+        for outline, attrs in zip(outlines, validated) for e in attrs['evaluation']], ignore_conflicts=True)
+    Outline.course.through.objects.bulk_create([
+        Outline.course.through(outline_id=outline.pk, course_id=courses[year].pk)
+        for outline, attrs in zip(outlines, validated) for year in attrs['course']], ignore_conflicts=True)
+    for course in courses.values():
+        feeds.refresh_course(course.pk)
+    if connection.features.can_return_rows_from_bulk_insert:
+        # bulk_create không phát post_save: tự cập nhật thống kê và chỉ mục gợi ý
+        created = Outline.objects.filter(pk__in=[outline.pk for outline in outlines])
+        stats.add_outlines(created)
+        autocomplete.outlines_added(created)
+    else:
+        # MySQL lưu từng dòng nên post_save đã chạy, chỉ còn các quan hệ m2m chèn hàng loạt ở trên
+        for outline, attrs in zip(outlines, validated):
+            stats.course_links(1, outline, False, [courses[year].pk for year in attrs['course']])
+            stats.evaluation_links(1, outline, False, [evaluations[(e['method'], e['percentage'])].pk
+                                                       for e in attrs['evaluation']])
+    snapshots.schedule(course.pk for course in courses.values())
+
+
+def validate_batch(batch, lecturer=None):
+    rows = [row for _, row in batch if isinstance(row, dict)]
+    context = {
+        'lecturer': lecturer,
+        'lessons': Lesson.objects.in_bulk(int_values(rows, 'lesson')),
+        'lecturers': Lecturer.objects.in_bulk(int_values(rows, 'lecturer')) if lecturer is None else {},
+    }
+    serializer = ImportOutlineSerializer(context=context)
+    validated, errors = [], []
+    for line, row in batch:
+        if isinstance(row, InvalidRow):
+            errors.append({'row': line, 'errors': [str(row)]})
+            continue
+        try:
+            validated.append(serializer.run_validation(row))
+        except ValidationError as ex:
+            errors.append({'row': line, 'errors': ex.detail})
+    return validated, errors
+
+
+def import_outlines(file, fmt, lecturer=None, dry_run=False, batch_size=None, progress=None):
+    # Đọc, kiểm tra và ghi theo từng lô; dòng lỗi được ghi vào báo cáo, các dòng hợp lệ của lô vẫn được ghi
+    batch_size = batch_size or getattr(settings, 'IMPORT_BATCH_SIZE', 500)
+    max_errors = getattr(settings, 'IMPORT_MAX_ERRORS', 1000)
+    rows = READERS[fmt](file)
+    report = {'rows': 0, 'created': 0, 'failed': 0, 'errors': []}
+    while True:
+        batch = []
+        try:
+            for line, row in islice(rows, batch_size):
+                batch.append((line, normalize(row) if isinstance(row, dict) else row))
+        except (ValueError, csv.Error, zipfile.BadZipFile) as ex:
+            report['errors'].append({'row': None, 'errors': [f'Could not parse file: {ex}']})
+        if not batch:
+            break
+
+        validated, errors = validate_batch(batch, lecturer)
+        if validated and not dry_run:
+            with transaction.atomic():
+                write(validated)
+        report['rows'] += len(batch)
+        report['created'] += len(validated)
+        report['failed'] += len(errors)
+        report['errors'].extend(errors[:max(0, max_errors - len(report['errors']))])
+        if progress:
+            progress(report)
+        if len(batch) < batch_size:
+            break
+    report['dry_run'] = dry_run
+    return report
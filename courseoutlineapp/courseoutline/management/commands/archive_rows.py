@@ -0,0 +1,38 @@
+from django.apps import apps
+from django.core.management.base import BaseCommand, CommandError
+
+from courseoutline import archive
+
+
+class Command(BaseCommand):
+    help = 'Chuyển các dòng cũ (theo ARCHIVE_POLICIES) khỏi bảng chính sang bảng lưu trữ, hoặc khôi phục lại'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--policy', action='append', choices=sorted(archive.POLICIES),
+                            help='Chỉ chạy chính sách này (lặp lại được), mặc định ARCHIVE_POLICIES')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ đếm số dòng sẽ được lưu trữ')
+        parser.add_argument('--restore', metavar='MODEL:ID[,ID...]',
+                            help='Khôi phục dòng đã lưu trữ, vd courseoutline.outline:12,13')
+
+    def handle(self, *args, **options):
+        if options['restore']:
+            return self.restore(options['restore'])
+        progress = lambda name, done: self.stdout.write(f'{name}: {done} archived...')
+        report = archive.archive(options['policy'], batch_size=options['batch_size'], dry_run=options['dry_run'],
+                                 progress=None if options['dry_run'] else progress)
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        for name, count in report.items():
+            self.stdout.write(f'{prefix}{name}: {count} rows')
+
+    def restore(self, value):
+        try:
+            label, ids = value.split(':', 1)
+            model = apps.get_model(label)
+            ids = [int(pk) for pk in ids.split(',')]
+        except (ValueError, LookupError) as ex:
+            raise CommandError(f'Invalid --restore value {value!r}: {ex}')
+        result = archive.restore(model, ids)
+        self.stdout.write(f"restored {len(result['restored'])}, missing {result['missing']}")
+        for failure in result['failed']:
+            self.stderr.write(f"{failure['id']}: {failure['error']}")
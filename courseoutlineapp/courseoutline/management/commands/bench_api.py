@@ -0,0 +1,119 @@
+import itertools
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.urls import reverse
+from rest_framework.test import APIClient
+
+from courseoutline import benchmarks, concurrency
+from courseoutline.middleware import QueryCounter
+from courseoutline.models import *
+from courseoutline.urls import r
+
+# Các endpoint ghi: (tên url, method, vai trò, hàm sinh payload). PUT / PATCH gửi kèm If-Match (khóa lạc quan)
+WRITES = {
+    'outlines-create-outline': ('post', 'lecturer', lambda ctx, i: {
+        'name': f'Bench {i}', 'credit': 3, 'overview': 'bench', 'lesson': ctx['lesson'].id}),
+    'outlines-add-comment': ('post', 'student', lambda ctx, i: {'content': f'bench {i}'}),
+    'outlines-approve-outline': ('post', 'admin', lambda ctx, i: {}),
+    'outlines-detail': ('patch', 'lecturer', lambda ctx, i: {'name': f'Bench {i}'}),
+    'lessons-create-lesson': ('post', 'lecturer', lambda ctx, i: {
+        'subject': f'Bench {i}', 'category': ctx['lesson'].category_id}),
+}
+
+
+class Command(BaseCommand):
+    help = 'Đo độ trễ (p50/p95/p99) và số truy vấn của các endpoint trong router trên SQLite'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=30)
+        parser.add_argument('--only', nargs='*', help='Chỉ đo các url name này')
+        parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+        parser.add_argument('--baseline', help='File JSON kết quả trước để so sánh')
+        parser.add_argument('--tolerance', type=float, default=0.2, help='Ngưỡng chậm hơn baseline (0.2 = 20%%)')
+        parser.add_argument('--fail-on-regression', action='store_true')
+
+    def handle(self, *args, **options):
+        with benchmarks.bench_database(options['scale'], self.stderr):
+            results, skipped = self.run(options)
+
+        report = {'scale': options['scale'], 'iterations': options['iterations'],
+                  'results': results, 'skipped': skipped}
+        regressions = []
+        if options['baseline']:
+            regressions = benchmarks.compare(results, benchmarks.load(options['baseline']), options['tolerance'])
+            report['regressions'] = regressions
+
+        benchmarks.dump(report, options['output'], self.stdout)
+        if regressions and options['fail_on_regression']:
+            raise CommandError(f'{len(regressions)} regression(s) against baseline')
+
+    def context(self):
+        outline = Outline.objects.filter(active=True).order_by('id').first()
+        lecturer, student = outline.lecturer, Student.objects.order_by('id').first()
+        admin = Account.objects.create_superuser(email='bench@example.com', password='bench', username='bench')
+        lecturer.account = Account.objects.create_user(email='l@example.com', password='bench', username='bench-l',
+                                                       role=Account.Role.LECTURER, is_approved=True)
+        Lecturer.objects.filter(pk=lecturer.pk).update(account=lecturer.account)
+        student_account = Account.objects.create_user(email='s@example.com', password='bench', username='bench-s',
+                                                      role=Account.Role.STUDENT, is_approved=True)
+        Student.objects.filter(pk=student.pk).update(account=student_account)
+        return {'outline': outline, 'lesson': outline.lesson,
+                'users': {'admin': admin, 'lecturer': lecturer.account, 'student': student_account}}
+
+    def endpoints(self, only):
+        seen = set()
+        for pattern in r.urls:
+            name = pattern.name
+            if name in seen or 'format' in pattern.pattern.regex.groupindex:
+                continue
+            seen.add(name)
+            if only and name not in only:
+                continue
+            actions = getattr(pattern.callback, 'actions', None) or {'get': 'root'}
+            needs_pk = 'pk' in pattern.pattern.regex.groupindex
+            yield name, actions, needs_pk
+
+    def run(self, options):
+        ctx = self.context()
+        client = APIClient()
+        results, skipped = {}, []
+        counter = itertools.count()
+
+        for name, actions, needs_pk in self.endpoints(options['only']):
+            kwargs = {'pk': ctx['outline'].pk} if needs_pk else {}
+            if 'get' in actions:
+                method, role, payload = 'get', 'admin', None
+            elif name in WRITES:
+                method, role, payload = WRITES[name]
+            else:
+                skipped.append(name)
+                continue
+            try:
+                url = reverse(name, kwargs=kwargs)
+            except Exception:
+                skipped.append(name)
+                continue
+
+            client.force_authenticate(ctx['users'][role])
+            statuses = set()
+            if method in ('put', 'patch'):
+                # Đọc version hiện tại (các endpoint trước có thể đã tăng nó), sau đó lấy ETag của mỗi response
+                ctx['etag'] = concurrency.etag(Outline.objects.values_list('version', flat=True).get(**kwargs))
+
+            def call():
+                data = payload(ctx, next(counter)) if payload else None
+                extra = {'HTTP_IF_MATCH': ctx['etag']} if method in ('put', 'patch') else {}
+                response = getattr(client, method)(url, data, format='json' if data is not None else None, **extra)
+                statuses.add(response.status_code)
+                if extra and response.has_header('ETag'):
+                    ctx['etag'] = response['ETag']
+
+            queries = QueryCounter()
+            with connection.execute_wrapper(queries):
+                call()
+            samples = benchmarks.timed(call, options['iterations'])
+            results[name] = benchmarks.summarize(samples, method=method.upper(), url=url,
+                                                 queries=queries.count, status=sorted(statuses))
+        return results, skipped
@@ -0,0 +1,56 @@
+import asyncio
+import time
+
+from django.core.management.base import BaseCommand
+from django.test import AsyncClient
+
+from courseoutline import benchmarks
+from courseoutline.models import Outline
+
+# (tên, url đồng bộ, url async)
+PAIRS = [
+    ('outlines-list', '/outlines/', '/async/outlines/'),
+    ('outlines-get-comment', '/outlines/{pk}/comment/', '/async/outlines/{pk}/comment/'),
+    ('lessons-list', '/lessons/', '/async/lessons/'),
+    ('categories-list', '/categories/', '/async/categories/'),
+]
+
+
+class Command(BaseCommand):
+    help = 'So sánh độ trễ và thông lượng của view đồng bộ và async khi có nhiều request đồng thời (ASGI)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000)
+        parser.add_argument('--concurrency', type=int, default=50)
+        parser.add_argument('--requests', type=int, default=500)
+        parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+
+    def handle(self, *args, **options):
+        with benchmarks.bench_database(options['scale'], self.stderr):
+            pk = Outline.objects.filter(active=True).order_by('id').values_list('id', flat=True).first()
+            results = {}
+            for name, sync_url, async_url in PAIRS:
+                for kind, url in (('sync', sync_url), ('async', async_url)):
+                    results[f'{name}:{kind}'] = asyncio.run(self.load(url.format(pk=pk), options))
+
+        benchmarks.dump({'scale': options['scale'], 'concurrency': options['concurrency'],
+                         'requests': options['requests'], 'results': results}, options['output'], self.stdout)
+
+    async def load(self, url, options):
+        client = AsyncClient()
+        semaphore = asyncio.Semaphore(options['concurrency'])
+        samples, statuses = [], set()
+
+        async def one():
+            async with semaphore:
+                start = time.perf_counter()
+                response = await client.get(url)
+                samples.append(time.perf_counter() - start)
+                statuses.add(response.status_code)
+
+        await client.get(url)  # làm nóng
+        start = time.perf_counter()
+        await asyncio.gather(*(one() for _ in range(options['requests'])))
+        elapsed = time.perf_counter() - start
+        return benchmarks.summarize(samples, url=url, status=sorted(statuses),
+                                    throughput_rps=round(len(samples) / elapsed, 1))
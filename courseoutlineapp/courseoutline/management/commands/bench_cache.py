@@ -0,0 +1,93 @@
+import multiprocessing
+import os
+import random
+import shutil
+import tempfile
+import time
+
+from django.core.cache.backends.filebased import FileBasedCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management.base import BaseCommand, CommandError
+
+from courseoutline import benchmarks
+from courseoutline.cache import SharedMemoryCache
+
+
+def backends(directory, max_entries):
+    params = {'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': max_entries}}
+    return {
+        'locmem': lambda: LocMemCache('bench', params),
+        'filebased': lambda: FileBasedCache(os.path.join(directory, 'files'), params),
+        'shared': lambda: SharedMemoryCache(os.path.join(directory, 'shared.bin'), {
+            'TIMEOUT': None, 'OPTIONS': {'MAX_ENTRIES': max_entries, 'MAX_SIZE': 256 * 1024 * 1024}}),
+    }
+
+
+def payload(i):
+    # Giống dữ liệu /outlines/{id}/bundle/: đề cương kèm vài bình luận
+    return {'outline': {'id': i, 'name': f'Đề cương {i}', 'overview': 'x' * 800, 'credit': 3},
+            'comments': [{'id': j, 'content': 'y' * 120} for j in range(5)]}
+
+
+def worker(args):
+    # Mỗi worker đọc key theo phân bố lệch (vài key rất nóng), trượt thì "tính" lại và ghi vào cache
+    name, directory, seed, operations, keys = args
+    cache = backends(directory, keys * 2)[name]()
+    rnd = random.Random(seed)
+    hits = 0
+    start = time.perf_counter()
+    for _ in range(operations):
+        key = f'outline:{int(keys * rnd.random() ** 2)}'
+        if cache.get(key) is not None:
+            hits += 1
+        else:
+            cache.set(key, payload(key))
+    return hits, time.perf_counter() - start
+
+
+class Command(BaseCommand):
+    help = 'So sánh cache locmem, file và bộ nhớ dùng chung (mmap) giữa nhiều worker process'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=4)
+        parser.add_argument('--operations', type=int, default=20000, help='Số lần get mỗi worker')
+        parser.add_argument('--keys', type=int, default=5000)
+        parser.add_argument('--iterations', type=int, default=2000)
+        parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+
+    def handle(self, *args, **options):
+        try:
+            context = multiprocessing.get_context('fork')
+        except ValueError:
+            raise CommandError('This benchmark needs the fork start method (Linux/macOS).')
+
+        directory = tempfile.mkdtemp(prefix='bench-cache-')
+        results = {}
+        try:
+            for name, factory in backends(directory, options['keys'] * 2).items():
+                cache = factory()
+                value = payload(1)
+                cache.set('warm', value)
+                results[f'{name}:set'] = benchmarks.summarize(
+                    benchmarks.timed(lambda: cache.set('warm', value), options['iterations']))
+                results[f'{name}:get'] = benchmarks.summarize(
+                    benchmarks.timed(lambda: cache.get('warm'), options['iterations']))
+                cache.clear()
+
+                jobs = [(name, directory, seed, options['operations'], options['keys'])
+                        for seed in range(options['workers'])]
+                start = time.perf_counter()
+                with context.Pool(options['workers']) as pool:
+                    outcome = pool.map(worker, jobs)
+                elapsed = time.perf_counter() - start
+                total = options['workers'] * options['operations']
+                results[f'{name}:workers'] = {
+                    'workers': options['workers'],
+                    'hit_rate': round(sum(hits for hits, _ in outcome) / total, 4),
+                    'throughput_ops': round(total / elapsed, 1),
+                }
+                cache.clear()
+        finally:
+            shutil.rmtree(directory, ignore_errors=True)
+        benchmarks.dump({'options': {k: options[k] for k in ('workers', 'operations', 'keys')},
+                         'results': results}, options['output'], self.stdout)
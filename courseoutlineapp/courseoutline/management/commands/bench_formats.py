@@ -0,0 +1,57 @@
+import gzip
+import io
+
+import brotli
+from django.core.management.base import BaseCommand
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from courseoutline import benchmarks, paginators, serializers
+from courseoutline.models import *
+from courseoutline.parsers import CBORParser, MessagePackParser
+from courseoutline.renderers import CBORRenderer, MessagePackRenderer
+
+FORMATS = {
+    'json': (JSONRenderer, JSONParser),
+    'msgpack': (MessagePackRenderer, MessagePackParser),
+    'cbor': (CBORRenderer, CBORParser),
+}
+
+
+class Command(BaseCommand):
+    help = 'So sánh thời gian encode/decode và kích thước payload JSON, MessagePack, CBOR'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=200)
+        parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+
+    def handle(self, *args, **options):
+        with benchmarks.bench_database(options['scale'], self.stderr):
+            outlines = Outline.objects.filter(active=True).prefetch_related('course', 'evaluation')
+            outline = outlines.first()
+            payloads = {
+                'outlines-page': serializers.OutlineSerializer(
+                    outlines[:paginators.ItemPaginator.page_size], many=True).data,
+                'outlines-download': serializers.OutlineSerializer(outlines.filter(is_approved=True), many=True).data,
+                'comments-page': serializers.CommentSerializer(
+                    outline.comment_set.all()[:paginators.CommentPaginator.page_size], many=True).data,
+            }
+
+        results = {}
+        for name, data in payloads.items():
+            for fmt, (renderer_class, parser_class) in FORMATS.items():
+                results[f'{name}:{fmt}'] = self.measure(data, renderer_class(), parser_class(), options['iterations'])
+        benchmarks.dump({'scale': options['scale'], 'results': results}, options['output'], self.stdout)
+
+    def measure(self, data, renderer, parser, iterations):
+        body = renderer.render(data)
+        encode = benchmarks.timed(lambda: renderer.render(data), iterations)
+        decode = benchmarks.timed(lambda: parser.parse(io.BytesIO(body)), iterations)
+        return {
+            'bytes': len(body),
+            'gzip_bytes': len(gzip.compress(body)),
+            'brotli_bytes': len(brotli.compress(body, quality=5)),
+            'encode': benchmarks.summarize(encode),
+            'decode': benchmarks.summarize(decode),
+        }
@@ -0,0 +1,49 @@
+from django.core.management.base import BaseCommand
+from rest_framework.renderers import JSONRenderer
+
+from courseoutline import benchmarks, serializers
+from courseoutline.models import *
+
+# (tên, serializer gốc, serializer nhanh, hàm lấy queryset)
+CASES = [
+    ('outlines-download', serializers.OutlineSerializer, serializers.FastOutlineSerializer,
+     lambda: Outline.objects.filter(active=True, is_approved=True)),
+    ('lessons', serializers.LessonSerializer, serializers.FastLessonSerializer,
+     lambda: Lesson.objects.filter(active=True)),
+    ('categories', serializers.CategorySerializer, serializers.FastCategorySerializer,
+     lambda: Category.objects.all()),
+    ('comments', serializers.CommentSerializer, serializers.FastCommentSerializer,
+     lambda: Comment.objects.all()[:500]),
+]
+
+
+class Command(BaseCommand):
+    help = 'So sánh ModelSerializer với đường đọc nhanh dựa trên .values()'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000)
+        parser.add_argument('--iterations', type=int, default=20)
+        parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+
+    def handle(self, *args, **options):
+        results = {}
+        with benchmarks.bench_database(options['scale'], self.stderr):
+            for name, serializer_class, fast_class, queryset in CASES:
+                # ModelSerializer gốc chạy như trong view: queryset mới mỗi lần, không prefetch sẵn
+                def model():
+                    return JSONRenderer().render(serializer_class(queryset(), many=True).data)
+
+                def fast():
+                    return JSONRenderer().render(fast_class(fast_class.queryset(queryset())).data)
+
+                model_samples = benchmarks.timed(model, options['iterations'])
+                fast_samples = benchmarks.timed(fast, options['iterations'])
+                results[name] = {
+                    'rows': queryset().count(),
+                    'identical': model() == fast(),
+                    'model': benchmarks.summarize(model_samples),
+                    'fast': benchmarks.summarize(fast_samples),
+                    'speedup': round(benchmarks.percentile(model_samples, 50)
+                                     / benchmarks.percentile(fast_samples, 50), 2),
+                }
+        benchmarks.dump({'scale': options['scale'], 'results': results}, options['output'], self.stdout)
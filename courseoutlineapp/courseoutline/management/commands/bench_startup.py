@@ -0,0 +1,82 @@
+import json
+import os
+import subprocess
+import sys
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from courseoutline import benchmarks
+
+# Chạy trong process mới để đo khởi động "nguội": import + django.setup(), nạp urlconf, rồi request đầu tiên
+PROBE = '''
+import json, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup = time.perf_counter()
+from django.test.utils import setup_test_environment
+from django.urls import get_resolver
+get_resolver().url_patterns
+urls = time.perf_counter()
+setup_test_environment()
+from django.test import Client
+client = Client()
+result = {'setup': setup - start, 'urls': urls - setup, 'modules': len(sys.modules)}
+for path in sys.argv[1:]:
+    began = time.perf_counter()
+    status = client.get(path).status_code
+    first = time.perf_counter()
+    client.get(path)
+    result[path] = {'status': status, 'first': first - began, 'warm': time.perf_counter() - first}
+result['total'] = time.perf_counter() - start
+print(json.dumps(result))
+'''
+
+
+def parse_importtime(text, top):
+    # Dòng "import time: self [us] | cumulative | tên module"; lấy các module tự tốn nhiều thời gian nhất
+    modules = []
+    for line in text.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        own, cumulative, name = line[len('import time:'):].split('|')
+        modules.append({'module': name.strip(), 'self_ms': round(int(own) / 1000, 2),
+                        'cumulative_ms': round(int(cumulative) / 1000, 2)})
+    return sorted(modules, key=lambda m: m['self_ms'], reverse=True)[:top]
+
+
+class Command(BaseCommand):
+    help = 'Đo thời gian khởi động: import, django.setup(), nạp urlconf và request đầu tiên trong process mới'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--runs', type=int, default=5)
+        parser.add_argument('--path', action='append', help='Các URL gọi sau khi khởi động (mặc định /swagger.json)')
+        parser.add_argument('--top', type=int, default=15, help='Số module import chậm nhất được liệt kê')
+        parser.add_argument('--output', help='Ghi kết quả JSON ra file')
+
+    def probe(self, paths, importtime=False):
+        env = dict(os.environ, DJANGO_SETTINGS_MODULE=settings.SETTINGS_MODULE)
+        command = [sys.executable] + (['-X', 'importtime'] if importtime else []) + ['-c', PROBE] + paths
+        process = subprocess.run(command, capture_output=True, text=True, env=env, cwd=settings.BASE_DIR)
+        if process.returncode:
+            raise CommandError(process.stderr[-2000:])
+        return json.loads(process.stdout.strip().splitlines()[-1]), process.stderr
+
+    def handle(self, *args, **options):
+        paths = options['path'] or ['/swagger.json']
+        runs = [self.probe(paths)[0] for _ in range(options['runs'])]
+        results = {
+            'setup': benchmarks.summarize([run['setup'] for run in runs]),
+            'urls': benchmarks.summarize([run['urls'] for run in runs]),
+            'total': benchmarks.summarize([run['total'] for run in runs]),
+        }
+        for path in paths:
+            results[f'{path}:first'] = benchmarks.summarize([run[path]['first'] for run in runs],
+                                                            status=runs[0][path]['status'])
+            results[f'{path}:warm'] = benchmarks.summarize([run[path]['warm'] for run in runs])
+        _, imports = self.probe(paths, importtime=True)
+        benchmarks.dump({'options': {'runs': options['runs'], 'paths': paths, 'modules': runs[0]['modules']},
+                         'results': results,
+                         'slowest_imports': parse_importtime(imports, options['top'])},
+                        options['output'], self.stdout)
@@ -0,0 +1,38 @@
+import itertools
+import random
+import tracemalloc
+
+from django.core.management.base import BaseCommand
+
+from courseoutline import autocomplete, benchmarks
+
+
+class Command(BaseCommand):
+    help = 'Tính lại snapshot của chỉ mục gợi ý tìm kiếm (autocomplete), tùy chọn đo thời gian tra cứu'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output', help='Đường dẫn snapshot, mặc định AUTOCOMPLETE_SNAPSHOT')
+        parser.add_argument('--bench', type=int, default=0, metavar='N', help='Đo N lần tra cứu tiền tố ngẫu nhiên')
+
+    def handle(self, *args, **options):
+        created, rows = autocomplete.build(options['output'])
+        self.stdout.write(f'{len(rows)} entries at {created.isoformat()}')
+        if options['bench'] and rows:
+            self.bench(rows, options['bench'])
+
+    def bench(self, rows, iterations):
+        # Bộ nhớ của index (tracemalloc) và thời gian tra cứu theo độ dài tiền tố
+        tracemalloc.start()
+        index = autocomplete.new_index()
+        index.load(rows)
+        memory = tracemalloc.get_traced_memory()[0]
+        tracemalloc.stop()
+        rnd = random.Random(0)
+        labels = [autocomplete.fold(label) for _, _, label, _ in rows]
+        results = {}
+        for length in (1, 3, 6):
+            prefixes = itertools.cycle(label[:length] for label in rnd.choices(labels, k=iterations))
+            results[f'prefix-{length}'] = benchmarks.summarize(
+                benchmarks.timed(lambda: index.search(next(prefixes)), iterations))
+        benchmarks.dump({'entries': len(index), 'keys': sum(map(len, index.keys.values())), 'memory_bytes': memory,
+                         'results': results}, stdout=self.stdout)
@@ -0,0 +1,15 @@
+from django.core.management.base import BaseCommand
+
+from courseoutline import openapi
+
+
+class Command(BaseCommand):
+    help = 'Sinh sẵn schema OpenAPI (swagger.json, swagger.yaml) để phục vụ dạng file tĩnh, chạy khi deploy'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--output-dir', help='Mặc định là OPENAPI_SCHEMA_DIR')
+        parser.add_argument('--url', help='URL gốc của API ghi vào schema, vd https://api.example.com')
+
+    def handle(self, *args, **options):
+        for path in openapi.build(options['output_dir'], options['url']):
+            self.stdout.write(f'{path} ({path.stat().st_size} bytes)')
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from courseoutline import snapshots
+from courseoutline.models import Course
+
+
+class Command(BaseCommand):
+    help = 'Build gói SQLite offline cho từng khóa học (bỏ qua khóa không thay đổi)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--year', type=int, action='append', help='Chỉ build các khóa này')
+        parser.add_argument('--force', action='store_true', help='Build lại kể cả khi dữ liệu không đổi')
+
+    def handle(self, *args, **options):
+        courses = Course.objects.filter(active=True).order_by('year')
+        if options['year']:
+            courses = courses.filter(year__in=options['year'])
+        for course in courses:
+            latest = course.snapshots.first()
+            snapshot = snapshots.build(course, force=options['force'])
+            state = 'unchanged' if latest and latest.pk == snapshot.pk else 'built'
+            self.stdout.write(f'{course.year}: v{snapshot.version} {state} '
+                              f'({snapshot.outlines} outlines, {snapshot.size} bytes)')
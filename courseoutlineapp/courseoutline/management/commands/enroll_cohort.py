@@ -0,0 +1,28 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courseoutline import enrollment
+
+
+class Command(BaseCommand):
+    help = 'Ghi danh cả khóa sinh viên vào các môn học / đề cương bằng INSERT ... SELECT (bỏ qua dòng đã có)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('year', type=int, nargs='?', help='Năm của khóa; bỏ trống nếu dùng --student')
+        parser.add_argument('--lesson', type=int, action='append', default=[])
+        parser.add_argument('--outline', type=int, action='append', default=[])
+        parser.add_argument('--student', type=int, action='append', help='Chỉ ghi danh các sinh viên này')
+        parser.add_argument('--chunk-size', type=int)
+
+    def handle(self, *args, **options):
+        def progress(processed, report):
+            self.stderr.write(f"{processed}/{report['students']} students, enrolled: {report['enrolled']}")
+
+        try:
+            report = enrollment.enroll(options['year'], students=options['student'], lessons=options['lesson'],
+                                       outlines=options['outline'], chunk_size=options['chunk_size'],
+                                       progress=progress)
+        except ValueError as ex:
+            raise CommandError(ex)
+        self.stdout.write(json.dumps(report, indent=2, ensure_ascii=False))
@@ -0,0 +1,43 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from courseoutline import importer
+from courseoutline.models import Lecturer
+
+
+class Command(BaseCommand):
+    help = 'Nhập đề cương hàng loạt từ file csv/xlsx/json/jsonl (đọc dần, kiểm tra và ghi theo lô)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=importer.FORMATS, help='Mặc định đoán theo đuôi file')
+        parser.add_argument('--lecturer', type=int, help='Gán mọi đề cương cho giảng viên này')
+        parser.add_argument('--batch-size', type=int)
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ kiểm tra, không ghi')
+        parser.add_argument('--report', help='Ghi báo cáo lỗi từng dòng ra file JSON')
+
+    def handle(self, *args, **options):
+        try:
+            fmt = options['format'] or importer.detect_format(options['path'])
+        except ValueError as ex:
+            raise CommandError(ex)
+        lecturer = None
+        if options['lecturer']:
+            lecturer = Lecturer.objects.filter(pk=options['lecturer']).first()
+            if lecturer is None:
+                raise CommandError(f"Lecturer {options['lecturer']} does not exist.")
+
+        def progress(report):
+            self.stderr.write(f"{report['rows']} rows: {report['created']} ok, {report['failed']} failed")
+
+        with open(options['path'], 'rb') as f:
+            report = importer.import_outlines(f, fmt, lecturer=lecturer, dry_run=options['dry_run'],
+                                              batch_size=options['batch_size'], progress=progress)
+        if options['report']:
+            with open(options['report'], 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2, ensure_ascii=False)
+        for error in report['errors'][:20]:
+            self.stdout.write(f"row {error['row']}: {json.dumps(error['errors'], ensure_ascii=False)}")
+        prefix = '[dry-run] ' if report['dry_run'] else ''
+        self.stdout.write(f"{prefix}{report['created']} imported, {report['failed']} failed of {report['rows']} rows")
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from courseoutline import feeds
+
+
+class Command(BaseCommand):
+    help = 'Dựng lại toàn bộ bảng "đề cương của tôi" (FeedEntry) từ dữ liệu hiện có'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{feeds.rebuild()} feed entries')
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from courseoutline import stats
+
+
+class Command(BaseCommand):
+    help = 'Tính lại toàn bộ bảng thống kê (Statistic) từ dữ liệu hiện có'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'{stats.rebuild()} statistics')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from courseoutline import rollover
+
+
+class Command(BaseCommand):
+    help = 'Sao chép đề cương (kèm liên kết đánh giá) của một khóa sang năm học mới bằng INSERT ... SELECT'
+
+    def add_arguments(self, parser):
+        parser.add_argument('source', type=int, help='Năm của khóa nguồn')
+        parser.add_argument('target', type=int, help='Năm của khóa đích (tự tạo nếu chưa có)')
+        parser.add_argument('--dry-run', action='store_true', help='Chỉ đếm số dòng sẽ được sao chép')
+        parser.add_argument('--lesson', type=int)
+        parser.add_argument('--lecturer', type=int)
+        parser.add_argument('--category', type=int)
+        parser.add_argument('--approved', action='store_true', help='Chỉ sao chép đề cương đã duyệt')
+
+    def handle(self, *args, **options):
+        try:
+            result = rollover.rollover(options['source'], options['target'], dry_run=options['dry_run'],
+                                       lesson=options['lesson'], lecturer=options['lecturer'],
+                                       category=options['category'], approved=options['approved'])
+        except ValueError as ex:
+            raise CommandError(ex)
+        prefix = '[dry-run] ' if result['dry_run'] else ''
+        self.stdout.write(f"{prefix}{result['source']} -> {result['target']}: {result['outlines']} outlines, "
+                          f"{result['evaluations']} evaluation links, {result['skipped']} already copied")
@@ -0,0 +1,149 @@
+import random
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+
+from courseoutline import autocomplete, feeds, stats
+from courseoutline.models import *
+
+METHODS = ['Chuyên cần', 'Bài tập', 'Giữa kỳ', 'Cuối kỳ', 'Đồ án', 'Thuyết trình']
+FIRST_NAMES = ['An', 'Bình', 'Chi', 'Dũng', 'Giang', 'Hà', 'Khoa', 'Linh', 'Minh', 'Nam', 'Phương', 'Vân']
+LAST_NAMES = ['Nguyễn', 'Trần', 'Lê', 'Phạm', 'Hoàng', 'Huỳnh', 'Phan', 'Võ', 'Đặng', 'Bùi']
+SUBJECTS = ['Lập trình', 'Cơ sở dữ liệu', 'Mạng máy tính', 'Toán rời rạc', 'Hệ điều hành', 'Kiến trúc máy tính',
+            'Trí tuệ nhân tạo', 'Kiểm thử phần mềm', 'Phân tích thiết kế', 'An toàn thông tin']
+
+
+def sizes(scale):
+    # Số dòng của từng bảng tính theo số đề cương (scale)
+    return {
+        'categories': max(5, scale // 200),
+        'lecturers': max(5, scale // 20),
+        'lessons': max(10, scale // 4),
+        'evaluations': max(10, scale // 10),
+        'courses': max(4, min(scale // 100, 50)),
+        'outlines': scale,
+        'students': scale * 2,
+        'comments': scale * 5,
+    }
+
+
+class Command(BaseCommand):
+    help = 'Sinh dữ liệu giả lập với số lượng lớn bằng bulk_create'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--scale', type=int, default=1000, help='Số đề cương cần tạo (1000 - 1000000)')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+        parser.add_argument('--clear', action='store_true', help='Xóa dữ liệu cũ trước khi sinh')
+
+    def handle(self, *args, **options):
+        scale = options['scale']
+        if scale < 1:
+            raise CommandError('--scale must be positive')
+        self.rng = random.Random(options['seed'])
+        self.batch_size = options['batch_size']
+        counts = sizes(scale)
+
+        start = time.perf_counter()
+        with transaction.atomic():
+            if options['clear']:
+                for model in [Comment, Approval, Chat, Student, Outline, Course, Lesson, Evaluation, Lecturer,
+                              Category]:
+                    model.objects.all().delete()
+            self.seed(counts)
+            # bulk_create không gửi signal nên tính lại các bảng dẫn xuất từ đầu
+            derived = {'statistics': stats.rebuild(), 'feed_entries': feeds.rebuild()}
+        derived['autocomplete'] = len(autocomplete.build()[1])
+        elapsed = time.perf_counter() - start
+
+        summary = ', '.join(f'{name}={count}' for name, count in {**counts, **derived}.items())
+        self.stdout.write(self.style.SUCCESS(f'Đã sinh dữ liệu trong {elapsed:.1f}s: {summary}'))
+
+    def last_id(self, model):
+        return model.objects.aggregate(m=Max('id'))['m'] or 0
+
+    def bulk(self, model, rows, ids=True):
+        # Chèn theo lô và trả về id của các dòng vừa tạo (không phụ thuộc RETURNING của CSDL)
+        last_id = self.last_id(model)
+        batch = []
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                model.objects.bulk_create(batch)
+                batch = []
+        if batch:
+            model.objects.bulk_create(batch)
+        if not ids:
+            return None
+        return list(model.objects.filter(id__gt=last_id).order_by('id').values_list('id', flat=True))
+
+    def bulk_through(self, through, rows):
+        batch = []
+        for row in rows:
+            batch.append(through(**row))
+            if len(batch) >= self.batch_size:
+                through.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        if batch:
+            through.objects.bulk_create(batch, ignore_conflicts=True)
+
+    def people(self, model, count, prefix, **kwargs):
+        # Mã có tiền tố chữ nên không trùng với mã số do User.generate_code sinh ra
+        offset = self.last_id(model)
+        for i in range(offset + 1, offset + count + 1):
+            yield model(first_name=self.rng.choice(FIRST_NAMES), last_name=self.rng.choice(LAST_NAMES),
+                        age=str(self.rng.randint(18, 60)), gender=self.rng.random() < 0.5,
+                        code=f'{prefix}{i:09d}', **{k: v() if callable(v) else v for k, v in kwargs.items()})
+
+    def seed(self, counts):
+        rng = self.rng
+
+        offset = self.last_id(Category)
+        category_ids = self.bulk(Category, (Category(name=f'Danh mục {offset + i + 1}')
+                                            for i in range(counts['categories'])))
+        lecturer_ids = self.bulk(Lecturer, self.people(Lecturer, counts['lecturers'], 'L', position='Giảng viên'))
+        lesson_ids = self.bulk(Lesson, (Lesson(subject=f'{rng.choice(SUBJECTS)} {i}',
+                                               lecturer_id=rng.choice(lecturer_ids),
+                                               category_id=rng.choice(category_ids))
+                                        for i in range(counts['lessons'])))
+        evaluation_ids = self.bulk(Evaluation, (Evaluation(percentage=rng.choice([10, 20, 30, 40, 50]),
+                                                           method=rng.choice(METHODS), note='')
+                                                for _ in range(counts['evaluations'])))
+
+        first_year = (Course.objects.aggregate(m=Max('year'))['m'] or 2000) + 1
+        course_ids = self.bulk(Course, (Course(year=first_year + i) for i in range(counts['courses'])))
+        self.bulk_through(Course.lessons.through, ({'course_id': c, 'lesson_id': l}
+                                                   for c in course_ids
+                                                   for l in rng.sample(lesson_ids, min(20, len(lesson_ids)))))
+
+        lesson_lecturers = dict(Lesson.objects.filter(id__in=lesson_ids).values_list('id', 'lecturer_id'))
+        outline_ids = []
+        for start in range(0, counts['outlines'], self.batch_size):
+            chunk = []
+            for i in range(start, min(start + self.batch_size, counts['outlines'])):
+                lesson_id = rng.choice(lesson_ids)
+                chunk.append(Outline(name=f'Đề cương {rng.choice(SUBJECTS)} {i}', credit=rng.randint(1, 5),
+                                     overview='<p>Nội dung đề cương</p>', image='sample',
+                                     is_approved=rng.random() < 0.7, lesson_id=lesson_id,
+                                     lecturer_id=lesson_lecturers[lesson_id]))
+            outline_ids.extend(self.bulk(Outline, chunk))
+
+        self.bulk_through(Outline.evaluation.through, ({'outline_id': o, 'evaluation_id': e}
+                                                       for o in outline_ids
+                                                       for e in rng.sample(evaluation_ids, 3)))
+        self.bulk_through(Outline.course.through, ({'outline_id': o, 'course_id': c}
+                                                   for o in outline_ids
+                                                   for c in rng.sample(course_ids, min(2, len(course_ids)))))
+
+        student_ids = self.bulk(Student, self.people(Student, counts['students'], 'S',
+                                                     course_id=lambda: rng.choice(course_ids)))
+        self.bulk_through(Student.lessons.through, ({'student_id': s, 'lesson_id': rng.choice(lesson_ids)}
+                                                    for s in student_ids))
+        self.bulk_through(Student.outline.through, ({'student_id': s, 'outline_id': rng.choice(outline_ids)}
+                                                    for s in student_ids))
+
+        self.bulk(Comment, (Comment(content=f'Bình luận {i}', outline_id=rng.choice(outline_ids),
+                                    student_id=rng.choice(student_ids))
+                            for i in range(counts['comments'])), ids=False)
@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from courseoutline.models import SlowQuery
+
+
+class Command(BaseCommand):
+    help = 'Liệt kê các truy vấn chậm nhất theo fingerprint'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--limit', type=int, default=20)
+        parser.add_argument('--explain', action='store_true', help='In kèm kết quả EXPLAIN')
+        parser.add_argument('--reset', action='store_true', help='Xóa toàn bộ báo cáo')
+
+    def handle(self, *args, **options):
+        if options['reset']:
+            deleted, _ = SlowQuery.objects.all().delete()
+            self.stdout.write(self.style.SUCCESS(f'Đã xóa {deleted} truy vấn.'))
+            return
+
+        for query in SlowQuery.objects.order_by('-total_time')[:options['limit']]:
+            avg = query.total_time / query.count if query.count else 0
+            self.stdout.write(self.style.MIGRATE_HEADING(
+                f'{query.fingerprint[:12]}  count={query.count}  total={query.total_time:.1f}ms  '
+                f'avg={avg:.1f}ms  max={query.max_time:.1f}ms  view={query.view}'))
+            self.stdout.write(query.normalized)
+            if options['explain'] and query.explain:
+                self.stdout.write(query.explain)
+            self.stdout.write('')
@@ -0,0 +1,99 @@
+import bisect
+import threading
+
+# Bucket mặc định cho thời gian (giây), số truy vấn và kích thước response (byte)
+TIME_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+HISTOGRAMS = {
+    'courseoutline_request_duration_seconds': ('Wall time spent handling a request.', TIME_BUCKETS),
+    'courseoutline_request_sql_queries': ('SQL queries executed per request.', COUNT_BUCKETS),
+    'courseoutline_request_sql_duration_seconds': ('Time spent in SQL per request.', TIME_BUCKETS),
+    'courseoutline_response_size_bytes': ('Serialized response body size.', SIZE_BUCKETS),
+}
+
+COUNTERS = {
+    'courseoutline_requests_total': 'Requests handled, by view and status code.',
+    'courseoutline_throttled_total': 'Requests rejected by throttling (429) or load shedding (503), by rule.',
+    'courseoutline_audit_events_total': 'Audit events written in batches, or put back for retry after a database error.',
+}
+
+
+class Histogram:
+    __slots__ = ('buckets', 'counts', 'sum', 'count')
+
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class Registry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, value, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(HISTOGRAMS[name][1])
+            histogram.observe(value)
+
+    def inc(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+    def render(self):
+        with self._lock:
+            histograms = sorted((key, h.buckets, list(h.counts), h.sum, h.count)
+                                for key, h in self._histograms.items())
+            counters = sorted(self._counters.items())
+
+        lines = []
+        seen = set()
+        for (name, labels), buckets, counts, total, count in histograms:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# HELP {name} {HISTOGRAMS[name][0]}')
+                lines.append(f'# TYPE {name} histogram')
+            cumulative = 0
+            for bound, bucket_count in zip(buckets + (float('inf'),), counts):
+                cumulative += bucket_count
+                le = '+Inf' if bound == float('inf') else repr(bound)
+                lines.append(f'{name}_bucket{_labels(labels + (("le", le),))} {cumulative}')
+            lines.append(f'{name}_sum{_labels(labels)} {total}')
+            lines.append(f'{name}_count{_labels(labels)} {count}')
+
+        for (name, labels), value in counters:
+            if name not in seen:
+                seen.add(name)
+                lines.append(f'# HELP {name} {COUNTERS[name]}')
+                lines.append(f'# TYPE {name} counter')
+            lines.append(f'{name}{_labels(labels)} {value}')
+        return '\n'.join(lines) + '\n'
+
+
+def _labels(labels):
+    if not labels:
+        return ''
+    body = ','.join('{}="{}"'.format(k, str(v).replace('\\', '\\\\').replace('"', '\\"')) for k, v in labels)
+    return '{' + body + '}'
+
+
+registry = Registry()
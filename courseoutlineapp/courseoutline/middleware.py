@@ -0,0 +1,164 @@
+import re
+import time
+from contextlib import ExitStack, contextmanager, nullcontext
+from contextvars import ContextVar
+
+import brotli
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.utils.cache import patch_vary_headers
+from django.utils.text import compress_string
+
+from courseoutline.metrics import registry
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.perf_counter() - start
+            self.count += 1
+
+
+# Bộ đếm truy vấn của request hiện tại. Dùng ContextVar thay vì execute_wrapper() tạm thời trong middleware:
+# view async chạy ORM qua sync_to_async ở luồng khác, với kết nối khác, nhưng vẫn nhận bản sao context của request
+_counter = ContextVar('courseoutline_query_counter', default=None)
+
+
+def record_query(execute, sql, params, many, context):
+    counter = _counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def install_counter(connection, **kwargs):
+    # Gắn cố định ở đầu danh sách wrapper: execute_wrapper() của middleware khác pop phần tử cuối khi thoát
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.insert(0, record_query)
+
+
+connection_created.connect(install_counter)
+
+
+def view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or 'unmatched'
+
+
+@contextmanager
+def wrap_connections(factory):
+    with ExitStack() as stack:
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(factory(conn)))
+        yield
+
+
+class WrappingMiddleware:
+    # Middleware bọc get_response trong một context manager, dùng được cả WSGI lẫn ASGI
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def wrap(self, request):
+        return nullcontext()
+
+    def finish(self, request, response, state):
+        return response
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        with self.wrap(request) as state:
+            response = self.get_response(request)
+        return self.finish(request, response, state)
+
+    async def __acall__(self, request):
+        with self.wrap(request) as state:
+            response = await self.get_response(request)
+        return self.finish(request, response, state)
+
+
+class MetricsMiddleware(WrappingMiddleware):
+    # Đo thời gian, số truy vấn SQL và kích thước response cho từng view
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.enabled = getattr(settings, 'METRICS_ENABLED', True)
+
+    @contextmanager
+    def wrap(self, request):
+        if not self.enabled:
+            yield None
+            return
+        counter = QueryCounter()
+        start = time.perf_counter()
+        for conn in connections.all():
+            install_counter(conn)
+        token = _counter.set(counter)
+        try:
+            yield counter, start
+        finally:
+            _counter.reset(token)
+
+    def finish(self, request, response, state):
+        if state is None:
+            return response
+        counter, start = state
+        duration = time.perf_counter() - start
+
+        view = view_name(request)
+        registry.observe('courseoutline_request_duration_seconds', duration, view=view)
+        registry.observe('courseoutline_request_sql_queries', counter.count, view=view)
+        registry.observe('courseoutline_request_sql_duration_seconds', counter.duration, view=view)
+        if not response.streaming:
+            registry.observe('courseoutline_response_size_bytes', len(response.content), view=view)
+        registry.inc('courseoutline_requests_total', view=view, status=response.status_code)
+        return response
+
+
+class CompressionMiddleware(WrappingMiddleware):
+    # Nén brotli/gzip các response đủ lớn; bỏ qua response dạng stream (SSE) và nội dung đã nén
+    skip_types = re.compile(r'^(image|video|audio)/|zip|gzip|octet-stream')
+
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.brotli_quality = getattr(settings, 'COMPRESSION_BROTLI_QUALITY', 5)
+
+    def finish(self, request, response, state):
+        if response.streaming or response.has_header('Content-Encoding') or len(response.content) < self.min_size:
+            return response
+        if self.skip_types.search(response.get('Content-Type', '')):
+            return response
+
+        patch_vary_headers(response, ('Accept-Encoding',))
+        accept = request.headers.get('Accept-Encoding', '')
+        if 'br' in accept:
+            content, encoding = brotli.compress(response.content, quality=self.brotli_quality), 'br'
+        elif 'gzip' in accept:
+            content, encoding = compress_string(response.content), 'gzip'
+        else:
+            return response
+        if len(content) >= len(response.content):
+            return response
+
+        if response.has_header('ETag'):
+            response['ETag'] = re.sub(r'"$', f'-{encoding}"', response['ETag'])
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = encoding
+        return response
@@ -0,0 +1,35 @@
+# Generated by Django 5.0.4 on 2026-10-19 16:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0002_outline_image_outline_is_approved_alter_account_role_and_more'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SlowQuery',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('active', models.BooleanField(default=True)),
+                ('fingerprint', models.CharField(max_length=40, unique=True)),
+                ('normalized', models.TextField()),
+                ('sample_sql', models.TextField()),
+                ('params', models.TextField(blank=True)),
+                ('view', models.CharField(blank=True, max_length=255)),
+                ('stack', models.TextField(blank=True)),
+                ('explain', models.TextField(blank=True)),
+                ('count', models.PositiveIntegerField(default=0)),
+                ('total_time', models.FloatField(default=0)),
+                ('max_time', models.FloatField(default=0)),
+            ],
+            options={
+                'ordering': ['-total_time'],
+            },
+        ),
+    ]
@@ -0,0 +1,41 @@
+# Generated by Django 5.0.4 on 2026-10-19 16:20
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0003_slowquery'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='chat',
+            name='lecturer_read',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='chat',
+            name='student_read',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('active', models.BooleanField(default=True)),
+                ('content', models.TextField()),
+                ('chat', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='courseoutline.chat')),
+                ('sender', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['id'],
+                'indexes': [models.Index(fields=['chat', 'id'], name='courseoutli_chat_id_b5e7de_idx')],
+            },
+        ),
+    ]
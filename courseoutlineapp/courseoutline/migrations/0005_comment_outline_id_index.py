@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-19 16:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0004_chat_messages'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='comment',
+            index=models.Index(fields=['outline', 'id'], name='courseoutli_outline_367090_idx'),
+        ),
+    ]
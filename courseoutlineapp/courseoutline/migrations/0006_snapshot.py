@@ -0,0 +1,33 @@
+# Generated by Django 5.0.4 on 2026-10-19 16:26
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0005_comment_outline_id_index'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Snapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('created_date', models.DateTimeField(auto_now_add=True)),
+                ('updated_date', models.DateTimeField(auto_now=True)),
+                ('active', models.BooleanField(default=True)),
+                ('version', models.PositiveIntegerField()),
+                ('fingerprint', models.CharField(max_length=64)),
+                ('path', models.CharField(max_length=255)),
+                ('size', models.PositiveIntegerField(default=0)),
+                ('outlines', models.PositiveIntegerField(default=0)),
+                ('course', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='snapshots', to='courseoutline.course')),
+            ],
+            options={
+                'ordering': ['-version'],
+                'unique_together': {('course', 'version')},
+            },
+        ),
+    ]
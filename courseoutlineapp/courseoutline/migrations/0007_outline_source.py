@@ -0,0 +1,19 @@
+# Generated by Django 5.0.4 on 2026-10-19 16:29
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0006_snapshot'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outline',
+            name='source',
+            field=models.ForeignKey(blank=True, editable=False, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='clones', to='courseoutline.outline'),
+        ),
+    ]
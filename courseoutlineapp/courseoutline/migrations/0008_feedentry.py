@@ -0,0 +1,26 @@
+# Generated by Django 5.0.4 on 2026-10-19 16:34
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0007_outline_source'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='FeedEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('course', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='courseoutline.course')),
+                ('outline', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='courseoutline.outline')),
+                ('student', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='feed_entries', to='courseoutline.student')),
+            ],
+            options={
+                'unique_together': {('course', 'outline', 'student')},
+            },
+        ),
+    ]
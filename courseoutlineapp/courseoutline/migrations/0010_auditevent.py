@@ -0,0 +1,34 @@
+# Generated by Django 5.0.4 on 2026-10-19 16:51
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0009_statistic'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuditEvent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('event_id', models.UUIDField(editable=False, unique=True)),
+                ('created_date', models.DateTimeField(db_index=True)),
+                ('actor_name', models.CharField(blank=True, max_length=150)),
+                ('action', models.CharField(max_length=50)),
+                ('target_type', models.CharField(max_length=50)),
+                ('target_id', models.CharField(max_length=64)),
+                ('changes', models.JSONField(blank=True, default=dict)),
+                ('ip', models.GenericIPAddressField(blank=True, null=True)),
+                ('actor', models.ForeignKey(db_constraint=False, null=True, on_delete=django.db.models.deletion.DO_NOTHING, related_name='audit_events', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['-id'],
+                'indexes': [models.Index(fields=['target_type', 'target_id', 'id'], name='courseoutli_target__89358d_idx'), models.Index(fields=['actor', 'id'], name='courseoutli_actor_i_476b74_idx'), models.Index(fields=['action', 'id'], name='courseoutli_action_42f241_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.0.4 on 2026-10-19 17:03
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0011_archivedrow'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outline',
+            name='version',
+            field=models.PositiveIntegerField(default=1, editable=False),
+        ),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 5.0.4 on 2026-10-19 17:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('courseoutline', '0012_outline_version'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='feedentry',
+            constraint=models.UniqueConstraint(condition=models.Q(('student__isnull', True)), fields=('course', 'outline'), name='unique_course_feed_entry'),
+        ),
+    ]
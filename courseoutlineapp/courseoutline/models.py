@@ -3,6 +3,7 @@ import random
 from ckeditor.fields import RichTextField
 from cloudinary.models import CloudinaryField
 from django.contrib.auth.models import AbstractUser
+from django.core.serializers.json import DjangoJSONEncoder
 from django.db import models
 
 
@@ -127,6 +128,9 @@ class Outline(BaseModel):
     lesson = models.ForeignKey(Lesson, on_delete=models.CASCADE)
     lecturer = models.ForeignKey(Lecturer, on_delete=models.CASCADE)
     course = models.ManyToManyField(Course)
+    source = models.ForeignKey('self', null=True, blank=True, editable=False, on_delete=models.SET_NULL,
+                               related_name='clones')  # đề cương gốc khi được sao chép sang năm học mới
+    version = models.PositiveIntegerField(default=1, editable=False)  # tăng sau mỗi lần sửa, xem concurrency.py
 
     def __str__(self):
         return self.name
@@ -149,12 +153,133 @@ class Interaction(BaseModel):
 class Comment(Interaction):
     content = models.TextField()
 
+    class Meta:
+        indexes = [models.Index(fields=['outline', 'id'])]
+
 
 class Chat(BaseModel):
     lecturer = models.ForeignKey(Lecturer, on_delete=models.CASCADE)
     student = models.ForeignKey(Student, on_delete=models.CASCADE)
+    # id tin nhắn cuối cùng mỗi bên đã đọc, dùng để đếm tin chưa đọc
+    lecturer_read = models.BigIntegerField(default=0)
+    student_read = models.BigIntegerField(default=0)
+
+    def has_member(self, account):
+        return account.is_authenticated and (self.lecturer.account_id == account.id
+                                             or self.student.account_id == account.id)
+
+    def read_field(self, account):
+        return 'lecturer_read' if self.lecturer.account_id == account.id else 'student_read'
+
+
+class Message(BaseModel):
+    chat = models.ForeignKey(Chat, on_delete=models.CASCADE, related_name='messages')
+    sender = models.ForeignKey(Account, on_delete=models.CASCADE)
+    content = models.TextField()
+
+    class Meta:
+        ordering = ['id']
+        indexes = [models.Index(fields=['chat', 'id'])]
 
 
 class Approval(BaseModel):
     is_approved = models.BooleanField(default=False)
     student = models.ForeignKey(Student, on_delete=models.CASCADE, unique=True)
+
+
+class SlowQuery(BaseModel):
+    fingerprint = models.CharField(max_length=40, unique=True)
+    normalized = models.TextField()
+    sample_sql = models.TextField()
+    params = models.TextField(blank=True)
+    view = models.CharField(max_length=255, blank=True)
+    stack = models.TextField(blank=True)
+    explain = models.TextField(blank=True)
+    count = models.PositiveIntegerField(default=0)
+    total_time = models.FloatField(default=0)  # mili giây
+    max_time = models.FloatField(default=0)
+
+    class Meta:
+        ordering = ['-total_time']
+
+    def __str__(self):
+        return self.normalized[:80]
+
+
+class Snapshot(BaseModel):
+    course = models.ForeignKey(Course, on_delete=models.CASCADE, related_name='snapshots')
+    version = models.PositiveIntegerField()
+    fingerprint = models.CharField(max_length=64)
+    path = models.CharField(max_length=255)
+    size = models.PositiveIntegerField(default=0)
+    outlines = models.PositiveIntegerField(default=0)
+
+    class Meta:
+        ordering = ['-version']
+        unique_together = ('course', 'version')
+
+
+class FeedEntry(models.Model):
+    # Bảng dựng sẵn cho "đề cương của tôi", theo khóa học: student rỗng là đề cương áp dụng cho cả khóa
+    # (môn học của khóa + đề cương gắn với khóa), có student là đề cương sinh viên tự đăng ký
+    course = models.ForeignKey(Course, null=True, on_delete=models.CASCADE, related_name='feed_entries')
+    outline = models.ForeignKey(Outline, on_delete=models.CASCADE, related_name='feed_entries')
+    student = models.ForeignKey(Student, null=True, on_delete=models.CASCADE, related_name='feed_entries')
+
+    class Meta:
+        unique_together = ('course', 'outline', 'student')
+        # NULL không trùng với NULL trong unique_together: dòng cả khóa (student rỗng) cần ràng buộc riêng.
+        # MySQL không có chỉ mục có điều kiện nên bỏ qua ràng buộc này (refresh_* xóa rồi ghi lại trong transaction)
+        constraints = [
+            models.UniqueConstraint(fields=['course', 'outline'], condition=models.Q(student__isnull=True),
+                                    name='unique_course_feed_entry'),
+        ]
+
+
+class Statistic(models.Model):
+    # Số liệu thống kê cộng dồn theo từng chiều (vd outlines.category, key là id danh mục), cập nhật qua signal
+    dimension = models.CharField(max_length=50)
+    key = models.CharField(max_length=255)
+    label = models.CharField(max_length=255, blank=True)
+    count = models.BigIntegerField(default=0)
+    total = models.FloatField(default=0)  # tổng phụ, vd tổng tỉ lệ phần trăm của phương thức đánh giá
+
+    class Meta:
+        unique_together = ('dimension', 'key')
+
+
+class AuditEvent(models.Model):
+    # Nhật ký thao tác ghi (ai duyệt / sửa gì), được audit.py gom trong bộ nhớ rồi ghi theo lô
+    event_id = models.UUIDField(unique=True, editable=False)
+    created_date = models.DateTimeField(db_index=True)
+    # Không ràng buộc khóa ngoại: lô ghi lại từ spool vẫn hợp lệ khi tài khoản đã bị xóa
+    actor = models.ForeignKey(Account, null=True, on_delete=models.DO_NOTHING, db_constraint=False,
+                              related_name='audit_events')
+    actor_name = models.CharField(max_length=150, blank=True)
+    action = models.CharField(max_length=50)
+    target_type = models.CharField(max_length=50)
+    target_id = models.CharField(max_length=64)
+    changes = models.JSONField(default=dict, blank=True)
+    ip = models.GenericIPAddressField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-id']
+        indexes = [
+            models.Index(fields=['target_type', 'target_id', 'id']),
+            models.Index(fields=['actor', 'id']),
+            models.Index(fields=['action', 'id']),
+        ]
+
+
+class ArchivedRow(models.Model):
+    # Dòng đã chuyển khỏi bảng chính bởi archive.py (đề cương / bình luận / duyệt cũ), khôi phục được
+    model = models.CharField(max_length=100)  # app_label.model_name
+    object_id = models.BigIntegerField()
+    parent_id = models.BigIntegerField(null=True, blank=True)  # vd đề cương của bình luận, để đọc xuyên
+    policy = models.CharField(max_length=50)
+    data = models.JSONField(encoder=DjangoJSONEncoder)
+    archived_date = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        unique_together = ('model', 'object_id')
+        indexes = [models.Index(fields=['model', 'parent_id', 'object_id'])]
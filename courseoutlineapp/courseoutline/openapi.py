@@ -0,0 +1,114 @@
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.http import FileResponse
+from django.utils.cache import patch_cache_control
+from django.views.decorators.http import condition
+
+# drf_yasg chỉ được import khi cần sinh schema (lần đầu mở swagger hoặc khi chạy build_openapi)
+INFO = {
+    'title': "Course Outline API",
+    'default_version': 'v1',
+    'description': "APIs for CourseApp",
+    'contact': {'email': "2151053067@ou.edu.vn"},
+    'license': {'name': "Mỹ Vân@2024"},
+}
+FORMATS = {'.json': 'application/json', '.yaml': 'application/yaml'}
+
+_lock = threading.Lock()
+_views = {}
+
+
+def lazy_view(factory):
+    # Trả về view chỉ tạo view thật (và import thư viện) ở request đầu tiên
+    def view(request, *args, **kwargs):
+        real = _views.get(factory)
+        if real is None:
+            with _lock:
+                real = _views.get(factory) or factory()
+                _views[factory] = real
+        return real(request, *args, **kwargs)
+
+    return view
+
+
+def info():
+    from drf_yasg import openapi
+
+    return openapi.Info(**dict(INFO, contact=openapi.Contact(**INFO['contact']),
+                               license=openapi.License(**INFO['license'])))
+
+
+def schema_view():
+    from drf_yasg.views import get_schema_view
+    from rest_framework import permissions
+
+    return get_schema_view(info(), public=True, permission_classes=(permissions.AllowAny,))
+
+
+def cache_timeout():
+    return getattr(settings, 'OPENAPI_CACHE_TIMEOUT', 3600)
+
+
+def schema_dir():
+    return Path(getattr(settings, 'OPENAPI_SCHEMA_DIR', settings.BASE_DIR / 'openapi'))
+
+
+def schema_path(fmt):
+    return schema_dir() / f'swagger{fmt}'
+
+
+def build(directory=None, url=None):
+    # Sinh schema một lần (khi deploy) rồi ghi ra swagger.json / swagger.yaml.
+    # Không truyền url thì bỏ host khỏi schema để client dùng host đang phục vụ file
+    from drf_yasg.codecs import OpenAPICodecJson, OpenAPICodecYaml
+    from drf_yasg.generators import OpenAPISchemaGenerator
+    from rest_framework.test import APIRequestFactory
+    from rest_framework.views import APIView
+
+    directory = Path(directory) if directory else schema_dir()
+    directory.mkdir(parents=True, exist_ok=True)
+    hosts = [host.lstrip('.') for host in settings.ALLOWED_HOSTS if host.strip('.*')]
+    host = urlsplit(url).netloc if url else (hosts[0] if hosts else 'localhost')
+    # Sinh như một request ẩn danh tới /swagger.json để kết quả giống bản sinh lúc chạy
+    request = APIView().initialize_request(APIRequestFactory().get('/swagger.json', HTTP_HOST=host))
+    schema = OpenAPISchemaGenerator(info(), url=url).get_schema(request=request, public=True)
+    if not url:
+        schema.pop('host', None)
+        schema.pop('schemes', None)
+    written = []
+    for fmt, codec in (('.json', OpenAPICodecJson(validators=[], pretty=True)),
+                       ('.yaml', OpenAPICodecYaml(validators=[]))):
+        path = directory / f'swagger{fmt}'
+        temp = path.with_suffix(fmt + '.tmp')
+        temp.write_bytes(codec.encode(schema))
+        temp.replace(path)
+        written.append(path)
+    return written
+
+
+def _last_modified(request, format):
+    path = schema_path(format)
+    return datetime.fromtimestamp(int(path.stat().st_mtime), timezone.utc) if path.exists() else None
+
+
+@condition(last_modified_func=_last_modified)
+def prebuilt(request, format):
+    response = FileResponse(schema_path(format).open('rb'), content_type=FORMATS[format])
+    patch_cache_control(response, public=True, max_age=cache_timeout())
+    return response
+
+
+generated = lazy_view(lambda: schema_view().without_ui(cache_timeout=cache_timeout()))
+swagger_ui = lazy_view(lambda: schema_view().with_ui('swagger', cache_timeout=cache_timeout()))
+redoc_ui = lazy_view(lambda: schema_view().with_ui('redoc', cache_timeout=cache_timeout()))
+
+
+def schema(request, format):
+    # Ưu tiên file đã build sẵn bằng `manage.py build_openapi`, chưa có thì sinh (và cache) như trước
+    if schema_path(format).exists():
+        return prebuilt(request, format)
+    return generated(request, format=format)
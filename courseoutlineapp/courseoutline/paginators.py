@@ -6,4 +6,14 @@ class ItemPaginator(pagination.PageNumberPagination):
 
 
 class CommentPaginator(pagination.PageNumberPagination):
-    page_size = 3
\ No newline at end of file
+    page_size = 3
+
+
+class FeedPaginator(pagination.CursorPagination):
+    page_size = 20
+    ordering = '-outline_id'
+
+
+class AuditPaginator(pagination.CursorPagination):
+    page_size = 50
+    ordering = '-id'
@@ -0,0 +1,24 @@
+import cbor2
+import msgpack
+from rest_framework import parsers
+from rest_framework.exceptions import ParseError
+
+
+class MessagePackParser(parsers.BaseParser):
+    media_type = 'application/msgpack'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return msgpack.unpackb(stream.read(), raw=False)
+        except (ValueError, msgpack.UnpackException) as ex:
+            raise ParseError(f'MessagePack parse error - {ex}')
+
+
+class CBORParser(parsers.BaseParser):
+    media_type = 'application/cbor'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        try:
+            return cbor2.loads(stream.read())
+        except (ValueError, cbor2.CBORDecodeError) as ex:
+            raise ParseError(f'CBOR parse error - {ex}')
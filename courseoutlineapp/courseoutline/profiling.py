@@ -0,0 +1,91 @@
+import cProfile
+import io
+import pstats
+import random
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+from django.conf import settings
+from django.core import signing
+
+from courseoutline.middleware import WrappingMiddleware, view_name
+
+SALT = 'courseoutline.profiling'
+HEADER = 'X-Profile'
+
+
+def profile_dir():
+    path = Path(getattr(settings, 'PROFILING_DIR', settings.BASE_DIR / 'profiles'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def make_token(username):
+    return signing.dumps({'by': username}, salt=SALT)
+
+
+def check_token(token):
+    try:
+        signing.loads(token, salt=SALT, max_age=getattr(settings, 'PROFILING_TOKEN_MAX_AGE', 3600))
+    except signing.BadSignature:
+        return False
+    return True
+
+
+def recent_profiles(limit=50):
+    files = sorted(profile_dir().glob('*.prof'), key=lambda f: f.stat().st_mtime, reverse=True)
+    return files[:limit]
+
+
+def summary(path, limit=30):
+    out = io.StringIO()
+    pstats.Stats(str(path), stream=out).sort_stats('cumulative').print_stats(limit)
+    return out.getvalue()
+
+
+def _cleanup(keep):
+    for old in recent_profiles(limit=None)[keep:]:
+        old.unlink(missing_ok=True)
+
+
+class ProfilingMiddleware(WrappingMiddleware):
+    # Chạy view dưới cProfile khi có header ký hợp lệ hoặc theo tỉ lệ lấy mẫu.
+    # Với view async, các task chạy xen kẽ trong cùng event loop cũng bị tính vào profile.
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.sample_rate = getattr(settings, 'PROFILING_SAMPLE_RATE', 0.0)
+        self.keep = getattr(settings, 'PROFILING_KEEP', 200)
+
+    def should_profile(self, request):
+        token = request.headers.get(HEADER)
+        if token:
+            return check_token(token)
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+    @contextmanager
+    def wrap(self, request):
+        if not self.should_profile(request):
+            yield None
+            return
+        profiler = cProfile.Profile()
+        try:
+            profiler.enable()
+        except ValueError:  # đã có profiler khác đang chạy trong luồng này
+            yield None
+            return
+        try:
+            yield profiler
+        finally:
+            profiler.disable()
+
+    def finish(self, request, response, profiler):
+        if profiler is None:
+            return response
+        name = view_name(request).replace(':', '_')
+        stamp = time.strftime('%Y%m%d-%H%M%S') + f'-{int(time.time() * 1000) % 1000:03d}'
+        path = profile_dir() / f'{name}-{stamp}.prof'
+        profiler.dump_stats(str(path))
+        _cleanup(self.keep)
+        response[f'{HEADER}-File'] = path.name
+        return response
@@ -0,0 +1,73 @@
+from django.db import transaction
+from django.db.models import F, Max, Value
+from django.utils import timezone
+
+from courseoutline import autocomplete, feeds, snapshots, stats
+from courseoutline.bulk import insert_select
+from courseoutline.models import *
+
+CourseOutline = Outline.course.through
+OutlineEvaluation = Outline.evaluation.through
+
+
+def select_outlines(source, target=None, lesson=None, lecturer=None, category=None, approved=False):
+    queryset = Outline.objects.filter(active=True, course=source)
+    if lesson:
+        queryset = queryset.filter(lesson_id=lesson)
+    if lecturer:
+        queryset = queryset.filter(lecturer_id=lecturer)
+    if category:
+        queryset = queryset.filter(lesson__category_id=category)
+    if approved:
+        queryset = queryset.filter(is_approved=True)
+    if target is not None:
+        # Bỏ qua đề cương đã được sao chép sang khóa đích để chạy lại nhiều lần không bị trùng
+        queryset = queryset.exclude(clones__course=target)
+    return queryset
+
+
+def rollover(source_year, target_year, dry_run=False, **filters):
+    if source_year == target_year:
+        raise ValueError('Source and target year must be different.')
+    source = Course.objects.filter(year=source_year).first()
+    if source is None:
+        raise ValueError(f'Course {source_year} does not exist.')
+
+    with transaction.atomic():
+        if dry_run:
+            target = Course.objects.filter(year=target_year).first()
+        else:
+            target, _ = Course.objects.get_or_create(year=target_year)
+        selected = select_outlines(source, target, **filters)
+        result = {
+            'source': source_year,
+            'target': target_year,
+            'dry_run': dry_run,
+            'outlines': selected.count(),
+            'evaluations': OutlineEvaluation.objects.filter(outline__in=selected).count(),
+            'skipped': select_outlines(source, **filters).count() - selected.count() if target else 0,
+        }
+        if dry_run or not result['outlines']:
+            return result
+
+        last_id = Outline.objects.aggregate(last=Max('id'))['last'] or 0
+        now = timezone.now()
+        insert_select(Outline, selected,
+                      name=F('name'), credit=F('credit'), overview=F('overview'), image=F('image'),
+                      is_approved=F('is_approved'), lesson=F('lesson_id'), lecturer=F('lecturer_id'),
+                      active=Value(True), created_date=Value(now), updated_date=Value(now), source=F('id'),
+                      version=Value(1))
+
+        clones = Outline.objects.filter(id__gt=last_id, source__in=selected.values('id'))
+        insert_select(OutlineEvaluation, clones.filter(source__evaluation__isnull=False),
+                      outline=F('id'), evaluation=F('source__evaluation'))
+        insert_select(CourseOutline, clones, outline=F('id'), course=Value(target.id))
+        feeds.refresh_course(target.id)
+        # Sau khi gắn vào khóa đích, `selected` đã loại các bản sao nên lọc lại theo đề cương gốc
+        created = Outline.objects.filter(id__gt=last_id, course=target,
+                                         source__in=select_outlines(source, **filters).values('id'))
+        stats.add_outlines(created)
+        autocomplete.outlines_added(created)
+
+    snapshots.schedule([target.id])
+    return result
@@ -0,0 +1,138 @@
+import hashlib
+import random
+import threading
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, DatabaseError, connections
+
+from courseoutline.middleware import WrappingMiddleware
+from courseoutline.throttling import client_ip
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+PIN_COOKIE = 'db_pin'
+
+_alias = ContextVar('replica_alias', default=None)
+_lock = threading.Lock()
+_down = {}  # alias -> thời điểm được thử lại
+_pins = {}  # client -> thời điểm hết đọc từ primary
+
+
+def replicas():
+    return getattr(settings, 'DATABASE_REPLICAS', [])
+
+
+def mark_down(alias):
+    with _lock:
+        _down[alias] = time.monotonic() + getattr(settings, 'REPLICA_RETRY_SECONDS', 30)
+
+
+def choose():
+    now = time.monotonic()
+    candidates = [alias for alias in replicas() if _down.get(alias, 0) <= now]
+    return random.choice(candidates) if candidates else None
+
+
+def client_key(request):
+    authorization = request.headers.get('Authorization')
+    if authorization:
+        return hashlib.sha1(authorization.encode()).hexdigest()
+    return client_ip(request)
+
+
+def pin(client):
+    now = time.monotonic()
+    with _lock:
+        if len(_pins) > 10000:
+            for key in [key for key, until in _pins.items() if until <= now]:
+                del _pins[key]
+        _pins[client] = now + getattr(settings, 'REPLICA_STICKY_SECONDS', 5)
+
+
+def pinned(client):
+    return _pins.get(client, 0) > time.monotonic()
+
+
+class ReplicaRouter:
+    # Đọc từ replica do ReplicaMiddleware chọn cho request hiện tại; ghi, transaction và code ngoài request dùng primary
+    def db_for_read(self, model, **hints):
+        alias = _alias.get()
+        if alias is None or connections[DEFAULT_DB_ALIAS].in_atomic_block:
+            return DEFAULT_DB_ALIAS
+        return alias
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+
+class ReplicaMiddleware(WrappingMiddleware):
+    # GET/HEAD đọc từ replica; sau một request ghi, client đó đọc từ primary trong REPLICA_STICKY_SECONDS.
+    # Replica lỗi thì bị tạm bỏ qua và request đọc được chạy lại trên primary
+    def select(self, request):
+        if request.method not in SAFE_METHODS or not replicas():
+            return None
+        if request.COOKIES.get(PIN_COOKIE) or pinned(client_key(request)):
+            return None
+        alias = choose()
+        if alias is None:
+            return None
+        try:
+            connections[alias].ensure_connection()
+        except DatabaseError:
+            mark_down(alias)
+            return None
+        return alias
+
+    def finish(self, request, response, state):
+        if request.method not in SAFE_METHODS and replicas():
+            pin(client_key(request))
+            response.set_cookie(PIN_COOKIE, '1', max_age=getattr(settings, 'REPLICA_STICKY_SECONDS', 5),
+                                httponly=True, samesite='Lax')
+        return response
+
+    def process_exception(self, request, exception):
+        alias = _alias.get()
+        if alias is not None and isinstance(exception, DatabaseError):
+            request.replica_failed = alias
+
+    def failed(self, request, alias):
+        return getattr(request, 'replica_failed', None) == alias
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        alias = self.select(request)
+        if alias is not None:
+            token = _alias.set(alias)
+            try:
+                response = self.get_response(request)
+            except DatabaseError:
+                response = None
+                request.replica_failed = alias
+            finally:
+                _alias.reset(token)
+            if not self.failed(request, alias):
+                return self.finish(request, response, None)
+            mark_down(alias)
+        return self.finish(request, self.get_response(request), None)
+
+    async def __acall__(self, request):
+        alias = await sync_to_async(self.select)(request)
+        if alias is not None:
+            token = _alias.set(alias)
+            try:
+                response = await self.get_response(request)
+            except DatabaseError:
+                response = None
+                request.replica_failed = alias
+            finally:
+                _alias.reset(token)
+            if not self.failed(request, alias):
+                return self.finish(request, response, None)
+            mark_down(alias)
+        return self.finish(request, await self.get_response(request), None)
@@ -3,6 +3,7 @@ from django.db import IntegrityError
 from rest_framework.exceptions import ValidationError
 from rest_framework.generics import get_object_or_404
 from rest_framework import serializers
+from rest_framework.settings import ISO_8601, api_settings
 from courseoutline.models import *
 
 User = get_user_model()
@@ -125,8 +126,9 @@ class ApprovalSerializer(AccountSerializer):
 
 
 class OutlineSerializer(serializers.ModelSerializer):
-    course = CourseSerializer(many=True)
-    evaluation = EvaluationSerializer(many=True)
+    # Khóa học / đánh giá được thêm qua add_course, add_evaluation; PUT / PATCH chỉ sửa các cột của đề cương
+    course = CourseSerializer(many=True, read_only=True)
+    evaluation = EvaluationSerializer(many=True, read_only=True)
 
     def to_representation(self, instance):
         req = super().to_representation(instance)
@@ -137,8 +139,8 @@ class OutlineSerializer(serializers.ModelSerializer):
     class Meta:
         model = Outline
         fields = ['id', 'name', 'credit', 'overview', 'created_date', 'image', 'lecturer', 'course',
-                  'lesson', 'evaluation']
-        read_only_fields = ['lecturer']
+                  'lesson', 'evaluation', 'version']
+        read_only_fields = ['lecturer', 'version']
 
     def create(self, validated_data):
         raise NotImplementedError("Use OutlineViewSet.create_outline to create outlines.")
@@ -158,6 +160,21 @@ class CommentSerializer(serializers.ModelSerializer):
         read_only_fields = ['student', 'outline']
 
 
+class MessageSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Message
+        fields = ['id', 'chat', 'sender', 'content', 'created_date']
+        read_only_fields = ['chat', 'sender']
+
+
+class ChatSerializer(serializers.ModelSerializer):
+    unread = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = Chat
+        fields = ['id', 'lecturer', 'student', 'created_date', 'unread']
+
+
 class OutlineApprovalSerializer(serializers.ModelSerializer):
     class Meta:
         model = Outline
@@ -170,3 +187,169 @@ class CreateOutlineSerializer(serializers.ModelSerializer):
         fields = ['id', 'name', 'credit', 'overview', 'created_date', 'updated_date', 'lecturer',
                   'lesson']
         read_only_fields = ['lecturer']
+
+
+class LookupRelatedField(serializers.PrimaryKeyRelatedField):
+    # Tra khóa ngoại trong dict đã nạp sẵn cho cả lô (context[lookup]) thay vì một truy vấn mỗi dòng
+    def __init__(self, lookup, **kwargs):
+        self.lookup = lookup
+        super().__init__(**kwargs)
+
+    def to_internal_value(self, data):
+        try:
+            obj = self.context[self.lookup].get(int(data))
+        except (TypeError, ValueError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if obj is None:
+            self.fail('does_not_exist', pk_value=data)
+        return obj
+
+
+class ImportEvaluationSerializer(serializers.Serializer):
+    method = serializers.CharField(max_length=255)
+    percentage = serializers.FloatField(min_value=0, max_value=100)
+    note = serializers.CharField(max_length=255, required=False, allow_blank=True, default='')
+
+
+class ImportFileSerializer(serializers.Serializer):
+    # Chỉ để mô tả form upload của /outlines/import/ trong schema OpenAPI
+    file = serializers.FileField()
+
+
+class EnrollSerializer(serializers.Serializer):
+    # Body của /courses/<year>/enroll/: các danh sách id, không nhận chuỗi hay số đơn lẻ
+    students = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, allow_null=True,
+                                     default=None)
+    lessons = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    outlines = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+
+
+class ImportOutlineSerializer(CreateOutlineSerializer):
+    # Cùng rule với CreateOutlineSerializer, thêm khóa học và đánh giá (rule như add_evaluation) cho import hàng loạt
+    lesson = LookupRelatedField('lessons', queryset=Lesson.objects.all())
+    lecturer = LookupRelatedField('lecturers', queryset=Lecturer.objects.all(), required=False)
+    course = serializers.ListField(child=serializers.IntegerField(min_value=1), required=False, default=list)
+    evaluation = ImportEvaluationSerializer(many=True, required=False, default=list)
+
+    class Meta(CreateOutlineSerializer.Meta):
+        fields = ['name', 'credit', 'overview', 'lesson', 'lecturer', 'course', 'evaluation']
+        read_only_fields = []
+
+    def validate_evaluation(self, evaluations):
+        if evaluations and not 2 <= len(evaluations) <= 5:
+            raise ValidationError("Total number of evaluations must be between 2 and 5.")
+        if evaluations and sum(e['percentage'] for e in evaluations) != 100:
+            raise ValidationError("Total percentage of all evaluations must equal 100.")
+        return evaluations
+
+    def validate(self, attrs):
+        lecturer = self.context.get('lecturer') or attrs.get('lecturer')
+        if lecturer is None:
+            raise ValidationError({'lecturer': "This field is required."})
+        attrs['lecturer'] = lecturer
+        return attrs
+
+
+class AuditEventSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AuditEvent
+        fields = ['id', 'event_id', 'created_date', 'actor', 'actor_name', 'action', 'target_type', 'target_id',
+                  'changes', 'ip']
+
+
+# Đường đọc nhanh cho các danh sách lớn: dựng output trực tiếp từ .values(), kết quả giống hệt serializer gốc
+
+_datetime = serializers.DateTimeField()
+
+
+def datetime_formatter():
+    # Giống DateTimeField.to_representation nhưng chỉ tra múi giờ một lần cho cả danh sách
+    tz = _datetime.default_timezone()
+    if tz is None or api_settings.DATETIME_FORMAT is None or api_settings.DATETIME_FORMAT.lower() != ISO_8601:
+        return _datetime.to_representation
+
+    def format_datetime(value):
+        if not value or value.tzinfo is None:
+            return _datetime.to_representation(value)
+        value = value.astimezone(tz).isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+
+    return format_datetime
+
+
+class ValuesSerializer:
+    values = ()
+    datetimes = ()
+
+    def __init__(self, rows):
+        self.rows = rows
+
+    @classmethod
+    def queryset(cls, queryset):
+        return queryset.values(*cls.values)
+
+    def prefetch(self, rows):
+        pass
+
+    def to_representation(self, row):
+        for name in self.datetimes:
+            row[name] = self.format_datetime(row[name])
+        return row
+
+    @property
+    def data(self):
+        self.format_datetime = datetime_formatter()
+        rows = [dict(row) for row in self.rows]
+        self.prefetch(rows)
+        return [self.to_representation(row) for row in rows]
+
+
+class FastCategorySerializer(ValuesSerializer):
+    values = ('id', 'created_date', 'updated_date', 'active', 'name')
+    datetimes = ('created_date', 'updated_date')
+
+
+class FastLessonSerializer(ValuesSerializer):
+    values = ('id', 'created_date', 'updated_date', 'active', 'subject', 'lecturer', 'category')
+    datetimes = ('created_date', 'updated_date')
+
+
+class FastCommentSerializer(ValuesSerializer):
+    values = ('id', 'content', 'outline', 'created_date', 'updated_date', 'student')
+    datetimes = ('created_date', 'updated_date')
+
+
+class FastOutlineSerializer(ValuesSerializer):
+    values = ('id', 'name', 'credit', 'overview', 'created_date', 'image', 'lecturer', 'lesson', 'version')
+    datetimes = ('created_date',)
+
+    def prefetch(self, rows):
+        # Gom dữ liệu many-to-many của cả trang bằng một truy vấn cho mỗi quan hệ,
+        # giữ thứ tự '-id' giống prefetch_related của serializer gốc
+        ids = [row['id'] for row in rows]
+        self.courses, self.evaluations = {}, {}
+        for outline_id, year in Outline.course.through.objects.filter(outline_id__in=ids) \
+                .order_by('-course_id').values_list('outline_id', 'course__year'):
+            self.courses.setdefault(outline_id, []).append({'year': year})
+        for outline_id, evaluation_id, percentage, method in Outline.evaluation.through.objects \
+                .filter(outline_id__in=ids).order_by('-evaluation_id') \
+                .values_list('outline_id', 'evaluation_id', 'evaluation__percentage', 'evaluation__method'):
+            self.evaluations.setdefault(outline_id, []).append(
+                {'id': evaluation_id, 'percentage': percentage, 'method': method})
+
+    def to_representation(self, row):
+        return {
+            'id': row['id'],
+            'name': row['name'],
+            'credit': row['credit'],
+            'overview': row['overview'],
+            'created_date': self.format_datetime(row['created_date']),
+            'image': row['image'].url,
+            'lecturer': row['lecturer'],
+            'course': self.courses.get(row['id'], []),
+            'lesson': row['lesson'],
+            'evaluation': self.evaluations.get(row['id'], []),
+            'version': row['version'],
+        }
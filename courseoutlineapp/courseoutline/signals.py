@@ -0,0 +1,266 @@
+from django.core.signals import request_finished
+from django.db.models import Q
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+
+from courseoutline import audit, autocomplete, feeds, snapshots, stats
+from courseoutline.models import *
+
+CourseOutline = Outline.course.through
+FEED_FIELDS = ('active', 'is_approved', 'lesson_id')
+
+
+def courses_of(*args, **lookup):
+    return CourseOutline.objects.filter(*args, **lookup).values_list('course_id', flat=True)
+
+
+@receiver(post_save, sender=Outline)
+@receiver(pre_delete, sender=Outline)
+def outline_changed(sender, instance, **kwargs):
+    snapshots.schedule(courses_of(outline_id=instance.pk))
+
+
+@receiver(m2m_changed, sender=CourseOutline)
+def outline_courses_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if isinstance(instance, Outline):
+        snapshots.schedule(pk_set if pk_set else courses_of(outline_id=instance.pk))
+    else:
+        snapshots.schedule([instance.pk])
+
+
+@receiver(m2m_changed, sender=Outline.evaluation.through)
+def outline_evaluations_changed(sender, instance, action, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'post_clear'):
+        return
+    if isinstance(instance, Outline):
+        snapshots.schedule(courses_of(outline_id=instance.pk))
+    else:
+        snapshots.schedule(courses_of(outline__evaluation=instance.pk))
+
+
+@receiver(post_save, sender=Evaluation)
+def evaluation_changed(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.schedule(courses_of(outline__evaluation=instance.pk))
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_changed(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.schedule(courses_of(outline__lesson=instance.pk))
+
+
+@receiver(post_save, sender=Lecturer)
+def lecturer_changed(sender, instance, created, **kwargs):
+    if not created:
+        snapshots.schedule(courses_of(Q(outline__lecturer=instance.pk) | Q(outline__lesson__lecturer=instance.pk)))
+
+
+# Bảng "đề cương của tôi" (FeedEntry) được làm mới ngay trong transaction, chỉ cho khóa/đề cương/sinh viên bị ảnh hưởng
+
+@receiver(pre_save, sender=Outline)
+def outline_feed_before(sender, instance, **kwargs):
+    instance._feed_old = Outline.objects.filter(pk=instance.pk).values(*FEED_FIELDS).first() if instance.pk else None
+
+
+@receiver(post_save, sender=Outline)
+def outline_feed_changed(sender, instance, created, **kwargs):
+    # Chỉ dựng lại khi đổi trạng thái duyệt / hoạt động / môn học. Sửa tên, nội dung... thì FeedEntry giữ nguyên
+    # vì feed đọc các cột đó (cả updated_date) trực tiếp từ bảng đề cương. Đề cương mới chưa gắn khóa / sinh viên nào
+    old = getattr(instance, '_feed_old', None)
+    if not created and (old is None or any(old[field] != getattr(instance, field) for field in FEED_FIELDS)):
+        feeds.refresh_outline(instance.pk)
+
+
+@receiver(m2m_changed, sender=CourseOutline)
+def outline_courses_feed_changed(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            feeds.refresh_course(instance.pk)
+        else:
+            feeds.refresh_outline(instance.pk)
+
+
+@receiver(m2m_changed, sender=Course.lessons.through)
+def course_lessons_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear' and reverse:
+        instance._feed_courses = list(sender.objects.filter(lesson_id=instance.pk).values_list('course_id', flat=True))
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        course_ids = (pk_set or getattr(instance, '_feed_courses', [])) if reverse else [instance.pk]
+        for course_id in course_ids:
+            feeds.refresh_course(course_id)
+
+
+@receiver(m2m_changed, sender=Student.outline.through)
+def student_outlines_changed(sender, instance, action, reverse, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if reverse:
+            feeds.refresh_outline(instance.pk)
+        else:
+            feeds.refresh_student(instance.pk)
+
+
+@receiver(post_save, sender=Student)
+def student_changed(sender, instance, created, **kwargs):
+    if not created:
+        feeds.refresh_student(instance.pk)
+
+
+# Bảng thống kê (Statistic): pre_save ghi lại trạng thái cũ, post_save cộng / trừ phần chênh lệch
+
+@receiver(pre_save, sender=Outline)
+def outline_stats_before(sender, instance, **kwargs):
+    instance._stats_old = stats.outline_state(pk=instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Outline)
+def outline_stats_changed(sender, instance, **kwargs):
+    stats.outline_saved(getattr(instance, '_stats_old', None), instance)
+
+
+@receiver(pre_delete, sender=Outline)
+def outline_stats_deleted(sender, instance, **kwargs):
+    stats.outline_deleted(instance)
+
+
+@receiver(pre_save, sender=Comment)
+def comment_stats_before(sender, instance, **kwargs):
+    instance._stats_old = stats.comment_state(pk=instance.pk) if instance.pk else None
+
+
+@receiver(post_save, sender=Comment)
+def comment_stats_changed(sender, instance, **kwargs):
+    stats.comment_saved(getattr(instance, '_stats_old', None), instance)
+
+
+@receiver(pre_delete, sender=Comment)
+def comment_stats_deleted(sender, instance, **kwargs):
+    old = stats.comment_state(pk=instance.pk)
+    if old and old['active']:
+        stats.bump('comments.outline', old['outline_id'], -1)
+        stats.bump('comments.lecturer', old['outline__lecturer_id'], -1)
+
+
+@receiver(m2m_changed, sender=CourseOutline)
+def outline_courses_stats_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._stats_cleared = set(sender.objects.filter(**{'course_id' if reverse else 'outline_id': instance.pk})
+                                      .values_list('outline_id' if reverse else 'course_id', flat=True))
+    sign = {'post_add': 1, 'post_remove': -1, 'post_clear': -1}.get(action)
+    if sign:
+        pk_set = pk_set if action != 'post_clear' else getattr(instance, '_stats_cleared', ())
+        stats.course_links(sign, instance, reverse, pk_set)
+
+
+@receiver(m2m_changed, sender=Outline.evaluation.through)
+def outline_evaluations_stats_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_clear':
+        instance._stats_cleared = set(
+            sender.objects.filter(**{'evaluation_id' if reverse else 'outline_id': instance.pk})
+            .values_list('outline_id' if reverse else 'evaluation_id', flat=True))
+    sign = {'post_add': 1, 'post_remove': -1, 'post_clear': -1}.get(action)
+    if sign:
+        pk_set = pk_set if action != 'post_clear' else getattr(instance, '_stats_cleared', ())
+        stats.evaluation_links(sign, instance, reverse, pk_set)
+
+
+@receiver(pre_save, sender=Evaluation)
+def evaluation_stats_before(sender, instance, **kwargs):
+    instance._stats_old = Evaluation.objects.filter(pk=instance.pk).values('method', 'percentage').first() \
+        if instance.pk else None
+
+
+@receiver(post_save, sender=Evaluation)
+def evaluation_stats_changed(sender, instance, **kwargs):
+    old = getattr(instance, '_stats_old', None)
+    if old and (old['method'], old['percentage']) != (instance.method, instance.percentage):
+        stats.evaluation_moved(old, instance)
+
+
+@receiver(pre_delete, sender=Evaluation)
+def evaluation_stats_deleted(sender, instance, **kwargs):
+    stats.evaluation_links(-1, instance, True, instance.outline_set.values_list('id', flat=True))
+
+
+@receiver(pre_save, sender=Lesson)
+def lesson_stats_before(sender, instance, **kwargs):
+    instance._stats_category = Lesson.objects.filter(pk=instance.pk).values_list('category_id', flat=True).first() \
+        if instance.pk else None
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_stats_changed(sender, instance, created, **kwargs):
+    old = getattr(instance, '_stats_category', None)
+    if not created and old != instance.category_id:
+        moved = stats.active_outlines(lesson=instance.pk)
+        stats.bump('outlines.category', old, -moved)
+        stats.bump('outlines.category', instance.category_id, moved, label=lambda: instance.category.name)
+
+
+@receiver(post_save, sender=Category)
+def category_stats_changed(sender, instance, created, **kwargs):
+    if not created:
+        stats.rename('outlines.category', instance.pk, instance.name)
+
+
+@receiver(post_save, sender=Lecturer)
+def lecturer_stats_changed(sender, instance, created, **kwargs):
+    if not created:
+        stats.rename('comments.lecturer', instance.pk, str(instance))
+
+
+@receiver(pre_delete, sender=Course)
+def course_stats_deleted(sender, instance, **kwargs):
+    Statistic.objects.filter(dimension='outlines.course', key=str(instance.year)).delete()
+
+
+# Chỉ mục gợi ý tìm kiếm (autocomplete) trong bộ nhớ của process: cập nhật sau khi transaction commit
+
+@receiver(post_save, sender=Outline)
+def outline_autocomplete_changed(sender, instance, created, **kwargs):
+    autocomplete.saved('outline', instance.pk, instance.name, instance.active)
+    if created and instance.active:
+        autocomplete.popular('lesson', instance.lesson_id)
+
+
+@receiver(post_save, sender=Lesson)
+def lesson_autocomplete_changed(sender, instance, created, **kwargs):
+    autocomplete.saved('lesson', instance.pk, instance.subject, instance.active)
+    if created and instance.active:
+        autocomplete.popular('category', instance.category_id)
+
+
+@receiver(post_save, sender=Category)
+def category_autocomplete_changed(sender, instance, **kwargs):
+    autocomplete.saved('category', instance.pk, instance.name, instance.active)
+
+
+@receiver(post_delete, sender=Outline)
+@receiver(post_delete, sender=Lesson)
+@receiver(post_delete, sender=Category)
+def autocomplete_deleted(sender, instance, **kwargs):
+    autocomplete.deleted(sender._meta.model_name, instance.pk)
+
+
+@receiver(post_save, sender=Comment)
+def comment_autocomplete_changed(sender, instance, created, **kwargs):
+    if created and instance.active:
+        autocomplete.popular('outline', instance.outline_id)
+
+
+@receiver(m2m_changed, sender=Student.outline.through)
+def student_outlines_autocomplete_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'post_add':
+        if reverse:
+            autocomplete.popular('outline', instance.pk, len(pk_set))
+        else:
+            for outline_id in pk_set:
+                autocomplete.popular('outline', outline_id)
+
+
+@receiver(request_finished)
+def audit_request_finished(sender, **kwargs):
+    # Hết request thì đẩy các sự kiện audit đang chờ sang luồng nền ghi vào CSDL
+    audit.buffer.flush_async()
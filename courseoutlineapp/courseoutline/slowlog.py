@@ -0,0 +1,142 @@
+import hashlib
+import logging
+import re
+import threading
+import time
+import traceback
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from django.db.models import F
+from django.db.models.functions import Greatest
+
+from courseoutline.middleware import WrappingMiddleware, wrap_connections
+
+logger = logging.getLogger(__name__)
+
+_view = ContextVar('slowlog_view', default='')
+_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix='slowlog')
+_pending = 0
+_pending_lock = threading.Lock()
+
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PLACEHOLDER = re.compile(r'%s|\?')
+_IN_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)*\s*\)')
+_SPACES = re.compile(r'\s+')
+
+
+def threshold():
+    return getattr(settings, 'SLOW_QUERY_THRESHOLD_MS', 200)
+
+
+def normalize(sql):
+    sql = _STRING.sub('?', sql)
+    sql = _NUMBER.sub('?', sql)
+    sql = _PLACEHOLDER.sub('?', sql)
+    sql = _IN_LIST.sub('(...)', sql)
+    return _SPACES.sub(' ', sql).strip()
+
+
+def fingerprint(normalized):
+    return hashlib.sha1(normalized.encode()).hexdigest()
+
+
+def _stack():
+    base = str(settings.BASE_DIR)
+    frames = [f for f in traceback.extract_stack()[:-3]
+              if f.filename.startswith(base) and 'site-packages' not in f.filename]
+    return ''.join(traceback.format_list(frames[-10:]))
+
+
+def explain(alias, sql, params):
+    connection = connections[alias]
+    prefix = 'EXPLAIN QUERY PLAN ' if connection.vendor == 'sqlite' else 'EXPLAIN '
+    with connection.cursor() as cursor:
+        cursor.execute(prefix + sql, params)
+        return '\n'.join(' | '.join(str(col) for col in row) for row in cursor.fetchall())
+
+
+def record(event):
+    # Chạy trong luồng nền: gộp theo fingerprint và lưu EXPLAIN một lần (cột explain trống = chưa chạy).
+    # Luồng sống lâu nên tự đóng kết nối quá hạn; lỗi ghi vào log vì Future của executor bị bỏ qua
+    global _pending
+    from courseoutline.models import SlowQuery
+    try:
+        close_old_connections()
+        query, created = SlowQuery.objects.get_or_create(
+            fingerprint=event['fingerprint'],
+            defaults={'normalized': event['normalized'], 'sample_sql': event['sql'],
+                      'params': event['params'], 'view': event['view'], 'stack': event['stack']})
+        SlowQuery.objects.filter(pk=query.pk).update(
+            count=F('count') + 1, total_time=F('total_time') + event['duration'],
+            max_time=Greatest('max_time', event['duration']), view=event['view'])
+
+        if not query.explain and event['sql'].lstrip()[:6].upper() == 'SELECT':
+            try:
+                plan = explain(event['alias'], event['sql'], event['raw_params'])
+            except Exception as ex:
+                plan = f'EXPLAIN failed: {ex}'
+            SlowQuery.objects.filter(pk=query.pk).update(explain=plan)
+
+        if created:
+            limit = getattr(settings, 'SLOW_QUERY_MAX_ENTRIES', 500)
+            stale = SlowQuery.objects.order_by('-total_time').values_list('pk', flat=True)[limit:]
+            SlowQuery.objects.filter(pk__in=list(stale)).delete()
+    except Exception:
+        logger.exception('Could not record slow query %s', event['fingerprint'])
+    finally:
+        close_old_connections()
+        with _pending_lock:
+            _pending -= 1
+
+
+def submit(event):
+    global _pending
+    with _pending_lock:
+        if _pending >= getattr(settings, 'SLOW_QUERY_MAX_PENDING', 1000):
+            return
+        _pending += 1
+    _executor.submit(record, event)
+
+
+class SlowQueryLogger:
+    def __init__(self, alias):
+        self.alias = alias
+
+    def __call__(self, execute, sql, params, many, context):
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            duration = (time.perf_counter() - start) * 1000
+            if duration >= threshold() and not many:
+                normalized = normalize(sql)
+                submit({
+                    'alias': self.alias,
+                    'sql': sql,
+                    'raw_params': params,
+                    'params': repr(params)[:2000],
+                    'normalized': normalized,
+                    'fingerprint': fingerprint(normalized),
+                    'duration': duration,
+                    'view': _view.get(),
+                    'stack': _stack(),
+                })
+
+
+class SlowQueryMiddleware(WrappingMiddleware):
+    @contextmanager
+    def wrap(self, request):
+        token = _view.set(request.path)
+        try:
+            with wrap_connections(lambda conn: SlowQueryLogger(conn.alias)):
+                yield
+        finally:
+            _view.reset(token)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        _view.set(request.resolver_match.view_name or request.path)
@@ -0,0 +1,207 @@
+import gzip
+import hashlib
+import json
+import os
+import sqlite3
+import struct
+import tempfile
+import threading
+from pathlib import Path
+
+from django.conf import settings
+from django.db import IntegrityError, connections, transaction
+
+from courseoutline.models import *
+
+PAGE_SIZE = 4096
+DIFF_MAGIC = b'COSD1'
+DIFF_MEDIA_TYPE = 'application/vnd.courseoutline.snapshot-diff'
+
+SCHEMA = '''
+CREATE TABLE meta (key TEXT PRIMARY KEY, value TEXT);
+CREATE TABLE lecturer (id INTEGER PRIMARY KEY, first_name TEXT, last_name TEXT, position TEXT);
+CREATE TABLE lesson (id INTEGER PRIMARY KEY, subject TEXT, lecturer_id INTEGER, category_id INTEGER);
+CREATE TABLE evaluation (id INTEGER PRIMARY KEY, percentage REAL, method TEXT, note TEXT);
+CREATE TABLE outline (id INTEGER PRIMARY KEY, name TEXT, credit INTEGER, overview TEXT, image TEXT,
+                      lesson_id INTEGER, lecturer_id INTEGER, updated_date TEXT);
+CREATE TABLE outline_evaluation (outline_id INTEGER, evaluation_id INTEGER,
+                                 PRIMARY KEY (outline_id, evaluation_id)) WITHOUT ROWID;
+'''
+
+
+def snapshot_dir():
+    path = Path(getattr(settings, 'SNAPSHOT_DIR', settings.BASE_DIR / 'snapshots'))
+    path.mkdir(parents=True, exist_ok=True)
+    return path
+
+
+def collect(course):
+    # Đọc toàn bộ đề cương đã duyệt của khóa theo thứ tự id để file SQLite sinh ra ổn định giữa các phiên bản
+    outlines = list(Outline.objects.filter(course=course, active=True, is_approved=True).order_by('id')
+                    .values_list('id', 'name', 'credit', 'overview', 'image', 'lesson_id', 'lecturer_id',
+                                 'updated_date'))
+    outline_ids = [row[0] for row in outlines]
+    links = list(Outline.evaluation.through.objects.filter(outline_id__in=outline_ids)
+                 .order_by('outline_id', 'evaluation_id').values_list('outline_id', 'evaluation_id'))
+    lesson_ids = {row[5] for row in outlines}
+    lecturer_ids = {row[6] for row in outlines}
+    lessons = list(Lesson.objects.filter(id__in=lesson_ids).order_by('id')
+                   .values_list('id', 'subject', 'lecturer_id', 'category_id'))
+    lecturer_ids |= {row[2] for row in lessons}
+    return {
+        'outline': [(o[0], o[1], o[2], o[3], o[4].url if o[4] is not None else None, o[5], o[6], o[7].isoformat())
+                    for o in outlines],
+        'outline_evaluation': links,
+        'lesson': lessons,
+        'lecturer': list(Lecturer.objects.filter(id__in=lecturer_ids).order_by('id')
+                         .values_list('id', 'first_name', 'last_name', 'position')),
+        'evaluation': list(Evaluation.objects.filter(id__in={e for _, e in links}).order_by('id')
+                           .values_list('id', 'percentage', 'method', 'note')),
+    }
+
+
+def fingerprint(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, ensure_ascii=False).encode()).hexdigest()
+
+
+def write_sqlite(course, data, version):
+    fd, path = tempfile.mkstemp(suffix='.sqlite3')
+    os.close(fd)
+    try:
+        db = sqlite3.connect(path)
+        db.execute(f'PRAGMA page_size={PAGE_SIZE}')
+        db.execute('PRAGMA journal_mode=OFF')
+        db.executescript(SCHEMA)
+        db.executemany('INSERT INTO meta VALUES (?, ?)', [('year', str(course.year)), ('version', str(version))])
+        for table, rows in data.items():
+            if rows:
+                marks = ', '.join('?' * len(rows[0]))
+                db.executemany(f'INSERT INTO {table} VALUES ({marks})', rows)
+        db.commit()
+        db.close()
+        with open(path, 'rb') as f:
+            return f.read()
+    finally:
+        os.unlink(path)
+
+
+def build(course, force=False):
+    data = collect(course)
+    digest = fingerprint(data)
+    try:
+        with transaction.atomic():
+            # Khóa dòng của khóa học để hai lần build đồng thời (luồng nền và request đầu tiên) không trùng version
+            Course.objects.select_for_update().get(pk=course.pk)
+            latest = course.snapshots.first()
+            if latest and latest.fingerprint == digest and not force and Path(latest.path).exists():
+                return latest
+
+            version = latest.version + 1 if latest else 1
+            path = snapshot_dir() / f'course-{course.year}-v{version}.sqlite3.gz'
+            fd, temp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+            try:
+                with os.fdopen(fd, 'wb') as f:
+                    f.write(gzip.compress(write_sqlite(course, data, version), mtime=0))
+                snapshot = Snapshot.objects.create(course=course, version=version, fingerprint=digest,
+                                                   path=str(path), size=os.path.getsize(temp),
+                                                   outlines=len(data['outline']))
+                os.replace(temp, path)
+            finally:
+                if os.path.exists(temp):
+                    os.unlink(temp)
+    except IntegrityError:
+        # CSDL không khóa được dòng (SQLite): một lần build khác vừa ghi version này, dùng bản của nó
+        return course.snapshots.first()
+    prune(course)
+    return snapshot
+
+
+def prune(course):
+    keep = getattr(settings, 'SNAPSHOT_KEEP', 5)
+    for old in course.snapshots.all()[keep:]:
+        for file in snapshot_dir().glob(f'course-{course.year}-*v{old.version}*'):
+            file.unlink(missing_ok=True)
+        old.delete()
+
+
+def make_diff(old, new):
+    # Diff theo trang SQLite: chỉ gửi các trang khác nhau cùng kích thước file mới
+    parts = [DIFF_MAGIC, struct.pack('>QI', len(new), PAGE_SIZE)]
+    for offset in range(0, len(new), PAGE_SIZE):
+        page = new[offset:offset + PAGE_SIZE]
+        if old[offset:offset + PAGE_SIZE] != page:
+            parts.append(struct.pack('>I', offset // PAGE_SIZE))
+            parts.append(page)
+    return b''.join(parts)
+
+
+def apply_diff(old, diff):
+    if diff[:len(DIFF_MAGIC)] != DIFF_MAGIC:
+        raise ValueError('Not a snapshot diff')
+    header = len(DIFF_MAGIC)
+    size, page_size = struct.unpack('>QI', diff[header:header + 12])
+    result = bytearray(old[:size].ljust(size, b'\0'))
+    position = header + 12
+    while position < len(diff):
+        (page_no,) = struct.unpack('>I', diff[position:position + 4])
+        start = page_no * page_size
+        chunk = diff[position + 4:position + 4 + min(page_size, size - start)]
+        result[start:start + len(chunk)] = chunk
+        position += 4 + len(chunk)
+    return bytes(result)
+
+
+def diff_path(base, target):
+    # Trả về file diff đã nén giữa hai phiên bản, hoặc None nếu diff không nhỏ hơn bản đầy đủ
+    path = snapshot_dir() / f'course-{target.course.year}-v{base.version}-v{target.version}.diff.gz'
+    if not path.exists():
+        if not Path(base.path).exists() or not Path(target.path).exists():
+            return None
+        with gzip.open(base.path) as old, gzip.open(target.path) as new:
+            diff = make_diff(old.read(), new.read())
+        # Ghi ra file tạm rồi os.replace, request đồng thời không đọc phải file diff đang ghi dở
+        fd, temp = tempfile.mkstemp(dir=path.parent, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(gzip.compress(diff, mtime=0))
+            os.replace(temp, path)
+        finally:
+            if os.path.exists(temp):
+                os.unlink(temp)
+    if path.stat().st_size >= target.size * getattr(settings, 'SNAPSHOT_DIFF_RATIO', 0.5):
+        return None
+    return path
+
+
+_lock = threading.Lock()
+_pending = set()
+
+
+def _rebuild(course_id):
+    with _lock:
+        _pending.discard(course_id)
+    try:
+        course = Course.objects.filter(pk=course_id).first()
+        if course is not None:
+            build(course)
+    finally:
+        connections.close_all()
+
+
+def _start(course_ids):
+    with _lock:
+        new = course_ids - _pending
+        _pending.update(new)
+    for course_id in new:
+        timer = threading.Timer(getattr(settings, 'SNAPSHOT_DEBOUNCE', 5), _rebuild, [course_id])
+        timer.daemon = True
+        timer.start()
+
+
+def schedule(course_ids):
+    # Gom các thay đổi liên tiếp rồi build lại trong luồng nền, chỉ cho các khóa bị ảnh hưởng
+    if not getattr(settings, 'SNAPSHOT_AUTO_REBUILD', True):
+        return
+    course_ids = set(course_ids)
+    if course_ids:
+        transaction.on_commit(lambda: _start(course_ids))
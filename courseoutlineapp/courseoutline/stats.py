@@ -0,0 +1,214 @@
+from collections import defaultdict
+
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum, Value
+from django.db.models.functions import Concat
+
+from courseoutline.models import *
+
+CourseOutline = Outline.course.through
+OutlineEvaluation = Outline.evaluation.through
+
+DIMENSIONS = ('outlines.category', 'outlines.credit', 'outlines.approval', 'outlines.course',
+              'comments.outline', 'comments.lecturer', 'evaluations.method')
+
+
+def approval(is_approved):
+    return 'approved' if is_approved else 'pending'
+
+
+# Gom nhóm trên một tập đề cương / bình luận: dùng cho rebuild (toàn bộ bảng) và cho các đường ghi hàng loạt
+
+def outline_groups(outlines):
+    outlines = outlines.filter(active=True)
+    for row in outlines.values('lesson__category_id', 'lesson__category__name').annotate(n=Count('id')):
+        yield 'outlines.category', row['lesson__category_id'], row['lesson__category__name'], row['n'], 0
+    for row in outlines.values('credit').annotate(n=Count('id')):
+        yield 'outlines.credit', row['credit'], row['credit'], row['n'], 0
+    for row in outlines.values('is_approved').annotate(n=Count('id')):
+        yield 'outlines.approval', approval(row['is_approved']), approval(row['is_approved']), row['n'], 0
+    for row in CourseOutline.objects.filter(outline__in=outlines).values('course__year').annotate(n=Count('id')):
+        yield 'outlines.course', row['course__year'], row['course__year'], row['n'], 0
+    for row in OutlineEvaluation.objects.filter(outline__in=outlines).values('evaluation__method') \
+            .annotate(n=Count('id'), total=Sum('evaluation__percentage')):
+        yield 'evaluations.method', row['evaluation__method'], row['evaluation__method'], row['n'], row['total']
+
+
+def comment_groups(comments):
+    comments = comments.filter(active=True)
+    for row in comments.values('outline_id', 'outline__name').annotate(n=Count('id')):
+        yield 'comments.outline', row['outline_id'], row['outline__name'], row['n'], 0
+    for row in comments.values('outline__lecturer_id') \
+            .annotate(name=Concat('outline__lecturer__last_name', Value(' '), 'outline__lecturer__first_name'),
+                      n=Count('id')):
+        yield 'comments.lecturer', row['outline__lecturer_id'], row['name'], row['n'], 0
+
+
+@transaction.atomic
+def rebuild():
+    Statistic.objects.all().delete()
+    Statistic.objects.bulk_create([
+        Statistic(dimension=dimension, key=str(key), label=str(label), count=count, total=total or 0)
+        for groups in (outline_groups(Outline.objects.all()), comment_groups(Comment.objects.all()))
+        for dimension, key, label, count, total in groups])
+    return Statistic.objects.count()
+
+
+def bump(dimension, key, count=1, total=0, label=None):
+    # Cộng dồn bằng một câu UPDATE ... SET count = count + n, chưa có dòng thì tạo
+    # (label có thể là hàm, chỉ gọi khi tạo)
+    if not count and not total:
+        return
+    rows = Statistic.objects.filter(dimension=dimension, key=str(key))
+    if rows.update(count=F('count') + count, total=F('total') + total) or count < 0:
+        return
+    label = label() if callable(label) else label
+    try:
+        with transaction.atomic():
+            Statistic.objects.create(dimension=dimension, key=str(key), label=str(key if label is None else label),
+                                     count=count, total=total)
+    except IntegrityError:
+        rows.update(count=F('count') + count, total=F('total') + total)
+
+
+def apply(changes):
+    for (dimension, key), (count, total, label) in changes.items():
+        bump(dimension, key, count, total, label)
+
+
+def add_outlines(outlines):
+    # Cho bulk_create / INSERT ... SELECT (import, rollover) vốn không phát signal
+    for dimension, key, label, count, total in outline_groups(outlines):
+        bump(dimension, key, count, total or 0, label)
+
+
+def rename(dimension, key, label):
+    Statistic.objects.filter(dimension=dimension, key=str(key)).exclude(label=label).update(label=label)
+
+
+def read(dimension=None, limit=None):
+    queryset = Statistic.objects.filter(count__gt=0).order_by('dimension', '-count', 'key')
+    if dimension:
+        queryset = queryset.filter(dimension=dimension)
+    result = {name: [] for name in ([dimension] if dimension else DIMENSIONS)}
+    for stat in queryset:
+        items = result.setdefault(stat.dimension, [])
+        if limit is None or len(items) < limit:
+            item = {'key': stat.key, 'label': stat.label, 'count': stat.count}
+            if stat.dimension == 'evaluations.method':
+                item['average_percentage'] = round(stat.total / stat.count, 2)
+            items.append(item)
+    return result
+
+
+# Trạng thái của một đề cương / bình luận, dùng để tính chênh lệch trước và sau khi lưu
+
+def outline_state(**lookup):
+    return Outline.objects.filter(**lookup).values(
+        'active', 'credit', 'is_approved', 'name', 'lecturer_id', 'lesson_id', 'lesson__category_id').first()
+
+
+def outline_keys(state, category_name=None):
+    if not state or not state['active']:
+        return []
+    return [('outlines.category', state['lesson__category_id'], category_name),
+            ('outlines.credit', state['credit'], None),
+            ('outlines.approval', approval(state['is_approved']), None)]
+
+
+def outline_links(outline_id, sign):
+    # Khóa học và đánh giá của đề cương, chỉ cần khi đề cương được bật / tắt hoặc bị xóa
+    changes = defaultdict(lambda: [0, 0, None])
+    for year in CourseOutline.objects.filter(outline_id=outline_id).values_list('course__year', flat=True):
+        changes['outlines.course', year][0] += sign
+    for method, percentage in OutlineEvaluation.objects.filter(outline_id=outline_id) \
+            .values_list('evaluation__method', 'evaluation__percentage'):
+        change = changes['evaluations.method', method]
+        change[0] += sign
+        change[1] += sign * percentage
+    return changes
+
+
+def outline_saved(old, instance):
+    new = {'active': instance.active, 'credit': instance.credit, 'is_approved': instance.is_approved}
+    if old and old['lesson_id'] == instance.lesson_id:
+        category = new['lesson__category_id'] = old['lesson__category_id']
+        category_name = lambda: Category.objects.filter(pk=category).values_list('name', flat=True).first()
+    else:
+        new['lesson__category_id'], category_name = Lesson.objects.filter(pk=instance.lesson_id) \
+            .values_list('category_id', 'category__name').first() or (None, None)
+    changes = defaultdict(lambda: [0, 0, None])
+    for dimension, key, _ in outline_keys(old):
+        changes[dimension, key][0] -= 1
+    for dimension, key, label in outline_keys(new, category_name):
+        changes[dimension, key][0] += 1
+        changes[dimension, key][2] = label
+    if old and old['active'] != instance.active:
+        changes.update(outline_links(instance.pk, 1 if instance.active else -1))
+    apply(changes)
+
+    if old and old['lecturer_id'] != instance.lecturer_id:
+        # Bình luận được tính theo giảng viên của đề cương: chuyển cả số bình luận sang giảng viên mới
+        comments = Statistic.objects.filter(dimension='comments.outline', key=str(instance.pk)) \
+            .values_list('count', flat=True).first()
+        if comments:
+            bump('comments.lecturer', old['lecturer_id'], -comments)
+            bump('comments.lecturer', instance.lecturer_id, comments, label=lambda: str(instance.lecturer))
+    if old and old['name'] != instance.name:
+        rename('comments.outline', instance.pk, instance.name)
+
+
+def outline_deleted(instance):
+    old = outline_state(pk=instance.pk)
+    changes = defaultdict(lambda: [0, 0, None])
+    for dimension, key, _ in outline_keys(old):
+        changes[dimension, key][0] -= 1
+    if old and old['active']:
+        changes.update(outline_links(instance.pk, -1))
+    apply(changes)
+    Statistic.objects.filter(dimension='comments.outline', key=str(instance.pk)).delete()
+
+
+def comment_state(**lookup):
+    return Comment.objects.filter(**lookup).values('active', 'outline_id', 'outline__lecturer_id').first()
+
+
+def comment_saved(old, instance):
+    if old and (old['active'], old['outline_id']) == (instance.active, instance.outline_id):
+        return
+    if old and old['active']:
+        bump('comments.outline', old['outline_id'], -1)
+        bump('comments.lecturer', old['outline__lecturer_id'], -1)
+    if instance.active:
+        outline = instance.outline
+        bump('comments.outline', outline.pk, 1, label=lambda: outline.name)
+        bump('comments.lecturer', outline.lecturer_id, 1, label=lambda: str(outline.lecturer))
+
+
+def active_outlines(**lookup):
+    return Outline.objects.filter(active=True, **lookup).count()
+
+
+def evaluation_moved(old, instance):
+    linked = active_outlines(evaluation=instance.pk)
+    if linked:
+        bump('evaluations.method', old['method'], -linked, -linked * old['percentage'])
+        bump('evaluations.method', instance.method, linked, linked * instance.percentage)
+
+
+def course_links(sign, instance, reverse, pk_set):
+    # Thay đổi quan hệ đề cương - khóa học (m2m), chỉ tính đề cương đang active; reverse: instance là Course
+    if reverse:
+        bump('outlines.course', instance.year, sign * active_outlines(pk__in=pk_set))
+    elif instance.active:
+        for year in Course.objects.filter(pk__in=pk_set).values_list('year', flat=True):
+            bump('outlines.course', year, sign)
+
+
+def evaluation_links(sign, instance, reverse, pk_set):
+    if reverse:
+        linked = active_outlines(pk__in=pk_set)
+        bump('evaluations.method', instance.method, sign * linked, sign * linked * instance.percentage)
+    elif instance.active:
+        for method, percentage in Evaluation.objects.filter(pk__in=pk_set).values_list('method', 'percentage'):
+            bump('evaluations.method', method, sign, sign * percentage)
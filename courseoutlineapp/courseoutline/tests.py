@@ -1,3 +1,1218 @@
-from django.test import TestCase
+import asyncio
+import csv
+import gzip
+import io
+import json
+import multiprocessing
+import os
+import subprocess
+import tempfile
+import threading
+import unittest
+from contextlib import nullcontext
+from datetime import timedelta
+from pathlib import Path
+from unittest import mock
 
-# Create your tests here.
+import brotli
+import cbor2
+import msgpack
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, OperationalError, connections, transaction
+from django.db.models import Count
+from django.db.models.signals import pre_save
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import AsyncClient, RequestFactory, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from oauth2_provider.models import AccessToken
+from rest_framework.test import APIClient
+from rest_framework.renderers import JSONRenderer
+
+from courseoutline import archive, audit, autocomplete, benchmarks, cache, enrollment, feeds, importer, openapi, \
+    paginators, profiling, pubsub, rollover, routers, serializers, signals, slowlog, snapshots, stats, throttling, views
+from courseoutline.metrics import registry
+from courseoutline.models import *
+
+
+class SyntheticDataMixin:
+    # Dữ liệu giả lập của seed_synthetic (TestCase: sinh một lần cho cả lớp)
+    scale = 40
+
+    @classmethod
+    def seed(cls):
+        call_command('seed_synthetic', scale=cls.scale, stdout=io.StringIO())
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.seed()
+        super().setUpTestData()
+
+
+class FastSerializerTests(SyntheticDataMixin, TestCase):
+    def assertSameBytes(self, serializer_class, fast_class, queryset):
+        expected = JSONRenderer().render(serializer_class(queryset, many=True).data)
+        actual = JSONRenderer().render(fast_class(fast_class.queryset(queryset)).data)
+        self.assertEqual(expected, actual)
+
+    def test_outline(self):
+        self.assertSameBytes(serializers.OutlineSerializer, serializers.FastOutlineSerializer,
+                             Outline.objects.filter(active=True))
+
+    def test_lesson(self):
+        self.assertSameBytes(serializers.LessonSerializer, serializers.FastLessonSerializer,
+                             Lesson.objects.filter(active=True))
+
+    def test_category(self):
+        self.assertSameBytes(serializers.CategorySerializer, serializers.FastCategorySerializer,
+                             Category.objects.all())
+
+    def test_comment(self):
+        self.assertSameBytes(serializers.CommentSerializer, serializers.FastCommentSerializer,
+                             Comment.objects.all())
+
+
+class StatisticTests(SyntheticDataMixin, TestCase):
+    # Sau mọi thay đổi qua ORM, số liệu cộng dồn bằng signal phải khớp với tính lại từ đầu
+    def assertMatchesRebuild(self):
+        incremental = stats.read()
+        stats.rebuild()
+        self.assertEqual(incremental, stats.read())
+
+    def test_incremental_updates_match_rebuild(self):
+        stats.rebuild()
+        outline = Outline.objects.filter(active=True).first()
+        lecturer = Lecturer.objects.exclude(pk=outline.lecturer_id).first()
+        evaluation = Evaluation.objects.first()
+
+        created = Outline.objects.create(name='Mới', credit=9, overview='x', lesson=outline.lesson,
+                                         lecturer=outline.lecturer)
+        created.course.add(*Course.objects.all()[:2])
+        created.evaluation.add(evaluation)
+        Comment.objects.create(content='a', outline=created, student=Student.objects.first())
+        outline.credit, outline.is_approved, outline.lecturer = 7, not outline.is_approved, lecturer
+        outline.save()
+        Outline.objects.filter(active=True).last().delete()
+        Course.objects.first().outline_set.clear()
+        evaluation.method, evaluation.percentage = 'Vấn đáp', 25
+        evaluation.save()
+        lesson = Lesson.objects.first()
+        lesson.category = Category.objects.exclude(pk=lesson.category_id).first()
+        lesson.save()
+        comment = Comment.objects.first()
+        comment.active = False
+        comment.save()
+        created.active = False
+        created.save()
+        self.assertMatchesRebuild()
+
+    def test_api_is_admin_only(self):
+        self.assertIn(self.client.get('/stats/').status_code, (401, 403))
+
+
+class AuditTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.spool = Path(directory.name)
+        overrides = override_settings(AUDIT_SPOOL_DIR=self.spool, AUDIT_FLUSH_INTERVAL=3600)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(audit, 'buffer', audit.AuditBuffer())
+        self.buffer = patcher.start()
+        self.addCleanup(patcher.stop)
+        self.account = Account.objects.create_superuser('auditor@ou.edu.vn', 'secret', username='auditor')
+
+    def test_events_are_spooled_until_flushed(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            audit.log('account.approve', self.account, actor=self.account, is_approved=True)
+        self.assertFalse(AuditEvent.objects.exists())
+        self.assertEqual(len(self.buffer.path.read_text().splitlines()), 1)
+
+        self.assertEqual(self.buffer.flush(), 1)
+        event = AuditEvent.objects.get()
+        self.assertEqual((event.action, event.actor_name, event.changes), ('account.approve', 'auditor',
+                                                                          {'is_approved': True}))
+        self.assertEqual(self.buffer.path.read_text(), '')
+
+    def test_spool_of_dead_process_is_recovered_once(self):
+        dead = subprocess.Popen(['true'])
+        dead.wait()
+        event = {'event_id': 'a' * 32, 'created_date': '2024-01-01T00:00:00+00:00', 'actor_id': self.account.pk,
+                 'actor_name': 'auditor', 'action': 'outline.approve', 'target_type': 'outline',
+                 'target_id': '1', 'changes': {}, 'ip': None}
+        for _ in range(2):
+            (self.spool / f'audit-{dead.pid}.jsonl').write_text(json.dumps(event) + '\n{"trunc')
+            self.assertEqual(audit.recover(), 1)
+        self.assertEqual(AuditEvent.objects.count(), 1)
+        self.assertEqual(list(self.spool.iterdir()), [])
+
+
+class ArchiveTests(SyntheticDataMixin, TestCase):
+    def test_archive_and_restore_outline(self):
+        stats.rebuild()
+        outline = Outline.objects.filter(comment__isnull=False, student__isnull=False).distinct().first()
+        comments = sorted(outline.comment_set.values_list('id', 'content'))
+        students = sorted(outline.student_set.values_list('id', flat=True))
+        courses = sorted(outline.course.values_list('id', flat=True))
+        outline.active = False
+        outline.save()
+        Outline.objects.filter(pk=outline.pk).update(updated_date=archive.cutoff(400))
+
+        self.assertEqual(archive.archive(['inactive-outlines'], batch_size=1)['inactive-outlines'], 1)
+        self.assertFalse(Outline.objects.filter(pk=outline.pk).exists())
+        self.assertEqual(ArchivedRow.objects.filter(parent_id=outline.pk).count(), len(comments))
+        incremental = stats.read()
+        stats.rebuild()
+        self.assertEqual(stats.read(), incremental)
+
+        self.assertEqual(archive.restore(Outline, [outline.pk])['restored'], [outline.pk])
+        restored = Outline.objects.get(pk=outline.pk)
+        self.assertEqual(sorted(restored.comment_set.values_list('id', 'content')), comments)
+        self.assertEqual(sorted(restored.student_set.values_list('id', flat=True)), students)
+        self.assertEqual(sorted(restored.course.values_list('id', flat=True)), courses)
+        self.assertFalse(ArchivedRow.objects.exists())
+
+    def test_archived_comments_are_read_through(self):
+        outline = Outline.objects.filter(active=True).annotate(comments=Count('comment')).filter(comments__gt=3).first()
+        outline.comment_set.update(active=False, updated_date=archive.cutoff(400))
+        expected = list(outline.comment_set.order_by('-id').values_list('id', flat=True))
+        archive.archive(['inactive-comments'])
+        self.assertFalse(outline.comment_set.exists())
+
+        response = self.client.get(f'/outlines/{outline.pk}/comment/')
+        self.assertEqual([row['id'] for row in response.json()['results']], expected[:3])
+        self.assertEqual(response.json()['count'], len(expected))
+        response = self.client.get(f'/outlines/{outline.pk}/comment/', {'page': 2})
+        self.assertEqual([row['id'] for row in response.json()['results']], expected[3:6])
+
+    def test_live_comments_skip_archive(self):
+        outline = Outline.objects.filter(active=True, comment__isnull=False).first()
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.get(f'/outlines/{outline.pk}/comment/')
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries if ArchivedRow._meta.db_table in q['sql']])
+        self.assertEqual(self.client.get(f'/outlines/{outline.pk}/comment/', {'page': 99}).status_code, 404)
+
+
+class AutocompleteTests(SyntheticDataMixin, TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(AUTOCOMPLETE_SNAPSHOT=Path(directory.name) / 'snapshot.json.gz',
+                                      AUTOCOMPLETE_SYNC_INTERVAL=3600)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        patcher = mock.patch.object(autocomplete, '_index', None)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def test_prefix_search_is_folded_and_weighted(self):
+        outline = Outline.objects.filter(active=True).first()
+        quiet = Outline.objects.create(name='Cấu trúc dữ liệu nâng cao', credit=3, overview='x',
+                                       lesson=outline.lesson, lecturer=outline.lecturer)
+        popular = Outline.objects.create(name='Cấu trúc dữ liệu', credit=3, overview='x',
+                                         lesson=outline.lesson, lecturer=outline.lecturer)
+        Comment.objects.create(content='a', outline=popular, student=Student.objects.first())
+        index = autocomplete.get_index()
+
+        self.assertEqual([row['id'] for row in index.search('cau TRUC', kinds=['outline'])], [popular.pk, quiet.pk])
+        self.assertEqual([row['id'] for row in index.search('nâng', kinds=['outline'])], [quiet.pk])
+        response = self.client.get('/autocomplete/', {'q': 'Cau truc d', 'types': 'outline', 'limit': 1})
+        self.assertEqual(response.json(), [{'type': 'outline', 'id': popular.pk, 'label': 'Cấu trúc dữ liệu'}])
+        self.assertEqual(self.client.get('/autocomplete/', {'q': 'a', 'types': 'user'}).status_code, 400)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            quiet.name = 'Giải thuật'
+            quiet.save()
+            popular.delete()
+        self.assertEqual(index.search('cau truc', kinds=['outline']), [])
+        self.assertEqual(index.search('giai', kinds=['outline'])[0]['id'], quiet.pk)
+
+    def test_set_based_writes_update_index(self):
+        # Import, rollover và ghi danh hàng loạt không phát post_save / m2m_changed
+        index = autocomplete.get_index()
+        lesson = Lesson.objects.filter(active=True).first()
+        weight = lambda kind, pk: index.entries[kind, pk][1]  # noqa: E731
+        lesson_weight = weight('lesson', lesson.pk)
+        file = io.BytesIO('name,credit,overview,lesson,lecturer,course\n'
+                          f'Kiểm thử phần mềm,3,x,{lesson.pk},{lesson.lecturer_id},2030\n'.encode())
+        with self.captureOnCommitCallbacks(execute=True):
+            importer.import_outlines(file, 'csv')
+        imported = Outline.objects.get(name='Kiểm thử phần mềm')
+        self.assertEqual(index.entries['outline', imported.pk][0], 'Kiểm thử phần mềm')
+        self.assertEqual(weight('lesson', lesson.pk), lesson_weight + 1)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            rollover.rollover(2030, 2031)
+        clone = Outline.objects.get(source=imported)
+        self.assertIn(('outline', clone.pk), index.entries)
+
+        Student.objects.filter(pk__in=Student.objects.values('id')[:3]).update(course=clone.course.get())
+        with self.captureOnCommitCallbacks(execute=True):
+            report = enrollment.enroll(2031, outlines=[clone.pk])
+        self.assertEqual(weight('outline', clone.pk), report['enrolled']['outlines'])
+        self.assertEqual(report['enrolled']['outlines'], 3)
+
+    def test_snapshot_is_loaded_and_synced(self):
+        _, rows = autocomplete.build()
+        lesson = Lesson.objects.filter(active=True).first()
+        lesson.subject = 'Học máy'
+        lesson.save()
+        with mock.patch.object(autocomplete, 'build') as build:
+            index = autocomplete.load()
+        build.assert_not_called()
+        self.assertEqual(len(index), len(rows))
+        self.assertEqual(index.search('hoc may', kinds=['lesson'])[0]['id'], lesson.pk)
+
+    def test_memory_is_bounded(self):
+        index = autocomplete.PrefixIndex(max_entries=2)
+        index.load([('category', 1, 'Toán', 5), ('category', 2, 'Tin', 1), ('category', 3, 'Triết', 3)])
+        self.assertEqual(sorted(pk for _, pk in index.entries), [1, 3])
+        index.put('category', 4, 'Thể dục', 0)
+        index.put('category', 5, 'Tiếng Anh', 9)
+        self.assertEqual([row['id'] for row in index.search('t')], [5, 1])
+
+
+class OptimisticConcurrencyTests(SyntheticDataMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.outline = Outline.objects.filter(active=True).first()
+        cls.account = Account.objects.create_user('gv@ou.edu.vn', 'secret', username='gv', role='lecturer')
+        Lecturer.objects.filter(pk=cls.outline.lecturer_id).update(account=cls.account)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.account)
+        self.url = f'/outlines/{self.outline.pk}/'
+
+    def test_update_requires_matching_version(self):
+        self.assertEqual(self.client.patch(self.url, {'name': 'Mới'}, format='json').status_code, 428)
+
+        with CaptureQueriesContext(connections['default']) as queries:
+            response = self.client.patch(self.url, {'name': 'Mới', 'credit': self.outline.credit}, format='json',
+                                         HTTP_IF_MATCH='"1"')
+        self.assertEqual((response.status_code, response['ETag'], response.json()['version']), (200, '"2"', 2))
+        update = next(q['sql'] for q in queries if q['sql'].startswith('UPDATE "courseoutline_outline"'))
+        self.assertNotIn('"credit"', update)
+        self.assertNotIn('"overview"', update)
+
+        # Người thứ hai vẫn giữ version 1: bị từ chối, không ghi đè
+        response = self.client.patch(self.url, {'name': 'Cũ'}, format='json', HTTP_IF_MATCH='"1"')
+        self.assertEqual((response.status_code, response.json()['version']), (412, 2))
+        self.assertEqual(Outline.objects.get(pk=self.outline.pk).name, 'Mới')
+
+        response = self.client.patch(self.url, {'name': 'Cũ', 'version': 2}, format='json')
+        self.assertEqual((response.status_code, Outline.objects.get(pk=self.outline.pk).version), (200, 3))
+        response = self.client.patch(self.url, {'name': 'Nén'}, format='json', HTTP_IF_MATCH='"3-gzip"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_missing_outline_and_permission_come_before_version(self):
+        missing = Outline.objects.order_by('-id').values_list('id', flat=True).first() + 1
+        self.assertEqual(self.client.patch(f'/outlines/{missing}/', {'name': 'x'}, format='json').status_code, 404)
+        self.assertEqual(self.client.patch(f'/outlines/{missing}/update/', {'image': 'x'}).status_code, 404)
+        self.client.force_authenticate(Account.objects.create_user('sv@ou.edu.vn', 'secret', username='sv'))
+        self.assertEqual(self.client.patch(self.url, {'name': 'x'}, format='json').status_code, 403)
+        self.assertEqual(self.client.patch(f'{self.url}update/', {'image': 'x'}).status_code, 403)
+
+    def test_if_match_any_overwrites_current_version(self):
+        Outline.objects.filter(pk=self.outline.pk).update(version=5)
+        response = self.client.patch(self.url, {'name': 'Ghi đè'}, format='json', HTTP_IF_MATCH='*')
+        self.assertEqual((response.status_code, response['ETag']), (200, '"6"'))
+        self.assertEqual(Outline.objects.get(pk=self.outline.pk).name, 'Ghi đè')
+        self.assertEqual(self.client.patch(self.url, {'name': 'x'}, format='json', HTTP_IF_MATCH='"a"').status_code,
+                         400)
+
+
+@unittest.skipUnless('replica' in settings.DATABASES, 'Run with --settings=courseoutlineapp.settings_replica')
+class ReplicaRoutingTests(TransactionTestCase):
+    # Hai CSDL SQLite riêng: dữ liệu chỉ ghi vào primary nên đọc từ replica sẽ không thấy.
+    # TransactionTestCase vì router luôn đọc từ primary khi đang trong transaction
+    databases = '__all__'
+
+    def setUp(self):
+        routers._down.clear()
+        routers._pins.clear()
+        Category.objects.create(name='primary-only')
+        self.middleware = routers.ReplicaMiddleware(
+            lambda request: HttpResponse(','.join(Category.objects.values_list('name', flat=True))))
+
+    def test_get_reads_from_replica(self):
+        self.assertEqual(self.middleware(RequestFactory().get('/categories/')).content, b'')
+
+    def test_write_pins_client_to_primary(self):
+        response = self.middleware(RequestFactory().post('/categories/'))
+        self.assertIn(routers.PIN_COOKIE, response.cookies)
+        self.assertEqual(self.middleware(RequestFactory().get('/categories/')).content, b'primary-only')
+
+    def test_falls_back_to_primary_on_replica_error(self):
+        with mock.patch.object(connections['replica'], 'ensure_connection', side_effect=OperationalError):
+            self.assertEqual(self.middleware(RequestFactory().get('/categories/')).content, b'primary-only')
+        self.assertIn('replica', routers._down)
+
+    def test_query_error_on_replica_retries_on_primary(self):
+        def view(request):
+            if routers._alias.get() == 'replica':
+                raise OperationalError('replica lag')
+            return HttpResponse('primary')
+
+        self.assertEqual(routers.ReplicaMiddleware(view)(RequestFactory().get('/categories/')).content, b'primary')
+
+
+class OpenAPISchemaTests(TestCase):
+    def test_prebuilt_schema_is_served_from_file(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(OPENAPI_SCHEMA_DIR=directory):
+            call_command('build_openapi', stdout=io.StringIO())
+            response = self.client.get('/swagger.json')
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(b''.join(response.streaming_content), openapi.schema_path('.json').read_bytes())
+            self.assertEqual(self.client.get('/swagger.json', HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+                             .status_code, 304)
+
+    def test_schema_is_generated_without_prebuilt_file(self):
+        with tempfile.TemporaryDirectory() as directory, override_settings(OPENAPI_SCHEMA_DIR=directory):
+            response = self.client.get('/swagger.json')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('/outlines/import/', response.json()['paths'])
+
+
+class MetricsTests(SyntheticDataMixin, TestCase):
+    scale = 10
+
+    def test_endpoint_is_restricted(self):
+        self.assertEqual(self.client.get('/metrics/').status_code, 200)  # 127.0.0.1
+        self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='203.0.113.5').status_code, 403)
+        with override_settings(METRICS_TOKEN='secret'):
+            self.assertEqual(self.client.get('/metrics/').status_code, 403)
+            self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='203.0.113.5',
+                                             HTTP_AUTHORIZATION='Bearer secret').status_code, 200)
+        with override_settings(METRICS_PUBLIC=True):
+            self.assertEqual(self.client.get('/metrics/', REMOTE_ADDR='203.0.113.5').status_code, 200)
+
+    async def test_async_views_count_queries(self):
+        registry.reset()
+        self.assertEqual((await AsyncClient().get('/async/outlines/')).status_code, 200)
+        self.assertRegex(registry.render(),
+                         r'courseoutline_request_sql_queries_sum\{view="async-outlines-list"\} [1-9]')
+
+
+class ProfilingTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(PROFILING_DIR=Path(directory.name), PROFILING_SAMPLE_RATE=0.0)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.directory = Path(directory.name)
+
+    def test_signed_token_profiles_request(self):
+        response = self.client.get('/categories/', HTTP_X_PROFILE=profiling.make_token('admin'))
+        self.assertEqual(response.status_code, 200)
+        path = self.directory / response['X-Profile-File']
+        self.assertTrue(path.name.startswith('categories-list-'))
+        self.assertIn('function calls', profiling.summary(path))
+        self.assertEqual(profiling.recent_profiles(), [path])
+
+    def test_invalid_or_expired_token_is_ignored(self):
+        forged = profiling.make_token('admin')[:-1] + 'x'
+        response = self.client.get('/categories/', HTTP_X_PROFILE=forged)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(response.has_header('X-Profile-File'))
+        with override_settings(PROFILING_TOKEN_MAX_AGE=-1):
+            response = self.client.get('/categories/', HTTP_X_PROFILE=profiling.make_token('admin'))
+        self.assertFalse(response.has_header('X-Profile-File'))
+        self.assertEqual(list(self.directory.iterdir()), [])
+
+    async def test_async_view_is_profiled_and_old_files_are_pruned(self):
+        with override_settings(PROFILING_KEEP=1):
+            for _ in range(2):
+                token = profiling.make_token('admin')
+                response = await AsyncClient().get('/async/categories/', headers={'X-Profile': token})
+                self.assertTrue(response.has_header('X-Profile-File'))
+        self.assertEqual([path.name for path in self.directory.iterdir()], [response['X-Profile-File']])
+
+
+class SlowQueryLogTests(TransactionTestCase):
+    # record() tự đóng / mở kết nối nên không chạy được trong transaction của TestCase
+    def event(self, sql='SELECT 1'):
+        normalized = slowlog.normalize(sql)
+        return {'alias': 'default', 'sql': sql, 'raw_params': (), 'params': '()', 'normalized': normalized,
+                'fingerprint': slowlog.fingerprint(normalized), 'duration': 250.0, 'view': 'test', 'stack': ''}
+
+    def test_explain_runs_once_per_fingerprint(self):
+        with mock.patch.object(slowlog, 'explain', return_value='SCAN') as explain:
+            slowlog.record(self.event())
+            slowlog.record(self.event())
+        query = SlowQuery.objects.get()
+        self.assertEqual((query.count, query.explain, explain.call_count), (2, 'SCAN', 1))
+
+    def test_failure_is_logged(self):
+        pending = slowlog._pending
+        with mock.patch.object(SlowQuery.objects, 'get_or_create', side_effect=OperationalError('gone')), \
+                self.assertLogs('courseoutline.slowlog', 'ERROR'):
+            slowlog.record(self.event())
+        self.assertEqual(slowlog._pending, pending - 1)
+
+
+class BenchmarkTests(SyntheticDataMixin, TestCase):
+    scale = 10
+
+    def test_compare_flags_latency_and_query_regressions(self):
+        baseline = {'a': {'p95_ms': 10.0, 'queries': 3}, 'b': {'p95_ms': 10.0, 'queries': 3}}
+        results = {'a': {'p95_ms': 11.9, 'queries': 3}, 'b': {'p95_ms': 12.5, 'queries': 4},
+                   'new': {'p95_ms': 99.0, 'queries': 9}}
+        self.assertEqual(benchmarks.compare(results, baseline, tolerance=0.2), [
+            {'name': 'b', 'metric': 'p95_ms', 'baseline': 10.0, 'current': 12.5},
+            {'name': 'b', 'metric': 'queries', 'baseline': 3, 'current': 4},
+        ])
+        self.assertEqual(benchmarks.percentile([5, 1, 4, 2, 3], 50), 3)
+
+    def test_bench_api_against_baseline(self):
+        # CSDL test đã có dữ liệu giả lập: bỏ bước tạo CSDL riêng của lệnh
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        output, baseline = Path(directory.name) / 'current.json', Path(directory.name) / 'baseline.json'
+        bench = mock.patch.object(benchmarks, 'bench_database', lambda scale, stdout: nullcontext())
+        options = {'iterations': 2, 'only': ['categories-list', 'outlines-detail'], 'stdout': io.StringIO()}
+        with bench, transaction.atomic():
+            call_command('bench_api', output=str(output), **options)
+            transaction.set_rollback(True)  # lệnh tạo tài khoản bench, lần chạy sau tạo lại
+        report = json.loads(output.read_text())
+        self.assertEqual({name: result['status'] for name, result in report['results'].items()},
+                         {'categories-list': [200], 'outlines-detail': [200]})
+
+        # Chỉ categories-list chậm hơn / nhiều truy vấn hơn baseline;
+        # mục còn lại nới rộng để không phụ thuộc thời gian đo
+        results = report['results']
+        results['categories-list'].update(p95_ms=0.0, queries=0)
+        results['outlines-detail'].update(p95_ms=10.0 ** 9)
+        baseline.write_text(json.dumps(report))
+        with bench, self.assertRaisesMessage(CommandError, '2 regression(s) against baseline'):
+            call_command('bench_api', baseline=str(baseline), fail_on_regression=True, **options)
+
+
+class AsyncViewTests(SyntheticDataMixin, TestCase):
+    # Endpoint async phải trả cùng dữ liệu với viewset đồng bộ tương ứng
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.outline = Outline.objects.filter(active=True, comment__isnull=False).first()
+
+    async def get(self, url, **params):
+        response = await AsyncClient().get(url, params)
+        return response.status_code, json.loads(response.content)
+
+    def assertSameAsSync(self, path, **params):
+        # Client đồng bộ cũng chạy được view async (qua async_to_sync)
+        response = self.client.get(f'/async{path}', params)
+        expected = self.client.get(path, params).json()
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        if isinstance(expected, dict):
+            self.assertEqual((data['count'], data['results']), (expected['count'], expected['results']))
+            self.assertEqual(data['next'] is None, expected['next'] is None)
+        else:
+            self.assertEqual(data, expected)
+
+    def test_lists_match_sync_views(self):
+        self.assertSameAsSync('/outlines/')
+        self.assertSameAsSync('/outlines/', page=2)
+        self.assertSameAsSync('/lessons/', category_id=self.outline.lesson.category_id)
+        self.assertSameAsSync('/categories/')
+
+    async def test_outline_detail_and_comments(self):
+        status, data = await self.get(f'/async/outlines/{self.outline.pk}/')
+        self.assertEqual((status, data['id'], data['name']), (200, self.outline.pk, self.outline.name))
+        response = await AsyncClient().get(f'/async/outlines/{self.outline.pk}/')
+        self.assertEqual(response['ETag'], f'"{self.outline.version}"')
+
+        status, data = await self.get(f'/async/outlines/{self.outline.pk}/comment/')
+        ids = [pk async for pk in self.outline.comment_set.order_by('-id').values_list('id', flat=True)]
+        self.assertEqual((status, data['count'], [c['id'] for c in data['results']]),
+                         (200, len(ids), ids[:paginators.CommentPaginator.page_size]))
+
+    async def test_missing_outline_page_and_method(self):
+        missing = await Outline.objects.filter(active=False).values_list('id', flat=True).afirst() or 0
+        for url in (f'/async/outlines/{missing}/', f'/async/outlines/{missing}/comment/',
+                    f'/async/outlines/{missing}/comment/stream/'):
+            self.assertEqual((await AsyncClient().get(url)).status_code, 404)
+        self.assertEqual((await self.get('/async/outlines/', page='x'))[0], 404)
+        self.assertEqual((await self.get('/async/outlines/', page=10 ** 6))[0], 404)
+        self.assertEqual((await AsyncClient().post('/async/categories/')).status_code, 405)
+
+
+class BrokerTests(TestCase):
+    async def test_publish_from_thread_wakes_subscriber(self):
+        broker = pubsub.Broker()
+        with broker.subscribe('chat:1') as subscription:
+            threading.Thread(target=broker.publish, args=('chat:1', {'id': 1})).start()
+            self.assertEqual(await subscription.get(1), {'id': 1})
+            self.assertIsNone(await subscription.get(0.01))
+        self.assertEqual(broker.subscriber_count('chat:1'), 0)
+
+    async def test_overflow_is_flagged(self):
+        broker = pubsub.Broker(maxsize=1)
+        with broker.subscribe('chat:1') as subscription:
+            self.assertEqual(broker.publish('chat:1', {'id': 1}) + broker.publish('chat:1', {'id': 2}), 2)
+            await asyncio.sleep(0)
+            self.assertTrue(subscription.overflowed)
+            self.assertEqual(subscription.drain(), [{'id': 1}])
+
+
+class ChatTests(TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.lecturer_account = Account.objects.create_user('gv@ou.edu.vn', 'secret', username='gv', role='lecturer')
+        cls.student_account = Account.objects.create_user('sv@ou.edu.vn', 'secret', username='sv', role='student')
+        # User.save() không nhận force_insert của objects.create()
+        cls.lecturer = Lecturer(first_name='An', last_name='Lê', age='40', position='Giảng viên',
+                                account=cls.lecturer_account)
+        cls.lecturer.save()
+        cls.student = Student(first_name='Bình', last_name='Trần', age='20', account=cls.student_account)
+        cls.student.save()
+        cls.chat = Chat.objects.create(lecturer=cls.lecturer, student=cls.student)
+        cls.message = Message.objects.create(chat=cls.chat, sender=cls.student_account, content='Chào thầy')
+        AccessToken.objects.create(user=cls.student_account, token='student-token', scope='read write',
+                                   expires=timezone.now() + timedelta(hours=1))
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.lecturer_account)
+        self.channel = f'chat:{self.chat.pk}'
+
+    def test_create_is_idempotent(self):
+        other = Student(first_name='Chi', last_name='Phạm', age='21')
+        other.save()
+        response = self.client.post('/chats/', {'student': other.pk}, format='json')
+        self.assertEqual(response.status_code, 201)
+        again = self.client.post('/chats/', {'student': other.pk}, format='json')
+        self.assertEqual((again.status_code, again.data['id']), (200, response.data['id']))
+
+    def test_send_publishes_after_commit(self):
+        with mock.patch('courseoutline.views.broker.publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/chats/{self.chat.pk}/send/', {'content': 'Chào em'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        publish.assert_called_once_with(self.channel, response.data)
+        unread = APIClient()
+        unread.force_authenticate(self.student_account)
+        self.assertEqual(unread.get('/chats/unread/').data['total'], 1)
+
+    def test_mark_read_validates_last_id(self):
+        url = f'/chats/{self.chat.pk}/read/'
+        self.assertEqual(self.client.post(url, {}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'last_id': 'x'}, format='json').status_code, 400)
+        self.assertEqual(self.client.post(url, {'last_id': self.message.pk}, format='json').status_code, 204)
+        self.assertEqual(self.client.get('/chats/unread/').data['total'], 0)
+
+    def async_get(self, url, **params):
+        return AsyncClient().get(url, params, headers={'Authorization': 'Bearer student-token'})
+
+    async def test_long_poll_returns_backlog_and_times_out(self):
+        response = await self.async_get(f'/async/chats/{self.chat.pk}/poll/', timeout=0.01)
+        self.assertEqual([m['id'] for m in json.loads(response.content)['messages']], [self.message.pk])
+        response = await self.async_get(f'/async/chats/{self.chat.pk}/poll/', since=self.message.pk, timeout=0.01)
+        self.assertEqual(json.loads(response.content), {'since': self.message.pk, 'messages': []})
+        self.assertEqual((await AsyncClient().get(f'/async/chats/{self.chat.pk}/poll/')).status_code, 401)
+
+    async def test_long_poll_wakes_up_on_publish(self):
+        poll = asyncio.ensure_future(self.async_get(f'/async/chats/{self.chat.pk}/poll/', since=self.message.pk,
+                                                    timeout=5))
+        while not pubsub.broker.subscriber_count(self.channel) and not poll.done():
+            await asyncio.sleep(0.01)
+        pubsub.broker.publish(self.channel, {'id': self.message.pk + 1, 'content': 'Ở đây'})
+        response = await asyncio.wait_for(poll, 5)
+        self.assertEqual(json.loads(response.content)['messages'], [{'id': self.message.pk + 1, 'content': 'Ở đây'}])
+
+    async def test_stream_sends_backlog_then_published_messages(self):
+        response = await self.async_get(f'/async/chats/{self.chat.pk}/stream/')
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        events = aiter(response.streaming_content)
+        self.assertTrue((await anext(events)).startswith(f'id: {self.message.pk}\n'.encode()))
+        pubsub.broker.publish(self.channel, {'id': self.message.pk + 1})
+        self.assertEqual(await anext(events), f'id: {self.message.pk + 1}\ndata: {{"id": {self.message.pk + 1}}}\n\n'
+                         .encode())
+        await events.aclose()
+
+
+class CommentFeedTests(SyntheticDataMixin, TestCase):
+    scale = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.account = Account.objects.create_user('sv@ou.edu.vn', 'secret', username='sv', role='student')
+        cls.student = Student(first_name='Bình', last_name='Trần', age='20', account=cls.account)
+        cls.student.save()
+        cls.outline = Outline.objects.filter(active=True).first()
+        cls.outline.comment_set.all().delete()
+        cls.comments = [Comment.objects.create(content=f'Bình luận {i}', outline=cls.outline, student=cls.student)
+                        for i in range(5)]
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.account)
+        self.url = f'/outlines/{self.outline.pk}/comment/feed/'
+        self.channel = f'outline:{self.outline.pk}:comments'
+
+    def ids(self, response):
+        return [comment['id'] for comment in response.data]
+
+    def test_since_cursor_and_limit(self):
+        ids = [comment.pk for comment in self.comments]
+        self.assertEqual(self.ids(self.client.get(self.url)), ids)
+        self.assertEqual(self.ids(self.client.get(self.url, {'since': ids[1]})), ids[2:])
+        self.assertEqual(self.ids(self.client.get(self.url, {'since': ids[1], 'limit': 2})), ids[2:4])
+        self.assertEqual(self.client.get(self.url, {'since': 'x'}).status_code, 400)
+
+    def test_new_comment_is_published_after_commit(self):
+        with mock.patch('courseoutline.views.broker.publish') as publish, \
+                self.captureOnCommitCallbacks(execute=True):
+            response = self.client.post(f'/outlines/{self.outline.pk}/comments/', {'content': 'Mới'}, format='json')
+        self.assertEqual(response.status_code, 201)
+        publish.assert_called_once_with(self.channel, response.data)
+        self.assertEqual(self.ids(self.client.get(self.url, {'since': self.comments[-1].pk})), [response.data['id']])
+
+    def test_bundle_next_page_continues_first_page(self):
+        bundle = self.client.get(f'/outlines/{self.outline.pk}/bundle/').data['comments']
+        following = self.client.get(bundle['next']).data
+        self.assertEqual([c['id'] for c in bundle['results'] + following['results']],
+                         [comment.pk for comment in reversed(self.comments)])
+
+    async def test_stream_wakes_up_on_publish(self):
+        response = await AsyncClient().get(f'/async/outlines/{self.outline.pk}/comment/stream/',
+                                           {'since': self.comments[-1].pk})
+        events = aiter(response.streaming_content)
+        pending = asyncio.ensure_future(anext(events))
+        while not pubsub.broker.subscriber_count(self.channel) and not pending.done():
+            await asyncio.sleep(0.01)
+        pubsub.broker.publish(self.channel, {'id': self.comments[-1].pk + 1})
+        self.assertTrue((await asyncio.wait_for(pending, 5)).startswith(f'id: {self.comments[-1].pk + 1}\n'.encode()))
+        await events.aclose()
+
+
+class BatchTests(SyntheticDataMixin, TransactionTestCase):
+    # Các GET song song chạy trên kết nối của luồng khác, không thấy dữ liệu trong transaction của TestCase
+    scale = 10
+
+    def setUp(self):
+        self.seed()
+        throttling.store.clear()
+
+    def batch(self, *items):
+        response = self.client.post('/batch/', {'requests': list(items)}, content_type='application/json')
+        self.assertEqual(response.status_code, 200)
+        return [(item['status'], item['body']) for item in response.json()['responses']]
+
+    def test_responses_keep_request_order(self):
+        outline = Outline.objects.filter(active=True).first()
+        results = self.batch({'path': '/categories/'}, {'path': f'/outlines/{outline.pk}/comment/?page=1'},
+                             {'path': '/admin/'}, {'method': 'GET'})
+        self.assertEqual([result[0] for result in results], [200, 200, 404, 400])
+        self.assertEqual(results[1][1]['count'], outline.comment_set.count())
+        self.assertEqual(self.client.post('/batch/', {'requests': []}, content_type='application/json').status_code,
+                         400)
+
+    def test_failing_item_returns_500_without_failing_batch(self):
+        with mock.patch.object(views.CategoryViewSet, 'list', side_effect=RuntimeError('boom')), \
+                self.assertLogs('courseoutline.views', 'ERROR'):
+            results = self.batch({'path': '/categories/'}, {'path': '/lessons/'})
+        self.assertEqual([result[0] for result in results], [500, 200])
+
+    def test_streaming_item_returns_400(self):
+        streaming = StreamingHttpResponse(iter([b'snapshot']))
+        with mock.patch.object(views.CategoryViewSet, 'list', return_value=streaming):
+            results = self.batch({'path': '/categories/'}, {'path': '/lessons/'})
+        self.assertEqual(results[0], (400, {'error': 'Streaming responses are not batchable.'}))
+        self.assertEqual(results[1][0], 200)
+
+    @override_settings(THROTTLE_ENABLED=True,
+                       THROTTLE_RULES=[{'name': 'categories', 'path': r'^/categories/$', 'scope': 'ip',
+                                        'rate': '1/min', 'burst': 1}])
+    def test_items_are_throttled(self):
+        results = self.batch({'path': '/categories/'}, {'path': '/categories/'}, {'path': '/lessons/'})
+        self.assertEqual(sorted(result[0] for result in results), [200, 200, 429])
+
+    def test_pool_threads_see_request_context(self):
+        token = routers._alias.set('replica')
+        self.addCleanup(routers._alias.reset, token)
+        results = [None, None]
+        with mock.patch.object(views.BatchView, 'dispatch_item', lambda self, request, item: routers._alias.get()):
+            views.BatchView().run_gets(None, [{}, {}], [0, 1], results)
+        self.assertEqual(results, ['replica', 'replica'])
+
+
+class FormatTests(SyntheticDataMixin, TestCase):
+    def test_msgpack_and_cbor_are_negotiated(self):
+        expected = self.client.get('/categories/').json()
+        response = self.client.get('/categories/', HTTP_ACCEPT='application/msgpack')
+        self.assertEqual(response['Content-Type'], 'application/msgpack')
+        self.assertEqual(msgpack.unpackb(response.content), expected)
+        response = self.client.get('/categories/', HTTP_ACCEPT='application/cbor')
+        self.assertEqual(cbor2.loads(response.content), expected)
+
+    def test_msgpack_request_body(self):
+        body = msgpack.packb({'requests': [{'path': '/categories/'}]})
+        response = self.client.post('/batch/', body, content_type='application/msgpack')
+        self.assertEqual(response.json()['responses'][0]['status'], 200)
+        response = self.client.post('/batch/', b'\xc1', content_type='application/msgpack')
+        self.assertEqual(response.status_code, 400)
+
+    def test_large_responses_are_compressed(self):
+        plain = self.client.get('/outlines/')
+        self.assertFalse(plain.has_header('Content-Encoding'))
+        self.assertGreater(len(plain.content), settings.COMPRESSION_MIN_SIZE)
+
+        response = self.client.get('/outlines/', HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual((response['Content-Encoding'], response['Vary']), ('br', 'Accept, Accept-Encoding'))
+        self.assertEqual(brotli.decompress(response.content), plain.content)
+        response = self.client.get('/outlines/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(gzip.decompress(response.content), plain.content)
+
+        small = self.client.get('/categories/', HTTP_ACCEPT_ENCODING='br')
+        self.assertLess(len(small.content), settings.COMPRESSION_MIN_SIZE)
+        self.assertFalse(small.has_header('Content-Encoding'))
+
+
+class SnapshotTests(SyntheticDataMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.course = Course.objects.filter(outline__is_approved=True).first()
+
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        overrides = override_settings(SNAPSHOT_DIR=Path(directory.name), SNAPSHOT_DIFF_RATIO=1)
+        overrides.enable()
+        self.addCleanup(overrides.disable)
+        self.url = f'/courses/{self.course.year}/snapshot/'
+
+    def change_outline(self):
+        outline = Outline.objects.filter(course=self.course, is_approved=True).first()
+        outline.name = 'Đã sửa'
+        outline.save()
+
+    def test_build_is_versioned_by_content(self):
+        first = snapshots.build(self.course)
+        self.assertEqual(snapshots.build(self.course), first)
+        self.change_outline()
+        second = snapshots.build(self.course)
+        self.assertEqual((first.version, second.version), (1, 2))
+        self.assertEqual(sorted(p.name for p in settings.SNAPSHOT_DIR.iterdir()),
+                         [f'course-{self.course.year}-v1.sqlite3.gz', f'course-{self.course.year}-v2.sqlite3.gz'])
+
+    def test_concurrent_build_reuses_winner(self):
+        first = snapshots.build(self.course)
+        self.change_outline()
+        with mock.patch.object(Snapshot.objects, 'create', side_effect=IntegrityError):
+            self.assertEqual(snapshots.build(self.course), first)
+        self.assertEqual([p.name for p in settings.SNAPSHOT_DIR.iterdir()], [Path(first.path).name])
+
+    def test_diff_applies_to_previous_version(self):
+        first = snapshots.build(self.course)
+        self.change_outline()
+        second = snapshots.build(self.course)
+        old, new = (gzip.decompress(Path(s.path).read_bytes()) for s in (first, second))
+        diff = snapshots.make_diff(old, new)
+        self.assertLess(len(diff), len(new))
+        self.assertEqual(snapshots.apply_diff(old, diff), new)
+        with self.assertRaises(ValueError):
+            snapshots.apply_diff(old, new)
+
+    def test_endpoint_serves_full_file_diff_and_304(self):
+        response = self.client.get(self.url)
+        first = self.course.snapshots.get()
+        self.assertEqual((response.status_code, response['ETag']), (200, f'"{first.fingerprint}"'))
+        self.assertEqual(b''.join(response.streaming_content), Path(first.path).read_bytes())
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+
+        self.change_outline()
+        second = snapshots.build(self.course)
+        response = self.client.get(self.url, {'from': first.fingerprint})
+        self.assertEqual((response['Content-Type'], response['X-Snapshot-Base'], response['X-Snapshot-Version']),
+                         (snapshots.DIFF_MEDIA_TYPE, '1', '2'))
+        old = gzip.decompress(Path(first.path).read_bytes())
+        self.assertEqual(snapshots.apply_diff(old, gzip.decompress(b''.join(response.streaming_content))),
+                         gzip.decompress(Path(second.path).read_bytes()))
+        self.assertEqual(response['ETag'], f'"{first.fingerprint}-{second.fingerprint}"')
+        self.assertEqual(self.client.get(self.url, {'from': first.fingerprint},
+                                         HTTP_IF_NONE_MATCH=response['ETag']).status_code, 304)
+        self.assertEqual(self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag']).status_code, 200)
+        self.assertEqual(self.client.get('/courses/1900/snapshot/').status_code, 404)
+
+    def test_failed_diff_write_leaves_no_file(self):
+        first = snapshots.build(self.course)
+        self.change_outline()
+        second = snapshots.build(self.course)
+        with mock.patch.object(snapshots.gzip, 'compress', side_effect=OSError('disk full')), \
+                self.assertRaises(OSError):
+            snapshots.diff_path(first, second)
+        self.assertEqual(sorted(p.name for p in settings.SNAPSHOT_DIR.iterdir()),
+                         sorted(Path(s.path).name for s in (first, second)))
+        self.assertEqual(snapshots.diff_path(first, second).name, f'course-{self.course.year}-v1-v2.diff.gz')
+
+
+class RolloverTests(SyntheticDataMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.source = Course.objects.filter(outline__active=True).first()
+        cls.originals = list(Outline.objects.filter(active=True, course=cls.source).order_by('id'))
+
+    def test_clones_outlines_with_evaluations_and_source(self):
+        result = rollover.rollover(self.source.year, 2100)
+        self.assertEqual((result['outlines'], result['skipped']), (len(self.originals), 0))
+
+        target = Course.objects.get(year=2100)
+        clones = {clone.source_id: clone for clone in Outline.objects.filter(course=target)}
+        self.assertEqual(sorted(clones), [outline.pk for outline in self.originals])
+        for outline in self.originals:
+            clone = clones[outline.pk]
+            self.assertEqual((clone.name, clone.lesson_id, clone.version), (outline.name, outline.lesson_id, 1))
+            self.assertEqual(set(clone.evaluation.values_list('id', flat=True)),
+                             set(outline.evaluation.values_list('id', flat=True)))
+        self.assertEqual(result['evaluations'], sum(outline.evaluation.count() for outline in self.originals))
+        incremental = stats.read()
+        stats.rebuild()
+        self.assertEqual(stats.read(), incremental)
+
+    def test_rerun_skips_copied_outlines(self):
+        rollover.rollover(self.source.year, 2100)
+        result = rollover.rollover(self.source.year, 2100)
+        self.assertEqual((result['outlines'], result['skipped']), (0, len(self.originals)))
+        self.assertEqual(Outline.objects.filter(course__year=2100).count(), len(self.originals))
+
+    def test_dry_run_and_endpoint(self):
+        result = rollover.rollover(self.source.year, 2100, dry_run=True, approved=True)
+        self.assertEqual(result['outlines'], sum(outline.is_approved for outline in self.originals))
+        self.assertFalse(Course.objects.filter(year=2100).exists())
+        with self.assertRaises(ValueError):
+            rollover.rollover(self.source.year, self.source.year)
+
+        client = APIClient()
+        client.force_authenticate(Account.objects.create_superuser('admin@ou.edu.vn', 'secret', username='admin'))
+        response = client.post('/courses/rollover/', {'source': self.source.year, 'target': 2100}, format='json')
+        self.assertEqual((response.status_code, response.data['outlines']), (201, len(self.originals)))
+        self.assertEqual(client.post('/courses/rollover/', {'source': 1900, 'target': 2100},
+                                     format='json').status_code, 400)
+
+
+class ImporterTests(SyntheticDataMixin, TestCase):
+    scale = 10
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.lesson = Lesson.objects.first()
+
+    def row(self, name, **values):
+        return dict({'name': name, 'credit': 3, 'overview': 'x', 'lesson': self.lesson.pk,
+                     'lecturer': self.lesson.lecturer_id, 'course': '2030;2031',
+                     'evaluation': 'Giữa kỳ:40;Cuối kỳ:60'}, **values)
+
+    def csv_file(self, rows):
+        text = io.StringIO()
+        writer = csv.DictWriter(text, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+        return io.BytesIO(text.getvalue().encode())
+
+    def run_import(self, file, fmt, **kwargs):
+        report = importer.import_outlines(file, fmt, **kwargs)
+        return report, Outline.objects.filter(name__startswith='Nhập')
+
+    def test_csv_reports_failed_rows(self):
+        file = self.csv_file([self.row('Nhập 1'), self.row('Nhập 2', credit='x'), self.row('Nhập 3')])
+        report, created = self.run_import(file, 'csv')
+        self.assertEqual((report['rows'], report['created'], report['failed']), (3, 2, 1))
+        self.assertEqual([error['row'] for error in report['errors']], [3])
+        outline = created.get(name='Nhập 1')
+        self.assertEqual(sorted(outline.course.values_list('year', flat=True)), [2030, 2031])
+        self.assertEqual(sorted(outline.evaluation.values_list('percentage', flat=True)), [40, 60])
+
+    def test_xlsx(self):
+        from openpyxl import Workbook
+
+        workbook = Workbook()
+        rows = [self.row('Nhập 1'), self.row('Nhập 2')]
+        workbook.active.append(list(rows[0]))
+        for row in rows:
+            workbook.active.append(list(row.values()))
+        workbook.active.append([None] * len(rows[0]))
+        file = io.BytesIO()
+        workbook.save(file)
+        file.seek(0)
+        report, created = self.run_import(file, 'xlsx')
+        self.assertEqual((report['created'], report['failed'], created.count()), (2, 0, 2))
+
+    def test_json_items_across_chunk_boundaries(self):
+        items = [self.row(f'Nhập {i}', course=[2030], evaluation=[]) for i in range(5)]
+        text = ' [\n' + ',\n'.join(json.dumps(item, ensure_ascii=False) for item in items) + '\n]'
+        self.assertEqual([item for _, item in importer.read_json(io.BytesIO(text.encode()), chunk_size=7)], items)
+        report, created = self.run_import(io.BytesIO(text.encode()), 'json')
+        self.assertEqual((report['created'], created.count()), (5, 5))
+
+        report, _ = self.run_import(io.BytesIO(b'[{"name": "Nh'), 'json')
+        self.assertEqual((report['created'], report['errors'][0]['row']), (0, None))
+
+    def test_jsonl_bad_line_fails_only_that_row(self):
+        lines = [json.dumps(self.row('Nhập 1')), '{"name": ', '', json.dumps(self.row('Nhập 2'))]
+        report, created = self.run_import(io.BytesIO('\n'.join(lines).encode()), 'jsonl')
+        self.assertEqual((report['rows'], report['created'], report['failed']), (3, 2, 1))
+        self.assertEqual(report['errors'][0]['row'], 2)
+        self.assertEqual(created.count(), 2)
+
+    def test_stats_match_rebuild_with_row_by_row_insert(self):
+        # MySQL không trả id từ bulk_create: đề cương được save() từng dòng và đã phát post_save
+        features = type(connections['default'].features)
+        for bulk in (True, False):
+            with mock.patch.object(features, 'can_return_rows_from_bulk_insert', new_callable=mock.PropertyMock,
+                                   return_value=bulk):
+                self.run_import(self.csv_file([self.row(f'Nhập {bulk}')]), 'csv')
+            incremental = stats.read()
+            stats.rebuild()
+            self.assertEqual(stats.read(), incremental)
+
+    def test_batches_and_dry_run(self):
+        rows = [self.row(f'Nhập {i}') for i in range(5)]
+        progress = []
+        report, created = self.run_import(self.csv_file(rows), 'csv', batch_size=2, dry_run=True,
+                                          progress=lambda report: progress.append(report['rows']))
+        self.assertEqual((progress, report['created'], report['dry_run'], created.count()), ([2, 4, 5], 5, True, 0))
+        self.assertFalse(Course.objects.filter(year=2030).exists())
+
+        report, created = self.run_import(self.csv_file(rows), 'csv', batch_size=2)
+        self.assertEqual((report['created'], created.count()), (5, 5))
+
+
+class EnrollmentTests(SyntheticDataMixin, TestCase):
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.course = Course.objects.annotate(size=Count('student')).order_by('-size').first()
+        cls.students = list(Student.objects.filter(course=cls.course).values_list('id', flat=True))
+        cls.lessons = list(Lesson.objects.values_list('id', flat=True)[:2])
+        cls.outline = Outline.objects.filter(active=True).first()
+
+    def enrolled(self):
+        return (Student.lessons.through.objects.filter(student_id__in=self.students, lesson_id__in=self.lessons)
+                .count(),
+                Student.outline.through.objects.filter(student_id__in=self.students, outline=self.outline).count())
+
+    def test_enrolls_cohort_in_chunks_and_reruns_safely(self):
+        before = self.enrolled()
+        progress = []
+        report = enrollment.enroll(self.course.year, lessons=self.lessons + [0], outlines=[self.outline.pk],
+                                   chunk_size=3, progress=lambda processed, report: progress.append(processed))
+        self.assertEqual(self.enrolled(), (len(self.students) * 2, len(self.students)))
+        self.assertEqual(report['enrolled'], {'lessons': len(self.students) * 2 - before[0],
+                                              'outlines': len(self.students) - before[1]})
+        self.assertEqual(report['missing'], {'lessons': [0], 'outlines': []})
+        self.assertEqual(progress[-1], len(self.students))
+        self.assertEqual(progress, sorted(progress))
+
+        again = enrollment.enroll(self.course.year, lessons=self.lessons, outlines=[self.outline.pk])
+        self.assertEqual(again['enrolled'], {'lessons': 0, 'outlines': 0})
+        self.assertEqual(again['existing'], {'lessons': len(self.students) * 2, 'outlines': len(self.students)})
+        self.assertIn(self.outline.pk, feeds.student_feed(Student.objects.get(pk=self.students[0]))
+                      .values_list('outline_id', flat=True))
+
+    def test_endpoint(self):
+        client = APIClient()
+        client.force_authenticate(Account.objects.create_superuser('admin@ou.edu.vn', 'secret', username='admin'))
+        url = f'/courses/{self.course.year}/enroll/'
+        response = client.post(url, {'students': self.students[:1], 'outlines': [self.outline.pk]}, format='json')
+        self.assertEqual((response.status_code, response.data['students']), (200, 1))
+        self.assertEqual(client.post(url, {}, format='json').status_code, 400)
+        for body in ({'lessons': '12'}, {'outlines': self.outline.pk}, {'students': '1', 'lessons': self.lessons}):
+            self.assertEqual(client.post(url, body, format='json').status_code, 400, body)
+        self.assertEqual(client.post('/courses/1900/enroll/', {'lessons': self.lessons}, format='json').status_code,
+                         404)
+
+
+class FeedTests(SyntheticDataMixin, TestCase):
+    scale = 100
+
+    @classmethod
+    def setUpTestData(cls):
+        super().setUpTestData()
+        cls.account = Account.objects.create_user('sv@ou.edu.vn', 'secret', username='sv', role='student')
+        cls.course = Course.objects.first()
+        cls.student = Student(first_name='Bình', last_name='Trần', age='20', account=cls.account, course=cls.course)
+        cls.student.save()
+        cls.personal = Outline.objects.filter(is_approved=True).exclude(course=cls.course).first()
+        cls.student.outline.add(cls.personal)
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.account)
+
+    def expected(self):
+        cohort = Outline.objects.filter(active=True, is_approved=True, course=self.course,
+                                        lesson__course=self.course)
+        return sorted(set(cohort.values_list('id', flat=True)) | {self.personal.pk}, reverse=True)
+
+    def feed(self):
+        ids, url = [], '/outlines/feed/'
+        while url:
+            data = self.client.get(url).data
+            ids += [outline['id'] for outline in data['results']]
+            url = data['next']
+        return ids
+
+    def test_cursor_pages_cover_feed_once(self):
+        expected = self.expected()
+        self.assertGreater(len(expected), paginators.FeedPaginator.page_size)
+        self.assertEqual(self.feed(), expected)
+
+    def test_only_feed_fields_trigger_refresh(self):
+        outline = Outline.objects.filter(pk__in=self.expected()).exclude(pk=self.personal.pk).first()
+        # Feed tự đọc trạng thái cũ, không dựa vào receiver pre_save của thống kê
+        pre_save.disconnect(signals.outline_stats_before, sender=Outline)
+        self.addCleanup(pre_save.connect, signals.outline_stats_before, sender=Outline)
+        with mock.patch.object(feeds, 'refresh_outline', wraps=feeds.refresh_outline) as refresh:
+            outline.name = 'Đã đổi tên'
+            outline.save()
+            refresh.assert_not_called()
+            outline.is_approved = False
+            outline.save()
+            refresh.assert_called_once_with(outline.pk)
+        self.assertNotIn(outline.pk, self.feed())
+        self.assertEqual(self.feed(), self.expected())
+
+    def test_course_entries_are_unique(self):
+        entry = FeedEntry.objects.filter(student=None).first()
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            FeedEntry.objects.create(course=entry.course, outline=entry.outline)
+
+
+@override_settings(THROTTLE_ENABLED=True, THROTTLE_MAX_CONCURRENCY=1, THROTTLE_QUEUE_TIMEOUT=0,
+                   THROTTLE_RULES=[{'name': 'poll', 'path': r'^/async/', 'scope': 'ip', 'rate': '1/min', 'burst': 2}])
+class ThrottleTests(TestCase):
+    def setUp(self):
+        throttling.store.clear()
+        registry.reset()
+
+    def middleware(self, is_async=False):
+        async def async_view(request):
+            return HttpResponse('ok')
+
+        middleware = throttling.ThrottleMiddleware(async_view if is_async else lambda request: HttpResponse('ok'))
+        middleware.slots.acquire()  # slot duy nhất đang bị một request khác giữ
+        return middleware
+
+    def test_token_bucket_returns_429(self):
+        middleware = throttling.ThrottleMiddleware(lambda request: HttpResponse('ok'))
+        statuses = [middleware(RequestFactory().get('/async/outlines/')).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+        self.assertEqual(middleware(RequestFactory().get('/metrics/')).status_code, 200)
+        self.assertIn('courseoutline_throttled_total{rule="poll",status="429"} 1', registry.render())
+
+    def test_concurrency_limit_returns_503_except_for_exempt_routes(self):
+        middleware = self.middleware()
+        response = middleware(RequestFactory().get('/categories/'))
+        self.assertEqual((response.status_code, response['Retry-After']), (503, '1'))
+        self.assertEqual(middleware(RequestFactory().get('/outlines/1/comment/feed/')).status_code, 503)
+        self.assertEqual(middleware(RequestFactory().get('/async/outlines/')).status_code, 503)
+        self.assertEqual(middleware(RequestFactory().get('/async/outlines/1/comment/stream/')).status_code, 200)
+
+    async def test_long_poll_skips_concurrency_limit_but_not_rate_limit(self):
+        middleware = self.middleware(is_async=True)
+        self.assertEqual((await middleware(RequestFactory().get('/categories/'))).status_code, 503)
+        statuses = [(await middleware(RequestFactory().get('/async/chats/1/poll/'))).status_code for _ in range(3)]
+        self.assertEqual(statuses, [200, 200, 429])
+
+
+class SharedMemoryCacheTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.path = str(Path(directory.name) / 'cache')
+
+    def store(self, max_size=1024, max_entries=64):
+        store = cache.SharedMemoryStore(self.path, max_size, max_entries)
+        self.addCleanup(store.close)
+        return store
+
+    def test_overwrite_keeps_one_entry(self):
+        store = self.store()
+        store.set(b'key', b'old', 0)
+        store.set(b'key', b'new value', 0)
+        self.assertEqual(store.get(b'key', 0), b'new value')
+        self.assertEqual(store.stats()['entries'], 1)
+
+    def test_ring_wraps_around_and_evicts_oldest(self):
+        store = self.store()
+        values = {f'key-{i}'.encode(): bytes([i]) * (40 + i % 7) for i in range(60)}
+        for key, value in values.items():
+            store.set(key, value, 0)
+        stats = store.stats()
+        self.assertLessEqual(stats['bytes'], stats['capacity_bytes'])
+        self.assertGreater(store._header()[3], 2 * stats['capacity_bytes'])
+        self.assertIsNone(store.get(b'key-0', 0))
+        # Các bản ghi mới nhất (kể cả bản ghi nằm ngay sau đoạn đệm cuối vòng) vẫn đọc đúng
+        for key in list(values)[-8:]:
+            self.assertEqual(store.get(key, 0), values[key])
+        self.assertLess(stats['entries'], len(values))
+
+    def test_entry_limit_evicts_oldest(self):
+        store = self.store(max_size=64 * 1024, max_entries=4)
+        for i in range(6):
+            store.set(f'key-{i}'.encode(), b'v', 0)
+        self.assertEqual([store.get(f'key-{i}'.encode(), 0) for i in range(6)], [None, None] + [b'v'] * 4)
+        self.assertEqual(store.stats()['entries'], 4)
+
+    def test_expired_entry_is_dropped(self):
+        store = self.store()
+        store.set(b'key', b'value', 100.0)
+        self.assertEqual(store.get(b'key', 99.0), b'value')
+        self.assertIsNone(store.get(b'key', 100.0))
+        self.assertEqual(store.stats()['entries'], 0)
+
+    def test_reopen_with_other_size_keeps_file(self):
+        store = self.store()
+        store.set(b'key', b'value', 0)
+        size = os.path.getsize(self.path)
+        with self.assertRaises(ImproperlyConfigured):
+            cache.SharedMemoryStore(self.path, 2048, 64)
+        self.assertEqual(os.path.getsize(self.path), size)
+        self.assertEqual(store.get(b'key', 0), b'value')
+        self.assertEqual(self.store().get(b'key', 0), b'value')  # cùng cấu hình thì mở lại bình thường
+
+    def test_corrupt_record_is_a_miss(self):
+        store = self.store()
+        store.set(b'key', b'value', 0)
+        # Độ dài bản ghi vượt quá vùng dữ liệu, như khi file bị ghi dở
+        cache.RECORD.pack_into(store._map, store.data_offset, cache.ENTRY, cache.key_hash(b'key'), 10 ** 6, 3, 0)
+        self.assertIsNone(store.get(b'key', 0))
+        for i in range(40):
+            store.set(f'key-{i}'.encode(), b'v' * 40, 0)
+        stats = store.stats()
+        self.assertLessEqual(stats['bytes'], stats['capacity_bytes'])
+        self.assertEqual(store.get(b'key-39', 0), b'v' * 40)
+
+    def test_processes_share_entries_under_lock(self):
+        backend = cache.SharedMemoryCache(self.path, {'OPTIONS': {'MAX_SIZE': 64 * 1024, 'MAX_ENTRIES': 64}})
+        self.addCleanup(lambda: cache._stores.pop(self.path).close())
+        backend.set('counter', 0)
+
+        def work():
+            for _ in range(200):
+                backend.incr('counter')
+            backend.set(f'pid-{os.getpid()}', True)
+
+        context = multiprocessing.get_context('fork')
+        workers = [context.Process(target=work) for _ in range(2)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join(30)
+            self.assertEqual(worker.exitcode, 0)
+        self.assertEqual(backend.get('counter'), 400)
+        self.assertTrue(all(backend.get(f'pid-{worker.pid}') for worker in workers))
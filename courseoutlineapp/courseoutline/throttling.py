@@ -0,0 +1,173 @@
+import hashlib
+import math
+import re
+import threading
+import time
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import JsonResponse
+
+from courseoutline.metrics import registry
+from courseoutline.middleware import WrappingMiddleware
+
+PERIODS = {'s': 1, 'sec': 1, 'm': 60, 'min': 60, 'h': 3600, 'hour': 3600, 'd': 86400, 'day': 86400}
+
+
+def parse_rate(rate):
+    # '20/min' -> 20 token mỗi 60 giây
+    count, _, period = rate.partition('/')
+    return int(count) / PERIODS[period.strip().lower()]
+
+
+class TokenBucketStore:
+    # Token bucket giữ trong bộ nhớ của process, dùng chung cho mọi luồng; mỗi key chỉ tốn một tuple (tokens, thời điểm)
+    def __init__(self, max_keys=100000):
+        self.max_keys = max_keys
+        self._buckets = {}
+        self._lock = threading.Lock()
+
+    def consume(self, key, rate, burst, now=None):
+        # Trả về 0 nếu được phép, ngược lại là số giây cần chờ để có lại một token
+        now = time.monotonic() if now is None else now
+        with self._lock:
+            tokens, last = self._buckets.get(key, (burst, now))
+            tokens = min(burst, tokens + (now - last) * rate)
+            allowed = tokens >= 1
+            self._buckets[key] = (tokens - 1 if allowed else tokens, now)
+            if len(self._buckets) > self.max_keys:
+                self._evict()
+        return 0 if allowed else (1 - tokens) / rate
+
+    def _evict(self):
+        # Bỏ các bucket đã lâu không dùng (coi như đầy trở lại), luôn giữ kích thước bị chặn
+        idle = sorted(self._buckets.items(), key=lambda item: item[1][1])
+        for key, _ in idle[:len(idle) // 2]:
+            del self._buckets[key]
+
+    def clear(self):
+        with self._lock:
+            self._buckets.clear()
+
+
+store = TokenBucketStore()
+
+
+class Rule:
+    def __init__(self, name, path, scope, rate, burst=None, methods=None):
+        self.name = name
+        self.path = re.compile(path)
+        self.scope = scope
+        self.rate = parse_rate(rate)
+        self.burst = burst or max(1, math.ceil(self.rate))
+        self.methods = {m.upper() for m in methods} if methods else None
+
+    def matches(self, request):
+        return (self.methods is None or request.method in self.methods) and self.path.search(request.path_info)
+
+
+def client_ip(request):
+    if getattr(settings, 'THROTTLE_TRUST_FORWARDED', False):
+        forwarded = request.headers.get('X-Forwarded-For')
+        if forwarded:
+            return forwarded.split(',')[0].strip()
+    return request.META.get('REMOTE_ADDR', '')
+
+
+def client_user(request):
+    # Chưa xác thực ở tầng middleware: dùng access token (đã băm) hoặc username khi đăng nhập ở /o/token/
+    authorization = request.headers.get('Authorization', '')
+    if authorization.lower().startswith('bearer '):
+        return 'token:' + hashlib.sha1(authorization[7:].strip().encode()).hexdigest()
+    if request.method == 'POST' and request.content_type == 'application/x-www-form-urlencoded':
+        username = request.POST.get('username')
+        if username:
+            return 'username:' + username.lower()
+    return 'ip:' + client_ip(request)
+
+
+SCOPES = {
+    'ip': client_ip,
+    'user': client_user,
+    'endpoint': lambda request: '',
+}
+
+
+def reject(status, rule, retry_after, message):
+    registry.inc('courseoutline_throttled_total', rule=rule, status=status)
+    response = JsonResponse({'error': message}, status=status)
+    response['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response
+
+
+class ThrottleMiddleware(WrappingMiddleware):
+    # Chặn sớm trước khi chạy view (và trước khi băm mật khẩu ở /o/token/):
+    # token bucket theo người dùng / IP / endpoint trả 429, vượt giới hạn số request đồng thời trả 503
+    def __init__(self, get_response):
+        super().__init__(get_response)
+        self.enabled = getattr(settings, 'THROTTLE_ENABLED', True)
+        self.rules = [Rule(**rule) for rule in getattr(settings, 'THROTTLE_RULES', [])]
+        self.exempt = [re.compile(path) for path in getattr(settings, 'THROTTLE_EXEMPT', [])]
+        self.unlimited = [re.compile(path) for path in getattr(settings, 'THROTTLE_CONCURRENCY_EXEMPT', [])]
+        self.max_concurrency = getattr(settings, 'THROTTLE_MAX_CONCURRENCY', 0)
+        self.queue_timeout = getattr(settings, 'THROTTLE_QUEUE_TIMEOUT', 0)
+        self.slots = threading.BoundedSemaphore(self.max_concurrency) if self.max_concurrency else None
+
+    def check(self, request):
+        for rule in self.rules:
+            if rule.matches(request):
+                key = f'{rule.name}:{SCOPES[rule.scope](request)}'
+                retry_after = store.consume(key, rule.rate, rule.burst)
+                if retry_after:
+                    return reject(429, rule.name, retry_after, 'Too many requests.')
+        return None
+
+    def skip(self, request):
+        return not self.enabled or any(path.search(request.path_info) for path in self.exempt)
+
+    def limited(self, request):
+        # Request chờ sự kiện (long-poll, SSE) sẽ giữ slot suốt thời gian chờ nên không tính vào giới hạn đồng thời
+        return self.slots is not None and not any(path.search(request.path_info) for path in self.unlimited)
+
+    def overloaded(self):
+        return reject(503, 'concurrency', 1, 'Server is busy, please retry.')
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if self.skip(request):
+            return self.get_response(request)
+        rejected = self.check(request)
+        if rejected is not None:
+            return rejected
+        if not self.limited(request):
+            return self.get_response(request)
+        if not self.slots.acquire(timeout=self.queue_timeout):
+            return self.overloaded()
+        try:
+            return self.get_response(request)
+        finally:
+            self.slots.release()
+
+    async def __acall__(self, request):
+        if self.skip(request):
+            return await self.get_response(request)
+        rejected = self.check(request)
+        if rejected is not None:
+            return rejected
+        if not self.limited(request):
+            return await self.get_response(request)
+        # Không chặn event loop để chờ slot: hết slot thì trả 503 ngay
+        if not self.slots.acquire(blocking=False):
+            return self.overloaded()
+        try:
+            return await self.get_response(request)
+        finally:
+            self.slots.release()
+
+
+def throttled(request):
+    # Cho request con của /batch/ (không đi qua middleware): chỉ kiểm tra token bucket,
+    # slot đồng thời đã do chính request batch giữ
+    middleware = ThrottleMiddleware(None)
+    return None if middleware.skip(request) else middleware.check(request)
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework import routers
-from courseoutline import views
+from courseoutline import views, async_views
 
 r = routers.DefaultRouter()
 r.register('accounts', views.AccountViewSet, 'accounts')
@@ -10,7 +10,22 @@ r.register('courses', views.CourseViewSet, 'courses')
 r.register('outlines', views.OutlineViewSet, 'outlines')
 r.register('lessons', views.LessonViewSet, 'lessons')
 r.register('comments', views.CommentViewSet, 'comments')
+r.register('chats', views.ChatViewSet, 'chats')
+r.register('stats', views.StatsViewSet, 'stats')
+r.register('audit', views.AuditViewSet, 'audit')
+r.register('autocomplete', views.AutocompleteViewSet, 'autocomplete')
 
 urlpatterns = [
     path('', include(r.urls)),
+    path('batch/', views.BatchView.as_view(), name='batch'),
+    path('metrics/', views.metrics, name='metrics'),
+    path('async/outlines/', async_views.outline_list, name='async-outlines-list'),
+    path('async/outlines/<int:pk>/', async_views.outline_detail, name='async-outlines-detail'),
+    path('async/outlines/<int:pk>/comment/', async_views.outline_comments, name='async-outlines-get-comment'),
+    path('async/outlines/<int:pk>/comment/stream/', async_views.outline_comment_stream,
+         name='async-outlines-comment-stream'),
+    path('async/lessons/', async_views.lesson_list, name='async-lessons-list'),
+    path('async/categories/', async_views.category_list, name='async-categories-list'),
+    path('async/chats/<int:pk>/poll/', async_views.chat_poll, name='async-chats-poll'),
+    path('async/chats/<int:pk>/stream/', async_views.chat_stream, name='async-chats-stream'),
 ]
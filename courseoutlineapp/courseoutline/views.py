@@ -1,27 +1,149 @@
+import contextvars
+import io
+import ipaddress
+import json
+import logging
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
 from django.contrib.auth import get_user_model
-from django.db import transaction
+from django.core.exceptions import ValidationError
+from django.core.cache import cache
+from django.db import connections, router, transaction
+from django.db.models import Count, F, Max, Q
+from django.db.models.functions import Greatest
+from django.core.handlers.wsgi import WSGIRequest
+from django.http import FileResponse, HttpResponse, HttpResponseForbidden
+from django.utils.crypto import constant_time_compare
+from django.urls import Resolver404, resolve, reverse
+from rest_framework.utils.urls import replace_query_param
 from rest_framework import viewsets, generics, parsers, permissions, status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 from courseoutline.models import *
-from courseoutline import serializers, paginators, perms
+from courseoutline import serializers, paginators, perms, audit, enrollment, feeds, importer, rollover, snapshots, \
+    stats, archive, autocomplete, concurrency
+from courseoutline.metrics import registry
+from courseoutline.pubsub import broker
+from courseoutline.throttling import client_ip, throttled
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAdminUser, IsAuthenticated
+from rest_framework.views import APIView
 
+logger = logging.getLogger(__name__)
 
-class CategoryViewSet(viewsets.ViewSet, generics.ListAPIView):
+
+def filter_outlines(queryset, params):
+    q = params.get('q')  # tìm đề cương theo tên
+    if q:
+        queryset = queryset.filter(name__icontains=q)
+
+    credit = params.get('credit')  # tìm đề cương theo tín chỉ
+    if credit:
+        queryset = queryset.filter(credit__icontains=credit)
+
+    lecturer = params.get('lecturer')  # tìm đề cương theo tên giảng viên
+    if lecturer:
+        queryset = queryset.filter(lecturer__name__icontains=lecturer)
+
+    course = params.get('course')  # tìm đề cương theo khóa học
+    if course:
+        queryset = queryset.filter(course__year__icontains=course)
+    return queryset
+
+
+class FastListMixin:
+    # Action list dựng dữ liệu từ .values() qua fast_serializer_class thay vì ModelSerializer
+    fast_serializer_class = None
+
+    def list(self, request, *args, **kwargs):
+        queryset = self.fast_serializer_class.queryset(self.filter_queryset(self.get_queryset()))
+        page = self.paginate_queryset(queryset)
+        if page is not None:
+            return self.get_paginated_response(self.fast_serializer_class(page).data)
+        return Response(self.fast_serializer_class(queryset).data)
+
+
+class CategoryViewSet(FastListMixin, viewsets.ViewSet, generics.ListAPIView):
     queryset = Category.objects.all()
     serializer_class = serializers.CategorySerializer
+    fast_serializer_class = serializers.FastCategorySerializer
 
 
 class CourseViewSet(viewsets.ViewSet, generics.ListAPIView):
     queryset = Course.objects.filter(active=True)
     serializer_class = serializers.CourseSerializer
 
+    @action(methods=['get'], detail=False, url_path=r'(?P<year>\d+)/snapshot')
+    def snapshot(self, request, year):
+        # Gói SQLite nén chứa toàn bộ đề cương đã duyệt của khóa, dùng cho app offline
+        course = Course.objects.filter(year=year, active=True).first()
+        if course is None:
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        latest = course.snapshots.first() or snapshots.build(course)
+
+        base = request.query_params.get('from')
+        if base and base != latest.fingerprint:
+            previous = course.snapshots.filter(fingerprint=base).first()
+            path = snapshots.diff_path(previous, latest) if previous else None
+            if path:
+                # ETag riêng cho diff, cache không lẫn với bản đầy đủ
+                etag = f'"{previous.fingerprint}-{latest.fingerprint}"'
+                if request.headers.get('If-None-Match') == etag:
+                    return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+                response = FileResponse(open(path, 'rb'), content_type=snapshots.DIFF_MEDIA_TYPE)
+                response['Content-Encoding'] = 'gzip'
+                response['X-Snapshot-Base'] = previous.version
+                response['X-Snapshot-Version'] = latest.version
+                response['ETag'] = etag
+                return response
+
+        etag = f'"{latest.fingerprint}"'
+        if request.headers.get('If-None-Match') == etag:
+            return HttpResponse(status=status.HTTP_304_NOT_MODIFIED, headers={'ETag': etag})
+        response = FileResponse(open(latest.path, 'rb'), content_type='application/gzip', as_attachment=True,
+                                filename=Path(latest.path).name)
+        response['X-Snapshot-Version'] = latest.version
+        response['ETag'] = etag
+        return response
+
+    @action(methods=['post'], detail=False, url_path='rollover', permission_classes=[IsAdminUser])
+    def rollover_outlines(self, request):
+        # Sao chép đề cương của một khóa sang năm học mới; dry_run chỉ trả về số lượng
+        data = request.data
+        if not data.get('source') or not data.get('target'):
+            return Response({"error": "source and target years are required."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            result = rollover.rollover(int(data.get('source')), int(data.get('target')),
+                                       dry_run=str(data.get('dry_run', '')).lower() in ('1', 'true'),
+                                       lesson=data.get('lesson'), lecturer=data.get('lecturer'),
+                                       category=data.get('category'),
+                                       approved=str(data.get('approved', '')).lower() in ('1', 'true'))
+        except ValueError as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(result, status=status.HTTP_200_OK if result['dry_run'] else status.HTTP_201_CREATED)
+
+    @action(methods=['post'], detail=False, url_path=r'(?P<year>\d+)/enroll', permission_classes=[IsAdminUser],
+            serializer_class=serializers.EnrollSerializer)
+    def enroll(self, request, year):
+        # Ghi danh toàn bộ sinh viên của khóa (hoặc danh sách students) vào các môn học / đề cương
+        if not Course.objects.filter(year=year).exists():
+            return Response(status=status.HTTP_404_NOT_FOUND)
+        serializer = serializers.EnrollSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            report = enrollment.enroll(int(year), **serializer.validated_data)
+        except ValueError as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(report, status=status.HTTP_200_OK)
+
 
-class LessonViewSet(viewsets.ViewSet, generics.ListAPIView):
+class LessonViewSet(FastListMixin, viewsets.ViewSet, generics.ListAPIView):
     queryset = Lesson.objects.filter(active=True)
     serializer_class = serializers.LessonSerializer
+    fast_serializer_class = serializers.FastLessonSerializer
     pagination_class = paginators.ItemPaginator
 
     def get_queryset(self):
@@ -54,16 +176,19 @@ class LessonViewSet(viewsets.ViewSet, generics.ListAPIView):
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
 
-class OutlineViewSet(viewsets.ViewSet, generics.ListAPIView, generics.UpdateAPIView):
+class OutlineViewSet(FastListMixin, viewsets.ViewSet, generics.ListAPIView, generics.UpdateAPIView):
     queryset = Outline.objects.filter(active=True)
     serializer_class = serializers.OutlineSerializer
+    fast_serializer_class = serializers.FastOutlineSerializer
     pagination_class = paginators.ItemPaginator
 
     def get_permissions(self):
-        if self.action in ['add_comment', 'add_evaluation', 'create_outline', 'add_course']:
+        if self.action in ['add_comment', 'add_evaluation', 'create_outline', 'add_course', 'import_outlines']:
             return [IsAuthenticated()]
         elif self.action in ['update', 'partial_update']:
             return [IsAuthenticated(), perms.IsLecturerAndOwner()]
+        elif self.action == 'feed':
+            return [perms.IsStudent()]
         return [permissions.AllowAny()]
 
     @action(methods=['post'], url_path='create', detail=False)
@@ -83,6 +208,31 @@ class OutlineViewSet(viewsets.ViewSet, generics.ListAPIView, generics.UpdateAPIV
 
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['post'], url_path='import', detail=False, parser_classes=[parsers.MultiPartParser],
+            serializer_class=serializers.ImportFileSerializer)
+    def import_outlines(self, request):
+        # Nhập nhiều đề cương từ file csv/xlsx/json/jsonl; giảng viên chỉ nhập được đề cương của chính mình
+        if request.user.is_lecturer():
+            lecturer = request.user.get_lecturer_profile()
+        elif request.user.is_admin() or request.user.is_staff:
+            lecturer = None
+        else:
+            return Response({"error": "Only lecturers can import outlines."},
+                            status=status.HTTP_403_FORBIDDEN)
+
+        file = request.FILES.get('file')
+        if not file:
+            return Response({"error": "No file provided."}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            fmt = importer.detect_format(file.name)
+        except ValueError as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_400_BAD_REQUEST)
+
+        report = importer.import_outlines(file, fmt, lecturer=lecturer,
+                                          dry_run=request.query_params.get('dry_run') in ('1', 'true'))
+        return Response(report, status=status.HTTP_201_CREATED if report['created'] and not report['dry_run']
+                        else status.HTTP_200_OK)
+
     @action(methods=['patch'], url_path='update', detail=True)
     def update_image(self, request, pk):
         outline = self.get_object()
@@ -94,43 +244,133 @@ class OutlineViewSet(viewsets.ViewSet, generics.ListAPIView, generics.UpdateAPIV
         if not image:
             return Response({"error": "No image provided."}, status=status.HTTP_400_BAD_REQUEST)
 
-        outline.image = image
-        outline.save()
-        return Response({"message": "Image updated successfully."}, status=status.HTTP_200_OK)
+        version = self.expected_version(request)
+        if isinstance(version, Response):
+            return version
+        if not concurrency.update(outline, version, {'image': image}):
+            return self.precondition_failed(outline)
+        return Response({"message": "Image updated successfully.", "version": outline.version},
+                        status=status.HTTP_200_OK, headers={'ETag': concurrency.etag(outline.version)})
+
+    def update(self, request, *args, **kwargs):
+        # PUT / PATCH: khóa lạc quan, chỉ ghi các cột thay đổi bằng một câu UPDATE có điều kiện version.
+        # 404 / 403 trước, sau đó mới đòi version (428)
+        outline = self.get_object()
+        version = self.expected_version(request)
+        if isinstance(version, Response):
+            return version
+        serializer = self.get_serializer(outline, data=request.data, partial=kwargs.pop('partial', False))
+        serializer.is_valid(raise_exception=True)
+        if not concurrency.update(outline, version, serializer.validated_data):
+            return self.precondition_failed(outline)
+        return Response(serializer.data, status=status.HTTP_200_OK,
+                        headers={'ETag': concurrency.etag(outline.version)})
+
+    def expected_version(self, request):
+        try:
+            version = concurrency.expected_version(request)
+        except ValueError as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_400_BAD_REQUEST)
+        if version is None:
+            return Response({"error": "Send the version you read in If-Match (or as `version`)."},
+                            status=status.HTTP_428_PRECONDITION_REQUIRED)
+        return version
+
+    def precondition_failed(self, outline):
+        # Đọc version hiện tại trên CSDL chính (bản replica có thể chưa thấy lần ghi vừa thắng)
+        current = Outline.objects.using(router.db_for_write(Outline)).filter(pk=outline.pk) \
+            .values_list('version', flat=True).first()
+        return Response({"error": "The outline has been modified by someone else, reload it and retry.",
+                         "version": current}, status=status.HTTP_412_PRECONDITION_FAILED,
+                        headers={'ETag': concurrency.etag(current)} if current else None)
 
     def get_queryset(self):
         queryset = self.queryset
 
         if self.action.__eq__('list'):
-            q = self.request.query_params.get('q')  # tìm đề cương theo tên
-            if q:
-                queryset = queryset.filter(name__icontains=q)
-
-            credit = self.request.query_params.get('credit')  # tìm đề cương theo tín chỉ
-            if credit:
-                queryset = queryset.filter(credit__icontains=credit)
-
-            lecturer = self.request.query_params.get('lecturer')  # tìm đề cương theo tên giảng viên
-            if lecturer:
-                queryset = queryset.filter(lecturer__name__icontains=lecturer)
-
-            course = self.request.query_params.get('course')  # tìm đề cương theo khóa học
-            if course:
-                queryset = queryset.filter(course__year__icontains=course)
+            queryset = filter_outlines(queryset, self.request.query_params)
         return queryset
 
     @action(methods=['get'], url_path='comment', detail=True)
     def get_comment(self, request, pk):
-        comments = self.get_object().comment_set.select_related('student').all()
-
+        outline = self.get_object()
+        comments = serializers.FastCommentSerializer.queryset(outline.comment_set.order_by('-id'))
         paginator = paginators.CommentPaginator()
-        page = paginator.paginate_queryset(comments, request)
+        # Bình luận đã lưu trữ: lấy khi yêu cầu ?archived=true, hoặc khi đề cương không còn bình luận trong bảng chính.
+        # Chỉ đọc bảng lưu trữ sau khi trang của bảng chính ra rỗng: đề cương còn bình luận không tốn thêm truy vấn
+        archived = request.query_params.get('archived', '').lower() in ('1', 'true')
+        if not archived:
+            try:
+                page = paginator.paginate_queryset(comments, request)
+            except NotFound:
+                # Số trang vượt quá bảng chính: có thể là trang sau của bình luận đã lưu trữ
+                if comments.exists():
+                    raise
+                page = []
+            archived = page == []
+        if archived:
+            comments = archive.comments(outline.pk)
+            page = paginator.paginate_queryset(comments, request)
+
         if page is not None:
-            serializer = serializers.CommentSerializer(page, many=True)
-            return paginator.get_paginated_response(serializer.data)
+            return paginator.get_paginated_response(serializers.FastCommentSerializer(page).data)
+
+        return Response(serializers.FastCommentSerializer(comments).data, status=status.HTTP_200_OK)
+
+    @action(methods=['get'], url_path='bundle', detail=True)
+    def bundle(self, request, pk):
+        # Gộp đề cương, môn học, giảng viên, khóa học, đánh giá và trang bình luận đầu tiên vào một response
+        version = self.queryset.filter(pk=pk).annotate(
+            last_comment=Max('comment__updated_date'), comments=Count('comment')
+        ).values_list('updated_date', 'last_comment', 'comments').first()
+        if version is None:
+            return Response({"detail": "No Outline matches the given query."}, status=status.HTTP_404_NOT_FOUND)
+
+        updated, last_comment, comment_count = version
+        key = 'outline-bundle:{}:{}:{}:{}:{}'.format(pk, request.get_host(), updated.timestamp(),
+                                                    last_comment.timestamp() if last_comment else 0, comment_count)
+        data = cache.get(key)
+        if data is None:
+            data = self.build_bundle(request, pk, comment_count)
+            cache.set(key, data, getattr(settings, 'BUNDLE_CACHE_TIMEOUT', 300))
+        return Response(data, status=status.HTTP_200_OK)
+
+    def build_bundle(self, request, pk, comment_count):
+        outline = self.queryset.select_related('lesson', 'lecturer').prefetch_related('course', 'evaluation').get(pk=pk)
+        page_size = paginators.CommentPaginator.page_size
+        # Cùng thứ tự mới nhất trước với /comment/, để link next nối tiếp trang đầu
+        comments = outline.comment_set.select_related('student').order_by('-id')[:page_size]
+
+        next_url = None
+        if comment_count > page_size:
+            next_url = replace_query_param(
+                request.build_absolute_uri(reverse('outlines-get-comment', kwargs={'pk': pk})), 'page', 2)
+
+        return {
+            "outline": serializers.OutlineSerializer(outline).data,
+            "lesson": serializers.LessonSerializer(outline.lesson).data,
+            "lecturer": serializers.LecturerSerializer(outline.lecturer).data,
+            "courses": serializers.CourseSerializer(outline.course.all(), many=True).data,
+            "evaluations": serializers.EvaluationSerializer(outline.evaluation.all(), many=True).data,
+            "comments": {
+                "count": comment_count,
+                "next": next_url,
+                "previous": None,
+                "results": serializers.CommentSerializer(comments, many=True).data,
+            },
+        }
 
-        return Response(serializers.CommentSerializer(comments, many=True).data,
-                        status=status.HTTP_200_OK)
+    @action(methods=['get'], url_path='comment/feed', detail=True)
+    def comment_feed(self, request, pk):
+        # Trả về các bình luận mới hơn id `since`, theo thứ tự tăng dần
+        outline = self.get_object()
+        try:
+            since = int(request.query_params.get('since') or 0)
+            limit = min(int(request.query_params.get('limit') or 50), 200)
+        except ValueError:
+            return Response({"error": "since and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        comments = outline.comment_set.filter(id__gt=since).order_by('id')[:limit]
+        return Response(serializers.CommentSerializer(comments, many=True).data, status=status.HTTP_200_OK)
 
     @action(methods=['post'], url_path='comments', detail=True)
     def add_comment(self, request, pk):
@@ -152,7 +392,10 @@ class OutlineViewSet(viewsets.ViewSet, generics.ListAPIView, generics.UpdateAPIV
         if serializer.is_valid():
             # Lưu comment với đối tượng Student đã được tạo
             serializer.save(outline=outline, student=student)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            data = serializer.data
+            audit.log('comment.create', serializer.instance, request, outline=outline.id)
+            transaction.on_commit(lambda: broker.publish(f'outline:{outline.id}:comments', data))
+            return Response(data, status=status.HTTP_201_CREATED)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
     @action(methods=['post'], url_path='evaluation', detail=True)
@@ -229,6 +472,10 @@ class OutlineViewSet(viewsets.ViewSet, generics.ListAPIView, generics.UpdateAPIV
         with transaction.atomic():
             for evaluation in new_evaluations:
                 outline.evaluation.add(evaluation)
+            outline.save(update_fields=['updated_date'])
+            audit.log('outline.add_evaluation', outline, request,
+                      evaluations=[{'id': e.id, 'method': e.method, 'percentage': e.percentage}
+                                   for e in new_evaluations])
 
         return Response(serializers.EvaluationSerializer(new_evaluations, many=True).data,
                         status=status.HTTP_201_CREATED)
@@ -274,6 +521,7 @@ class OutlineViewSet(viewsets.ViewSet, generics.ListAPIView, generics.UpdateAPIV
         with transaction.atomic():
             for course in new_course:
                 outline.course.add(course)
+            outline.save(update_fields=['updated_date'])
 
         return Response(serializers.CourseSerializer(new_course, many=True).data,
                         status=status.HTTP_201_CREATED)
@@ -288,15 +536,23 @@ class OutlineViewSet(viewsets.ViewSet, generics.ListAPIView, generics.UpdateAPIV
         serializer = serializers.OutlineApprovalSerializer(outline, data={'is_approved': True}, partial=True)
         if serializer.is_valid():
             serializer.save()
+            audit.log('outline.approve', outline, request, is_approved=True)
             return Response({"detail": "Outline approved successfully."}, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(methods=['get'], url_path='feed', detail=False, pagination_class=paginators.FeedPaginator)
+    def feed(self, request):
+        # Đề cương áp dụng cho sinh viên đang đăng nhập, đọc từ bảng FeedEntry dựng sẵn theo khóa
+        page = self.paginate_queryset(feeds.student_feed(request.user.get_student_profile()))
+        ids = [row['outline_id'] for row in page]
+        outlines = serializers.FastOutlineSerializer.queryset(Outline.objects.filter(id__in=ids).order_by('-id'))
+        return self.get_paginated_response(serializers.FastOutlineSerializer(outlines).data)
+
     @action(methods=['get'], url_path='download', detail=False)
     def download_outline(self, request):
         # Lấy danh sách các đề cương đã được xét duyệt
-        approved_outlines = self.queryset.filter(is_approved=True)
-        serializer = self.get_serializer(approved_outlines, many=True)
-        return Response(serializer.data)
+        approved_outlines = serializers.FastOutlineSerializer.queryset(self.queryset.filter(is_approved=True))
+        return Response(serializers.FastOutlineSerializer(approved_outlines).data)
 
 
 class AccountViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIView):
@@ -327,6 +583,7 @@ class AccountViewSet(viewsets.ViewSet, generics.ListAPIView, generics.CreateAPIV
         account = self.get_object()
         account.is_approved = True
         account.save()
+        audit.log('account.approve', account, request, is_approved=True)
         return Response(data={'message': f'Tài khoản của {account.username} đã được xét duyệt thành công.'},
                         status=status.HTTP_200_OK)
 
@@ -367,6 +624,8 @@ class ApprovalViewSet(viewsets.ViewSet, generics.ListAPIView):
         serializer.save()
         approve.is_approved = True
         approve.save()
+        audit.log('approval.approve', approve, request, is_approved=True, student=approve.student_id,
+                  username=serializer.data.get('username'))
         return Response(data={"message": "Xet duyet thanh cong", "account": serializer.data})
 
     @action(methods=['patch'], detail=True, url_path='update')
@@ -413,6 +672,7 @@ class CommentViewSet(viewsets.ViewSet, generics.DestroyAPIView, generics.UpdateA
         if instance.student.user != request.user.get_student_profile():
             return Response({"error": "You do not have permission to delete this comment."},
                             status=status.HTTP_403_FORBIDDEN)
+        audit.log('comment.delete', instance, request, outline=instance.outline_id, content=instance.content)
         self.perform_destroy(instance)
         return Response(status=status.HTTP_204_NO_CONTENT)
 
@@ -424,6 +684,268 @@ class CommentViewSet(viewsets.ViewSet, generics.DestroyAPIView, generics.UpdateA
 
         serializer = self.get_serializer(instance, data=request.data, partial=True)
         if serializer.is_valid():
+            before = instance.content
             self.perform_update(serializer)
+            audit.log('comment.update', instance, request, outline=instance.outline_id,
+                      content={'old': before, 'new': instance.content})
             return Response(serializer.data, status=status.HTTP_200_OK)
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+
+class ChatViewSet(viewsets.ViewSet, generics.ListAPIView):
+    queryset = Chat.objects.filter(active=True).select_related('lecturer', 'student')
+    serializer_class = serializers.ChatSerializer
+    permission_classes = [IsAuthenticated]
+
+    def get_queryset(self):
+        user = self.request.user
+        if self.action in ['list', 'unread']:
+            read_field = 'lecturer_read' if user.is_lecturer() else 'student_read'
+            member = Q(lecturer__account=user) if user.is_lecturer() else Q(student__account=user)
+            return self.queryset.filter(member).annotate(
+                unread=Count('messages', filter=Q(messages__id__gt=F(read_field)) & ~Q(messages__sender=user)))
+        return self.queryset
+
+    def get_chat(self, pk):
+        chat = generics.get_object_or_404(self.queryset, pk=pk)
+        if not chat.has_member(self.request.user):
+            raise PermissionDenied("You are not a member of this chat.")
+        return chat
+
+    def create(self, request):
+        if request.user.is_lecturer():
+            lecturer = request.user.get_lecturer_profile()
+            student = generics.get_object_or_404(Student, pk=request.data.get('student'))
+        elif request.user.is_student():
+            student = request.user.get_student_profile()
+            lecturer = generics.get_object_or_404(Lecturer, pk=request.data.get('lecturer'))
+        else:
+            return Response({"error": "Only lecturers and students can chat."}, status=status.HTTP_403_FORBIDDEN)
+
+        chat, created = Chat.objects.get_or_create(lecturer=lecturer, student=student, active=True)
+        return Response(serializers.ChatSerializer(chat).data,
+                        status=status.HTTP_201_CREATED if created else status.HTTP_200_OK)
+
+    @action(methods=['get'], detail=False, url_path='unread')
+    def unread(self, request):
+        counts = dict(self.get_queryset().values_list('id', 'unread'))
+        return Response({"chats": counts, "total": sum(counts.values())}, status=status.HTTP_200_OK)
+
+    @action(methods=['get'], detail=True, url_path='messages')
+    def get_messages(self, request, pk):
+        chat = self.get_chat(pk)
+        try:
+            since = int(request.query_params.get('since') or 0)
+            limit = min(int(request.query_params.get('limit') or 50), 200)
+        except ValueError:
+            return Response({"error": "since and limit must be integers."}, status=status.HTTP_400_BAD_REQUEST)
+        messages = chat.messages.filter(id__gt=since).order_by('id')[:limit]
+        return Response(serializers.MessageSerializer(messages, many=True).data, status=status.HTTP_200_OK)
+
+    @action(methods=['post'], detail=True, url_path='send')
+    def send_message(self, request, pk):
+        chat = self.get_chat(pk)
+        serializer = serializers.MessageSerializer(data=request.data)
+        if serializer.is_valid():
+            serializer.save(chat=chat, sender=request.user)
+            data = serializer.data
+            transaction.on_commit(lambda: broker.publish(f'chat:{chat.id}', data))
+            return Response(data, status=status.HTTP_201_CREATED)
+        return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
+
+    @action(methods=['post'], detail=True, url_path='read')
+    def mark_read(self, request, pk):
+        chat = self.get_chat(pk)
+        last_id = request.data.get('last_id')
+        if last_id is None or not str(last_id).isdigit():
+            return Response({"error": "last_id must be a non-negative integer."}, status=status.HTTP_400_BAD_REQUEST)
+        read_field = chat.read_field(request.user)
+        Chat.objects.filter(pk=chat.pk).update(**{read_field: Greatest(read_field, int(last_id))})
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class AuditViewSet(viewsets.ViewSet, generics.ListAPIView):
+    # Tra cứu nhật ký audit theo người thực hiện, thao tác, đối tượng và khoảng thời gian (phân trang theo cursor)
+    queryset = AuditEvent.objects.all()
+    serializer_class = serializers.AuditEventSerializer
+    pagination_class = paginators.AuditPaginator
+    permission_classes = [IsAdminUser]
+
+    def get_queryset(self):
+        queryset = self.queryset
+        params = self.request.query_params
+        for name in ('actor', 'action', 'target_type', 'target_id'):
+            if params.get(name):
+                queryset = queryset.filter(**{name: params[name]})
+        if params.get('since'):
+            queryset = queryset.filter(created_date__gte=params['since'])
+        if params.get('until'):
+            queryset = queryset.filter(created_date__lt=params['until'])
+        return queryset
+
+    def list(self, request, *args, **kwargs):
+        try:
+            return super().list(request, *args, **kwargs)
+        except (ValueError, ValidationError) as ex:
+            return Response({"error": str(ex)}, status=status.HTTP_400_BAD_REQUEST)
+
+
+class StatsViewSet(viewsets.ViewSet):
+    # Thống kê cho dashboard, chỉ đọc bảng Statistic được cập nhật dần (không GROUP BY trên bảng gốc)
+    permission_classes = [IsAdminUser]
+
+    def list(self, request):
+        dimension = request.query_params.get('dimension')
+        if dimension and dimension not in stats.DIMENSIONS:
+            return Response({"error": f"Unknown dimension, expected one of: {', '.join(stats.DIMENSIONS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = request.query_params.get('limit')
+        if limit is not None and (not limit.isdigit() or int(limit) < 1):
+            return Response({"error": "limit must be a positive integer."}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(stats.read(dimension, int(limit) if limit else None), status=status.HTTP_200_OK)
+
+
+class AutocompleteViewSet(viewsets.ViewSet):
+    # Gợi ý khi gõ ô tìm kiếm, đọc chỉ mục tiền tố trong bộ nhớ thay vì LIKE trên bảng đề cương
+    permission_classes = [permissions.AllowAny]
+
+    def list(self, request):
+        kinds = request.query_params.get('types')
+        kinds = kinds.split(',') if kinds else autocomplete.KINDS
+        if not set(kinds) <= set(autocomplete.KINDS):
+            return Response({"error": f"Unknown type, expected: {', '.join(autocomplete.KINDS)}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        limit = request.query_params.get('limit', '10')
+        max_limit = getattr(settings, 'AUTOCOMPLETE_MAX_LIMIT', 20)
+        if not limit.isdigit() or not 1 <= int(limit) <= max_limit:
+            return Response({"error": f"limit must be between 1 and {max_limit}."},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(autocomplete.search(request.query_params.get('q', ''), int(limit), kinds),
+                        status=status.HTTP_200_OK)
+
+
+class BatchView(APIView):
+    # Gộp nhiều request tới router vào một lần gọi; các GET liền nhau chạy song song
+    permission_classes = [permissions.AllowAny]
+    executor = ThreadPoolExecutor(max_workers=getattr(settings, 'BATCH_MAX_WORKERS', 4),
+                                  thread_name_prefix='batch')
+    # Thông tin của request batch được chép sang request con (host, IP cho throttle, token cho replica pin)
+    forwarded_meta = {'HTTP_HOST', 'HTTP_AUTHORIZATION', 'HTTP_X_FORWARDED_FOR', 'HTTP_USER_AGENT',
+                      'HTTP_ACCEPT_LANGUAGE', 'REMOTE_ADDR', 'SERVER_NAME', 'SERVER_PORT'}
+
+    def post(self, request):
+        items = request.data.get('requests') if isinstance(request.data, dict) else None
+        if not isinstance(items, list) or not items:
+            return Response({"error": "requests must be a non-empty list."}, status=status.HTTP_400_BAD_REQUEST)
+        max_size = getattr(settings, 'BATCH_MAX_SIZE', 20)
+        if len(items) > max_size:
+            return Response({"error": f"A batch can contain at most {max_size} requests."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        results = [None] * len(items)
+        pending_gets = []
+        for index, item in enumerate(items):
+            if not isinstance(item, dict) or not isinstance(item.get('path'), str):
+                results[index] = {"status": status.HTTP_400_BAD_REQUEST, "body": {"error": "path is required."}}
+                continue
+            if item.get('method', 'GET').upper() == 'GET':
+                pending_gets.append(index)
+                continue
+            # Request ghi là rào chắn: chạy hết các GET phía trước rồi mới thực hiện theo thứ tự
+            self.run_gets(request, items, pending_gets, results)
+            pending_gets = []
+            results[index] = self.dispatch_item(request, item)
+        self.run_gets(request, items, pending_gets, results)
+
+        return Response({"responses": results}, status=status.HTTP_200_OK)
+
+    def run_gets(self, request, items, indexes, results):
+        if len(indexes) == 1:
+            results[indexes[0]] = self.dispatch_item(request, items[indexes[0]])
+        elif indexes:
+            # Mỗi luồng nhận một bản sao context của request (CSDL replica đã chọn, bộ đếm truy vấn...)
+            futures = [self.executor.submit(contextvars.copy_context().run, self.dispatch_in_thread, request, items[i])
+                       for i in indexes]
+            for index, future in zip(indexes, futures):
+                results[index] = future.result()
+
+    def dispatch_in_thread(self, request, item):
+        try:
+            return self.dispatch_item(request, item)
+        finally:
+            connections.close_all()
+
+    def sub_request(self, request, method, path, body):
+        # Request con dựng trực tiếp từ WSGI environ, giữ host, IP và header xác thực của request batch
+        path, _, query = path.partition('?')
+        data = json.dumps(body).encode() if body is not None else b''
+        environ = {key: value for key, value in request.META.items() if key in self.forwarded_meta}
+        environ.update({
+            'REQUEST_METHOD': method, 'PATH_INFO': path, 'QUERY_STRING': query, 'HTTP_ACCEPT': 'application/json',
+            'CONTENT_TYPE': 'application/json', 'CONTENT_LENGTH': str(len(data)), 'wsgi.input': io.BytesIO(data),
+            'wsgi.url_scheme': request.scheme,
+        })
+        environ.setdefault('SERVER_NAME', 'localhost')
+        environ.setdefault('SERVER_PORT', '443' if request.is_secure() else '80')
+        return WSGIRequest(environ)
+
+    def dispatch_item(self, request, item):
+        from courseoutline.urls import r
+
+        method = item.get('method', 'GET').upper()
+        path = item['path']
+        try:
+            match = resolve(path.partition('?')[0])
+        except Resolver404:
+            match = None
+        routed = {viewset for prefix, viewset, basename in r.registry}
+        if match is None or getattr(match.func, 'cls', None) not in routed:
+            return {"status": status.HTTP_404_NOT_FOUND, "body": {"error": f"{path} is not an API route."}}
+
+        sub_request = self.sub_request(request, method, path, item.get('body'))
+        try:
+            # Request con không đi qua middleware: áp lại giới hạn token bucket như request thường
+            response = throttled(sub_request)
+            if response is None:
+                # Dùng lại kết quả xác thực của request batch, không xác thực lại từng request con
+                sub_request._force_auth_user = request.user
+                sub_request._force_auth_token = request.auth
+                response = match.func(sub_request, *match.args, **match.kwargs)
+            if response.streaming:
+                # vd file snapshot (FileResponse): không gói được vào JSON
+                response.close()
+                return {"status": status.HTTP_400_BAD_REQUEST,
+                        "body": {"error": "Streaming responses are not batchable."}}
+            if hasattr(response, 'render'):
+                response.render()
+            content_type = response.get('Content-Type', '')
+            if content_type.startswith('application/json') and response.content:
+                payload = json.loads(response.content)
+            else:
+                payload = response.content.decode(response.charset or 'utf-8')
+        except Exception:
+            # Lỗi của một request con không làm hỏng cả batch
+            logger.exception('Batch request %s %s failed', method, path)
+            return {"status": status.HTTP_500_INTERNAL_SERVER_ERROR, "body": {"error": "Internal server error."}}
+        return {"status": response.status_code, "body": payload}
+
+
+def metrics_allowed(request):
+    # Có METRICS_TOKEN thì bắt buộc token; không thì chỉ các mạng nội bộ trong METRICS_ALLOWED_NETWORKS
+    if getattr(settings, 'METRICS_PUBLIC', False):
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', None)
+    if token:
+        return constant_time_compare(request.headers.get('Authorization', ''), f'Bearer {token}')
+    try:
+        ip = ipaddress.ip_address(client_ip(request))
+    except ValueError:
+        return False
+    return any(ip in ipaddress.ip_network(network)
+               for network in getattr(settings, 'METRICS_ALLOWED_NETWORKS', ['127.0.0.0/8', '::1/128']))
+
+
+def metrics(request):
+    if not metrics_allowed(request):
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
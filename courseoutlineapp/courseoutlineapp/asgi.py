@@ -14,3 +14,7 @@ from django.core.asgi import get_asgi_application
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'courseoutlineapp.settings')
 
 application = get_asgi_application()
+
+from courseoutline import autocomplete  # noqa: E402
+
+autocomplete.warm()
@@ -10,22 +10,32 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.0/ref/settings/
 """
 
+import atexit
+import shutil
+import sys
+import tempfile
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# manage.py test: file dùng chung (snapshot, cache...) đặt trong thư mục tạm riêng của process test (xóa khi thoát),
+# không ghi đè dữ liệu của dev server
+TESTING = sys.argv[1:2] == ['test']
+if TESTING:
+    TEST_DIR = Path(tempfile.mkdtemp(prefix='courseoutline-test-'))
+    atexit.register(shutil.rmtree, TEST_DIR, ignore_errors=True)
+
 MEDIA_ROOT = f"{BASE_DIR}/courseoutline/static/"
 
 AUTH_USER_MODEL = 'courseoutline.Account'
 
-import cloudinary
-
-cloudinary.config(
-    cloud_name="dr9h3ttpy",
-    api_key="938152162715573",
-    api_secret="IIJZy3CtSGsMGw1JVyBHSftoCBU"
-)
+# Cloudinary SDK tự đọc cấu hình này ở lần import đầu tiên (khi nạp models), settings không cần import cloudinary
+CLOUDINARY = {
+    'cloud_name': "dr9h3ttpy",
+    'api_key': "938152162715573",
+    'api_secret': "IIJZy3CtSGsMGw1JVyBHSftoCBU",
+}
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/5.0/howto/deployment/checklist/
@@ -59,12 +69,147 @@ INSTALLED_APPS = [
 REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'oauth2_provider.contrib.rest_framework.OAuth2Authentication',
-    )
+    ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'rest_framework.renderers.JSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+        'courseoutline.renderers.MessagePackRenderer',
+        'courseoutline.renderers.CBORRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'rest_framework.parsers.JSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+        'courseoutline.parsers.MessagePackParser',
+        'courseoutline.parsers.CBORParser',
+    ),
 }
 
+# Nén response lớn hơn ngưỡng (byte) bằng brotli hoặc gzip
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_BROTLI_QUALITY = 5
+
+# Thu thập số liệu cho endpoint /metrics (Prometheus). Đặt METRICS_TOKEN thì phải gửi Authorization: Bearer <token>,
+# không thì chỉ IP thuộc METRICS_ALLOWED_NETWORKS được đọc; METRICS_PUBLIC = True để mở cho mọi client
+METRICS_ENABLED = True
+METRICS_TOKEN = None
+METRICS_ALLOWED_NETWORKS = ['127.0.0.0/8', '::1/128']
+METRICS_PUBLIC = False
+
+# Profile request theo header X-Profile đã ký hoặc theo tỉ lệ lấy mẫu
+PROFILING_SAMPLE_RATE = 0.0
+PROFILING_DIR = BASE_DIR / 'profiles'
+PROFILING_KEEP = 200
+PROFILING_TOKEN_MAX_AGE = 3600
+
+# Ghi nhận truy vấn chậm hơn ngưỡng (ms) kèm EXPLAIN chạy nền
+SLOW_QUERY_THRESHOLD_MS = 200
+SLOW_QUERY_MAX_ENTRIES = 500
+SLOW_QUERY_MAX_PENDING = 1000
+
+# Cache dùng chung cho mọi worker trên cùng máy: file ánh xạ bộ nhớ, ưu tiên đặt trong /dev/shm.
+# Đổi MAX_SIZE / MAX_ENTRIES thì phải đổi LOCATION (hoặc xóa file khi không còn worker nào chạy)
+CACHES = {
+    'default': {
+        'BACKEND': 'courseoutline.cache.SharedMemoryCache',
+        'LOCATION': str((Path('/dev/shm') if Path('/dev/shm').is_dir() else Path(tempfile.gettempdir()))
+                        / 'courseoutline-cache'),
+        'OPTIONS': {
+            'MAX_SIZE': 64 * 1024 * 1024,  # byte
+            'MAX_ENTRIES': 65536,
+        },
+    }
+}
+if TESTING:
+    CACHES['default']['LOCATION'] = str(TEST_DIR / 'cache')
+
+# Thời gian cache (giây) của endpoint /outlines/{id}/bundle/
+BUNDLE_CACHE_TIMEOUT = 300
+
+# Endpoint /batch/: số request con tối đa và số luồng chạy song song các GET
+BATCH_MAX_SIZE = 20
+BATCH_MAX_WORKERS = 4
+
+# Long-poll / server-sent events (giây)
+LONG_POLL_TIMEOUT = 25
+SSE_HEARTBEAT = 15
+
+# Gói dữ liệu offline (SQLite nén) theo từng khóa học
+SNAPSHOT_DIR = BASE_DIR / 'snapshots'
+SNAPSHOT_KEEP = 5  # số phiên bản giữ lại cho mỗi khóa
+SNAPSHOT_DEBOUNCE = 5  # giây chờ gom thay đổi trước khi build lại
+SNAPSHOT_DIFF_RATIO = 0.5  # chỉ trả diff khi nhỏ hơn tỉ lệ này so với bản đầy đủ
+SNAPSHOT_AUTO_REBUILD = True
+
+# Nhập đề cương hàng loạt: số dòng mỗi lô (một transaction) và số lỗi tối đa trả về
+IMPORT_BATCH_SIZE = 500
+IMPORT_MAX_ERRORS = 1000
+
+# Ghi danh hàng loạt: số id sinh viên mỗi transaction
+ENROLL_CHUNK_SIZE = 2000
+
+# Giới hạn tốc độ (token bucket theo ip / user / endpoint) và số request xử lý đồng thời của mỗi process.
+# Token bucket nằm trong bộ nhớ từng process (throttling.TokenBucketStore), không dùng chung giữa các worker:
+# chạy N worker thì tốc độ thực tế cho phép là N lần giá trị 'rate' / 'burst' bên dưới
+THROTTLE_ENABLED = True
+THROTTLE_MAX_CONCURRENCY = 64
+THROTTLE_QUEUE_TIMEOUT = 0.5  # giây chờ slot trống trước khi trả 503
+THROTTLE_TRUST_FORWARDED = False  # bật khi chạy sau reverse proxy
+THROTTLE_EXEMPT = [r'^/metrics/$', r'^/admin/']
+# Long-poll / SSE giữ kết nối lâu: vẫn qua token bucket nhưng không chiếm slot của THROTTLE_MAX_CONCURRENCY
+THROTTLE_CONCURRENCY_EXEMPT = [r'^/async/chats/\d+/(poll|stream)/$', r'^/async/outlines/\d+/comment/stream/$']
+THROTTLE_RULES = [
+    {'name': 'login-ip', 'path': r'^/o/token/$', 'methods': ['POST'], 'scope': 'ip', 'rate': '30/min', 'burst': 10},
+    {'name': 'login-user', 'path': r'^/o/token/$', 'methods': ['POST'], 'scope': 'user', 'rate': '5/min', 'burst': 5},
+    {'name': 'outlines', 'path': r'^/(async/)?outlines/', 'scope': 'endpoint', 'rate': '500/s', 'burst': 1000},
+    {'name': 'outlines-user', 'path': r'^/(async/)?outlines/', 'scope': 'user', 'rate': '20/s', 'burst': 40},
+]
+
+# Nhật ký audit: gom trong bộ nhớ, ghi theo lô khi đủ AUDIT_BATCH_SIZE, sau AUDIT_FLUSH_INTERVAL giây
+# hoặc khi hết request; sự kiện chưa ghi được giữ trong file spool của từng process
+AUDIT_ENABLED = True
+AUDIT_BATCH_SIZE = 200
+AUDIT_FLUSH_INTERVAL = 2  # giây
+AUDIT_SPOOL_DIR = BASE_DIR / 'audit-spool'
+AUDIT_FSYNC = False  # bật để không mất sự kiện cả khi máy mất điện (chậm hơn)
+
+# Lưu trữ (`manage.py archive_rows`): chuyển dòng cũ khỏi bảng chính sang ArchivedRow theo lô, khôi phục được
+ARCHIVE_POLICIES = ['inactive-outlines', 'inactive-comments', 'past-course-comments', 'processed-approvals']
+ARCHIVE_INACTIVE_DAYS = 365  # đề cương / bình luận đã tắt quá số ngày này
+ARCHIVE_COMMENT_YEARS = 2  # bình luận của đề cương có khóa học gần nhất cũ hơn số năm này
+ARCHIVE_APPROVAL_DAYS = 180  # yêu cầu duyệt đã xử lý quá số ngày này
+ARCHIVE_BATCH_SIZE = 500
+
+# Gợi ý tìm kiếm (/autocomplete/): chỉ mục tiền tố trong bộ nhớ mỗi process, nạp từ snapshot AUTOCOMPLETE_SNAPSHOT
+# (`manage.py build_autocomplete`, tự tính lại khi cũ hơn AUTOCOMPLETE_SNAPSHOT_MAX_AGE giây) rồi cập nhật qua signal;
+# thay đổi ở process khác được đồng bộ sau mỗi AUTOCOMPLETE_SYNC_INTERVAL giây
+AUTOCOMPLETE_SNAPSHOT = BASE_DIR / 'autocomplete' / 'snapshot.json.gz'
+if TESTING:
+    AUTOCOMPLETE_SNAPSHOT = TEST_DIR / 'snapshot.json.gz'
+AUTOCOMPLETE_SNAPSHOT_MAX_AGE = 24 * 3600
+AUTOCOMPLETE_SYNC_INTERVAL = 60
+AUTOCOMPLETE_WARMUP = True  # nạp ở luồng nền khi wsgi / asgi khởi động
+AUTOCOMPLETE_MAX_ENTRIES = 100000  # giới hạn bộ nhớ: giữ các mục phổ biến nhất
+AUTOCOMPLETE_MAX_WORDS = 6  # số từ (tính từ đầu) được đánh chỉ mục riêng
+AUTOCOMPLETE_MAX_LABEL = 120
+AUTOCOMPLETE_MAX_LIMIT = 20
+
 CKEDITOR_UPLOAD_PATH = "ckeditors/images/"
 
+# OpenAPI: `manage.py build_openapi` ghi sẵn swagger.json / swagger.yaml vào OPENAPI_SCHEMA_DIR lúc deploy.
+# Chưa build thì schema được sinh ở request đầu tiên và cache trong OPENAPI_CACHE_TIMEOUT giây
+OPENAPI_SCHEMA_DIR = BASE_DIR / 'openapi'
+OPENAPI_CACHE_TIMEOUT = 3600
+SWAGGER_SETTINGS = {'SPEC_URL': ('schema-json', {'format': '.json'})}
+REDOC_SETTINGS = {'SPEC_URL': ('schema-json', {'format': '.json'})}
+
 MIDDLEWARE = [
+    'courseoutline.middleware.CompressionMiddleware',
+    'courseoutline.middleware.MetricsMiddleware',
+    'courseoutline.throttling.ThrottleMiddleware',
+    'courseoutline.routers.ReplicaMiddleware',
+    'courseoutline.profiling.ProfilingMiddleware',
+    'courseoutline.slowlog.SlowQueryMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -107,6 +252,12 @@ DATABASES = {
     }
 }
 
+# Read replica: thêm alias vào DATABASES rồi liệt kê trong DATABASE_REPLICAS để các request GET đọc từ replica
+DATABASE_ROUTERS = ['courseoutline.routers.ReplicaRouter']
+DATABASE_REPLICAS = []
+REPLICA_STICKY_SECONDS = 5  # sau khi ghi, client đọc từ primary trong khoảng này
+REPLICA_RETRY_SECONDS = 30  # replica lỗi bị bỏ qua trong khoảng này
+
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
 
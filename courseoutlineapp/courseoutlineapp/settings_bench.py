@@ -0,0 +1,18 @@
+# Cấu hình dùng cho các lệnh benchmark: thay MySQL bằng SQLite
+from courseoutlineapp.settings import *  # noqa
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'bench.sqlite3',
+    }
+}
+
+DEBUG = False
+ALLOWED_HOSTS = ['testserver']
+PASSWORD_HASHERS = ['django.contrib.auth.hashers.MD5PasswordHasher']
+SNAPSHOT_AUTO_REBUILD = False
+THROTTLE_ENABLED = False
+# Cache riêng cho benchmark (các worker của bench vẫn dùng chung), không đụng cache của dev server
+if not TESTING:
+    CACHES['default']['LOCATION'] = str(Path(tempfile.gettempdir()) / 'courseoutline-bench-cache')
@@ -0,0 +1,15 @@
+# Thử nghiệm read replica với hai CSDL SQLite cục bộ:
+#   python manage.py test --settings=courseoutlineapp.settings_replica
+from courseoutlineapp.settings_bench import *  # noqa
+
+DATABASES = {
+    'default': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'primary.sqlite3',
+    },
+    'replica': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': BASE_DIR / 'replica.sqlite3',
+    },
+}
+DATABASE_REPLICAS = ['replica']
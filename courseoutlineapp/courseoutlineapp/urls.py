@@ -15,36 +15,30 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 from django.contrib import admin
+from django.contrib.admin.views.decorators import staff_member_required
 from django.urls import path, re_path, include
-from drf_yasg import openapi
-from drf_yasg.views import get_schema_view
-from rest_framework import permissions
-
-schema_view = get_schema_view(
-    openapi.Info(
-        title="Course Outline API",
-        default_version='v1',
-        description="APIs for CourseApp",
-        contact=openapi.Contact(email="2151053067@ou.edu.vn"),
-        license=openapi.License(name="Mỹ Vân@2024"),
-    ),
-    public=True,
-    permission_classes=(permissions.AllowAny,),
-)
+from django.utils.module_loading import import_string
+from django.views.decorators.cache import never_cache
+from django.views.decorators.csrf import csrf_exempt
+from courseoutline import openapi
+from courseoutline.admin import profile_list
 
 urlpatterns = [
     path('', include('courseoutline.urls')),
+    path('admin/profiles/', admin.site.admin_view(profile_list), name='admin-profiles'),
     path('admin/', admin.site.urls),
-    re_path(r'^ckeditor/', include('ckeditor_uploader.urls')),
-    re_path(r'^swagger(?P<format>\.json|\.yaml)$',
-            schema_view.without_ui(cache_timeout=0),
-            name='schema-json'),
-    re_path(r'^swagger/$',
-            schema_view.with_ui('swagger', cache_timeout=0),
-            name='schema-swagger-ui'),
-    re_path(r'^redoc/$',
-            schema_view.with_ui('redoc', cache_timeout=0),
-            name='schema-redoc'),
+    # Giống ckeditor_uploader.urls nhưng chỉ import view khi có request upload / browse
+    re_path(r'^ckeditor/upload/',
+            csrf_exempt(staff_member_required(openapi.lazy_view(
+                lambda: import_string('ckeditor_uploader.views.upload')))),
+            name='ckeditor_upload'),
+    re_path(r'^ckeditor/browse/',
+            never_cache(staff_member_required(openapi.lazy_view(
+                lambda: import_string('ckeditor_uploader.views.browse')))),
+            name='ckeditor_browse'),
+    re_path(r'^swagger(?P<format>\.json|\.yaml)$', openapi.schema, name='schema-json'),
+    re_path(r'^swagger/$', openapi.swagger_ui, name='schema-swagger-ui'),
+    re_path(r'^redoc/$', openapi.redoc_ui, name='schema-redoc'),
 
     path('o/', include('oauth2_provider.urls', namespace='oauth2_provider')),
 
@@ -5,7 +5,8 @@ const BASE_URL = 'http://10.17.64.200:8000/';
 export const endpoints = {
     'categories': '/categories/',
     'lessons': '/lessons/',
-    'outlines': '/outlines/'
+    'outlines': '/outlines/',
+    'batch': '/batch/'
 };
 export default axios.create({
     baseURL: BASE_URL